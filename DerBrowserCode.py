@@ -1,160 +1,3292 @@
 import sys
 import os
+import time
+
+# Отметки импортов для отчета --profile-startup: (что загружено, момент окончания)
+STARTUP_IMPORT_MARKS = [("", time.perf_counter())]
+
 import json
-from PyQt5.QtCore import *
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import *
-from PyQt5.QtWebEngineWidgets import *
-from PyQt5.QtGui import *
+import re
+import math
+import heapq
+import itertools
+import contextlib
+import gc
+import tracemalloc
+import tempfile
+import shutil
 import urllib.parse
 from datetime import datetime
 from typing import List, Dict
 import pickle
+import sqlite3
 import socket
 import subprocess
 import platform
 import hashlib
+import bisect
+import struct
+import zlib
+import threading
 import base64
-import time
+import array
+import html
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+STARTUP_IMPORT_MARKS.append(("import: стандартная библиотека", time.perf_counter()))
+
+from PyQt5.QtCore import *
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import *
+from PyQt5.QtGui import *
 from PyQt5.QtGui import QPainter, QImage
+from PyQt5.QtNetwork import QNetworkConfigurationManager, QNetworkConfiguration
+STARTUP_IMPORT_MARKS.append(("import: PyQt5.QtCore, QtWidgets, QtGui", time.perf_counter()))
+
+from PyQt5.QtWebEngineWidgets import *
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+STARTUP_IMPORT_MARKS.append(("import: PyQt5.QtWebEngineWidgets", time.perf_counter()))
+
+# Хост в URL: после схемы и данных входа, до порта, пути, запроса или фрагмента; IPv6 в скобках
+HOST_RE = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://(?:[^@/?#]*@)?(\[[^\]]*\]|[^:/?#]*)")
+
+def url_host(url):
+    """Хост URL в нижнем регистре ("" без хоста); регулярное выражение в разы быстрее urlsplit"""
+    match = HOST_RE.match(url)
+    return match.group(1).lower() if match else ""
 
 class Bookmark:
+    __slots__ = ("title", "url", "added_date", "category", "icon", "id", "parent_id", "position")
+
     def __init__(self, title, url, added_date, category="General", icon="⭐"):
         self.title = title
         self.url = url
-        self.added_date = added_date
-        self.category = category
+        self.added_date = HistoryStore.to_epoch(added_date)  # секунды epoch
+        self.category = sys.intern(category) if category else "General"
         self.icon = icon
+        self.id = None  # Идентификатор записи в хранилище профилей
+        self.parent_id = None  # Папка (None - корень)
+        self.position = 0.0  # Порядок среди детей папки
+
+    @property
+    def added_date_text(self):
+        return HistoryStore.format_time(self.added_date)
+
+    def __getstate__(self):
+        return {name: getattr(self, name, None) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        # Старые pickle хранят __dict__ с датой в виде строки и без полей дерева
+        self.__init__(state.get("title", ""), state.get("url", ""), state.get("added_date"),
+                      state.get("category", "General"), state.get("icon", "⭐"))
+        self.id = state.get("id")
+        self.parent_id = state.get("parent_id")
+        self.position = state.get("position", 0.0)
+
+class BookmarkFolder:
+    __slots__ = ("title", "id", "parent_id", "position", "created_date")
+
+    def __init__(self, title, parent_id=None, position=0.0):
+        self.title = title
+        self.id = None
+        self.parent_id = parent_id
+        self.position = position
+        self.created_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+class BookmarkTree:
+    """Дерево закладок: папки с id, указатели на родителя и дети по дробным позициям.
+    Перенос или переименование меняет поля одного узла, поэтому сохраняется одной строкой"""
+    POSITION_STEP = 1024.0
+    MIN_POSITION_GAP = 1e-6
+
+    def __init__(self, bookmarks=(), folders=()):
+        self.folders = {}     # id -> BookmarkFolder
+        self._bookmarks = {}  # id -> Bookmark
+        self._children = {None: []}   # id папки -> дети в порядке позиций
+        self._positions = {None: []}  # позиции тех же детей для bisect
+        self.revision = 0  # Растет при каждом изменении, чтобы открытые окна знали об устаревании
+        for folder in folders:
+            self.folders[folder.id] = folder
+            self._children[folder.id] = []
+            self._positions[folder.id] = []
+        nodes = list(self.folders.values())
+        for bookmark in bookmarks:
+            self._bookmarks[bookmark.id] = bookmark
+            nodes.append(bookmark)
+
+        # Узлы с потерянным родителем (или циклом) поднимаем в корень
+        for node in nodes:
+            node.parent_id = getattr(node, 'parent_id', None)
+            node.position = getattr(node, 'position', None)
+            if node.parent_id not in self._children or self._has_cycle(node):
+                node.parent_id = None
+        # Старые закладки без позиции ставим в конец в порядке id
+        groups = {}
+        for node in nodes:
+            groups.setdefault(node.parent_id, []).append(node)
+        for parent_id, children in groups.items():
+            children.sort(key=lambda node: (node.position is None, node.position or 0, node.id or 0))
+            last = None
+            for node in children:
+                if node.position is None or (last is not None and node.position <= last):
+                    node.position = (last if last is not None else 0) + self.POSITION_STEP
+                last = node.position
+            self._children[parent_id] = children
+            self._positions[parent_id] = [node.position for node in children]
+
+    def __len__(self):
+        return len(self._bookmarks)
+
+    def __iter__(self):
+        """Перебирает все закладки"""
+        return iter(list(self._bookmarks.values()))
+
+    def get(self, bookmark_id):
+        """Возвращает закладку по id"""
+        return self._bookmarks.get(bookmark_id)
+
+    def get_folder(self, folder_id):
+        """Возвращает папку по id"""
+        return self.folders.get(folder_id)
+
+    def children(self, parent_id=None):
+        """Дети папки в порядке позиций (список только для чтения)"""
+        return self._children.get(parent_id, [])
+
+    def row_of(self, node):
+        """Номер узла среди детей его папки"""
+        return bisect.bisect_left(self._positions[node.parent_id], node.position)
+
+    def is_inside(self, node, folder_id):
+        """Проверяет, лежит ли папка folder_id внутри node (или совпадает с ней)"""
+        if not isinstance(node, BookmarkFolder):
+            return False
+        while folder_id is not None:
+            if folder_id == node.id:
+                return True
+            folder_id = self.folders[folder_id].parent_id
+        return False
+
+    def insert(self, node, parent_id=None, row=None):
+        """Вставляет узел в папку перед строкой row (None - в конец); возвращает измененные узлы"""
+        if isinstance(node, BookmarkFolder):
+            self.folders[node.id] = node
+            self._children[node.id] = []
+            self._positions[node.id] = []
+        else:
+            self._bookmarks[node.id] = node
+        return self._link(node, parent_id, row)
+
+    def move(self, node, parent_id, row=None):
+        """Переносит узел; row - строка в папке назначения до переноса. Возвращает измененные узлы"""
+        if self.is_inside(node, parent_id):
+            raise ValueError("Нельзя перенести папку внутрь самой себя")
+        if row is not None and parent_id == node.parent_id and row > self.row_of(node):
+            row -= 1
+        self._unlink(node)
+        return self._link(node, parent_id, row)
+
+    def rename(self, node, title):
+        """Переименовывает узел"""
+        node.title = title
+        self.revision += 1
+        return [node]
+
+    def remove(self, node):
+        """Удаляет узел (папку - вместе с содержимым); возвращает удаленные узлы"""
+        removed = []
+        if isinstance(node, BookmarkFolder):
+            for child in list(self._children[node.id]):
+                removed.extend(self.remove(child))
+            del self._children[node.id]
+            del self._positions[node.id]
+            del self.folders[node.id]
+        else:
+            del self._bookmarks[node.id]
+        self._unlink(node)
+        removed.append(node)
+        return removed
+
+    def path(self, node):
+        """Путь к узлу из названий папок"""
+        names = []
+        folder_id = node.parent_id
+        while folder_id is not None:
+            folder = self.folders[folder_id]
+            names.append(folder.title)
+            folder_id = folder.parent_id
+        return " / ".join(reversed(names))
+
+    def _has_cycle(self, node):
+        seen = set()
+        folder_id = node.parent_id
+        while folder_id is not None:
+            if folder_id in seen or (isinstance(node, BookmarkFolder) and folder_id == node.id):
+                return True
+            seen.add(folder_id)
+            folder = self.folders.get(folder_id)
+            folder_id = getattr(folder, 'parent_id', None)
+        return False
+
+    def _unlink(self, node):
+        row = self.row_of(node)
+        del self._children[node.parent_id][row]
+        del self._positions[node.parent_id][row]
+        self.revision += 1
+
+    def _link(self, node, parent_id, row):
+        changed = []
+        positions = self._positions[parent_id]
+        if row is None or row > len(positions):
+            row = len(positions)
+        if not positions:
+            position = self.POSITION_STEP
+        elif row == len(positions):
+            position = positions[-1] + self.POSITION_STEP
+        elif row == 0:
+            position = positions[0] - self.POSITION_STEP
+        else:
+            position = (positions[row - 1] + positions[row]) / 2
+            if position - positions[row - 1] < self.MIN_POSITION_GAP:
+                # Промежутки кончились - перенумеровываем детей этой папки
+                changed = self._renumber(parent_id)
+                position = (positions[row - 1] + positions[row]) / 2
+        node.parent_id = parent_id
+        node.position = position
+        self._children[parent_id].insert(row, node)
+        positions.insert(row, position)
+        self.revision += 1
+        changed.append(node)
+        return changed
+
+    def _renumber(self, parent_id):
+        children = self._children[parent_id]
+        positions = self._positions[parent_id]
+        for index, child in enumerate(children):
+            child.position = positions[index] = (index + 1) * self.POSITION_STEP
+        return list(children)
 
 class HistoryItem:
+    # Без __dict__; время - целые секунды epoch, заголовок хранится в UTF-8 и декодируется при чтении
+    __slots__ = ("url", "_title", "visit_time", "visit_count")
+
     def __init__(self, url, title, visit_time, visit_count=1):
         self.url = url
         self.title = title
-        self.visit_time = visit_time
+        self.visit_time = HistoryStore.to_epoch(visit_time)
         self.visit_count = visit_count
 
+    @property
+    def title(self):
+        return self._title.decode('utf-8')
+
+    @title.setter
+    def title(self, value):
+        if value.__class__ is bytes:
+            self._title = value  # уже закодирован (загрузка из pickle)
+        else:
+            self._title = value.encode('utf-8') if value else b""
+
+    @property
+    def visit_time_text(self):
+        return HistoryStore.format_time(self.visit_time)
+
+    def __reduce__(self):
+        return (self.__class__, (self.url, self._title, self.visit_time, self.visit_count))
+
+    def __setstate__(self, state):
+        # Старые pickle хранят __dict__ со строковым временем
+        self.__init__(state.get("url", ""), state.get("title", ""), state.get("visit_time"),
+                      state.get("visit_count", 1))
+
+class HistorySearchIndex:
+    """Инвертированный индекс по словам из URL и заголовков с поиском по префиксу"""
+    TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+    STOP_TOKENS = {"http", "https", "www"}
+    MATCH_SET_LIMIT = 1024  # До стольких слов словаря префикс проверяется по множеству, а не startswith
+
+    def __init__(self):
+        # слово -> множество URL; если URL один, хранится он сам (большинство слов - id из URL)
+        self._postings = {}
+        self._doc_tokens = {}  # URL -> кортеж слов документа
+        self._vocabulary = []  # отсортированный словарь для поиска по префиксу
+        self._new_tokens = []  # новые слова, которые вольются в словарь при следующем запросе
+        self._stale_tokens = 0
+
+    @classmethod
+    def tokenize(cls, text):
+        """Разбивает текст на слова в нижнем регистре"""
+        return [token for token in cls.TOKEN_RE.findall(text.lower())
+                if len(token) > 1 and token not in cls.STOP_TOKENS]
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    @classmethod
+    def query_terms(cls, query):
+        """Слова запроса, которые раскрываются по префиксу"""
+        return cls.tokenize(query)
+
+    def add(self, url, title):
+        """Индексирует запись (повторный вызов обновляет только изменившиеся слова)"""
+        self.index_tokens(url, self.tokenize(url) + self.tokenize(title or ""))
+
+    def index_tokens(self, url, tokens):
+        """Заменяет слова документа, меняя только разницу со старыми"""
+        # Слова (в том числе хосты) интернируются: у миллиона записей одного сайта одна строка "github"
+        tokens = tuple(sorted(set(map(sys.intern, tokens))))
+        old_tokens = self._doc_tokens.get(url)
+        if old_tokens == tokens:
+            return
+        old_set = set(old_tokens or ())
+        new_set = set(tokens)
+        for token in old_set - new_set:
+            self._unpost(token, url)
+        for token in new_set - old_set:
+            posting = self._postings.get(token)
+            if posting is None:
+                self._postings[token] = url
+                self._new_tokens.append(token)
+            elif posting.__class__ is not set:
+                if posting != url:
+                    self._postings[token] = {posting, url}
+            else:
+                posting.add(url)
+        self._doc_tokens[url] = tokens
+
+    def remove(self, url):
+        """Удаляет запись из индекса"""
+        for token in self._doc_tokens.pop(url, ()):
+            self._unpost(token, url)
+
+    def clear(self):
+        """Очищает индекс"""
+        self._postings.clear()
+        self._doc_tokens.clear()
+        self._vocabulary.clear()
+        self._new_tokens.clear()
+        self._stale_tokens = 0
+
+    def _unpost(self, token, url):
+        posting = self._postings.get(token)
+        if posting is None:
+            return
+        if posting.__class__ is not set:
+            if posting == url:
+                # Слово остается в словаре до следующей чистки и пропускается при поиске
+                del self._postings[token]
+                self._stale_tokens += 1
+            return
+        posting.discard(url)
+        if len(posting) == 1:
+            self._postings[token] = next(iter(posting))
+
+    def _posting(self, token):
+        posting = self._postings[token]
+        return posting if posting.__class__ is set else {posting}
+
+    def _merge_vocabulary(self):
+        if self._stale_tokens > len(self._postings):
+            self._vocabulary = sorted(self._postings)
+            self._new_tokens.clear()
+            self._stale_tokens = 0
+        elif len(self._new_tokens) < 64:
+            for token in self._new_tokens:
+                bisect.insort(self._vocabulary, token)
+            self._new_tokens.clear()
+        elif self._new_tokens:
+            self._vocabulary.extend(self._new_tokens)
+            self._vocabulary.sort()
+            self._new_tokens.clear()
+
+    def _prefix_range(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        return start, bisect.bisect_left(self._vocabulary, prefix + "￿", start)
+
+    def _prefix_tokens(self, prefix):
+        start, end = self._prefix_range(prefix)
+        postings = self._postings
+        return [token for token in self._vocabulary[start:end] if token in postings]
+
+    def expand(self, query, cap=None):
+        """Раскрывает слова запроса в слова словаря; возвращает [(оценка числа URL, слово, слова словаря)].
+        Слово, под которое попадает больше cap слов словаря, не раскрывается (None вместо списка)"""
+        terms = set(self.query_terms(query))
+        if not terms:
+            return []
+        self._merge_vocabulary()
+
+        postings = self._postings
+        expanded = []
+        for term in terms:
+            start, end = self._prefix_range(term)
+            if cap is not None and end - start > cap:
+                # Каждое слово словаря дает хотя бы один URL - оценка снизу уже больше порога
+                expanded.append((end - start, term, None))
+                continue
+            tokens = []
+            size = 0
+            for token in self._vocabulary[start:end]:
+                posting = postings.get(token)
+                if posting is not None:
+                    tokens.append(token)
+                    size += len(posting) if posting.__class__ is set else 1
+            if not tokens:
+                return []
+            expanded.append((size, term, tokens))
+        expanded.sort()
+        return expanded
+
+    def intersect(self, expanded):
+        """Пересекает множества URL раскрытых слов, начиная с самого редкого"""
+        result = set()
+        for index, (size, term, tokens) in enumerate(expanded):
+            if index and len(result) * 10 < size:
+                # Кандидатов уже мало - проверить их слова дешевле, чем объединять большие множества
+                match_term = self.match_terms([(size, term, tokens)])
+                result = {url for url in result if self.matches(url, match_term)}
+                if not result:
+                    break
+                continue
+            if tokens is None:
+                tokens = self._prefix_tokens(term)
+            # Следующие слова только сужают результат: объединение их множеств не строится
+            result = self._union(tokens) if index == 0 else self._restrict(result, tokens)
+            if not result:
+                break
+        return result
+
+    def _union(self, tokens):
+        if len(tokens) == 1:
+            # Результат только для чтения, поэтому единственное множество не копируем
+            return self._posting(tokens[0])
+        result = set()
+        postings = self._postings
+        for token in tokens:
+            posting = postings[token]
+            if posting.__class__ is set:
+                result |= posting
+            else:
+                result.add(posting)
+        return result
+
+    def _restrict(self, result, tokens):
+        # URL результата, которые есть в множестве хотя бы одного слова; & перебирает меньшее множество
+        found = set()
+        postings = self._postings
+        for token in tokens:
+            posting = postings[token]
+            if posting.__class__ is set:
+                found |= result & posting
+            elif posting in result:
+                found.add(posting)
+        return found
+
+    def match_terms(self, expanded):
+        """Слова запроса для matches: раскрытый префикс - множеством слов словаря, иначе сам префикс"""
+        return [frozenset(tokens) if tokens is not None and len(tokens) <= self.MATCH_SET_LIMIT else term
+                for size, term, tokens in expanded]
+
+    def matches(self, url, terms):
+        """Проверяет, что каждое слово запроса - префикс одного из слов записи.
+        Слово запроса - строка-префикс или множество слов словаря из match_terms"""
+        tokens = self._doc_tokens.get(url, ())
+        # Обычные циклы вместо all/any с генераторами: метод вызывается на каждую запись при просмотре
+        for term in terms:
+            if term.__class__ is frozenset:
+                # Проверка множества идет в C и не зависит от длины префикса
+                if term.isdisjoint(tokens):
+                    return False
+                continue
+            for token in tokens:
+                if token.startswith(term):
+                    break
+            else:
+                return False
+        return True
+
+    def candidates(self, query):
+        """Возвращает URL, в которых каждое слово запроса встречается как префикс слова"""
+        return self.intersect(self.expand(query))
+
+class BookmarkSearchIndex(HistorySearchIndex):
+    """Префиксный индекс закладок по названию, хосту и категории; ключ - сама закладка"""
+
+    @classmethod
+    def query_terms(cls, query):
+        # При наборе фильтр работает уже с первой буквы
+        return [token for token in cls.TOKEN_RE.findall(query.lower()) if token not in cls.STOP_TOKENS]
+
+    def add(self, bookmark):
+        """Индексирует закладку"""
+        host = url_host(bookmark.url or "")
+        self.index_tokens(bookmark, self.tokenize(bookmark.title or "") + self.tokenize(host)
+                          + self.tokenize(bookmark.category or ""))
+
+    def rebuild(self, bookmarks):
+        """Перестраивает индекс для списка закладок"""
+        self.clear()
+        for bookmark in bookmarks:
+            self.add(bookmark)
+        # Сортируем словарь сразу, а не на первом нажатии клавиши
+        self._merge_vocabulary()
+
+class HistoryStore:
+    """История посещений: индекс по URL, порядок по последнему визиту и корзины по дням"""
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    SEARCH_HALF_LIFE_DAYS = 14
+    RANK_DECAY = math.log(2) / (SEARCH_HALF_LIFE_DAYS * 86400)
+    SEARCH_SCAN_THRESHOLD = 20000  # Если самое редкое слово запроса чаще, поиск начинается с просмотра
+    SEARCH_SCAN_LIMIT = 4000  # Сколько свежих записей просмотреть самое большее (около 7 мс на 500 тыс.)
+    SEARCH_INTERSECT_COST = 16  # Элементов множеств слов пересечение обходит за время просмотра одной записи
+    _hosts = None  # В старых pickle полей нет
+    _hosts_pending = None
+
+    def __init__(self, items=()):
+        # URL -> запись; порядок ключей = порядок последних посещений (старые в начале).
+        # dict хранит порядок вставки, поэтому перенос в конец (del + вставка) - O(1)
+        self._recent = {}
+        # День (ordinal) -> {URL: запись} в порядке посещений
+        self._buckets = {}
+        self._days = []  # Отсортированные ключи корзин для выборок по диапазону дат
+        # URL -> ключ ранжирования log(посещения) + λ·время; порядок по нему совпадает
+        # с порядком по посещениям с экспоненциальным затуханием, но не зависит от текущего времени
+        self._rank = {}
+        self._max_visits = 1  # Верхняя граница числа посещений для раннего выхода из поиска
+        self._needs_sort = False
+        self.revision = 0  # Растет при каждом изменении, чтобы представления знали о сдвиге строк
+        # Полнотекстовый индекс обновляется вместе с историей, без перестроения
+        self.search_index = HistorySearchIndex()
+        # Индекс хостов строится в фоне (start_hosts_build/finish_hosts_build) и дальше меняется с историей
+        self._hosts = None
+        self._hosts_pending = None  # Изменения, пришедшие во время фоновой постройки
+        if items:
+            for item in sorted(items, key=lambda item: item.visit_time):
+                if item.url in self._recent:
+                    self._unlink(item.url)
+                self._link(item)
+                self.search_index.add(item.url, item.title)
+
+    @classmethod
+    def to_epoch(cls, visit_time):
+        """Переводит время посещения в целые секунды epoch"""
+        if isinstance(visit_time, int):
+            return visit_time
+        if isinstance(visit_time, float):
+            return int(visit_time)
+        try:
+            return int(datetime.fromisoformat(visit_time).timestamp())
+        except (TypeError, ValueError):
+            return 0
+
+    @classmethod
+    def format_time(cls, epoch):
+        """Переводит секунды epoch в строку для показа и хранения"""
+        return datetime.fromtimestamp(epoch).strftime(cls.TIME_FORMAT) if epoch else ""
+
+    @classmethod
+    def day_key(cls, visit_time):
+        """Возвращает номер дня для времени посещения"""
+        if isinstance(visit_time, (int, float)):
+            return datetime.fromtimestamp(visit_time).toordinal()
+        try:
+            return datetime.fromisoformat(visit_time[:10]).toordinal()
+        except (TypeError, ValueError):
+            return 0
+
+    def __len__(self):
+        return len(self._recent)
+
+    def __bool__(self):
+        return bool(self._recent)
+
+    def __contains__(self, url):
+        return url in self._recent
+
+    def __iter__(self):
+        """Перебирает записи от самых давних к самым свежим"""
+        self._ensure_order()
+        return iter(list(self._recent.values()))
+
+    def get(self, url):
+        """Возвращает запись по URL за O(1)"""
+        return self._recent.get(url)
+
+    def rank(self, url):
+        """Ключ ранжирования записи; для URL вне истории - минус бесконечность"""
+        return self._rank.get(url, -math.inf)
+
+    @property
+    def hosts(self):
+        """Индекс хостов по частоте и давности посещений; если он еще не готов, строится сразу"""
+        if self._hosts is None:
+            self._hosts = HostFrecencyIndex.from_ranks(self._rank.items())
+            self._hosts_pending = None
+        return self._hosts
+
+    @property
+    def hosts_ready(self):
+        """Индекс хостов, если он уже построен, иначе None"""
+        return self._hosts
+
+    def start_hosts_build(self):
+        """Снимок ключей для постройки индекса хостов в фоне; None - индекс уже есть или строится"""
+        if self._hosts is not None or self._hosts_pending is not None:
+            return None
+        self._hosts_pending = []
+        # Копия словаря не создает кортежей и в разы быстрее списка пар
+        return dict(self._rank)
+
+    def finish_hosts_build(self, index):
+        """Принимает индекс, построенный в фоне, и досчитывает изменения истории за время постройки"""
+        if self._hosts is not None or self._hosts_pending is None:
+            return False
+        for url, old, new in self._hosts_pending:
+            index.change(url, old, new)
+        self._hosts, self._hosts_pending = index, None
+        return True
+
+    def _host_change(self, url, old, new):
+        # Индекс хостов получает прежний и новый ключ записи (None - записи нет)
+        if self._hosts is not None:
+            self._hosts.change(url, old, new)
+        elif self._hosts_pending is not None:
+            self._hosts_pending.append((url, old, new))
+
+    def add(self, item):
+        """Добавляет запись (или заменяет запись с тем же URL)"""
+        old = self._rank.get(item.url)
+        if old is not None:
+            self._unlink(item.url)
+        last = next(reversed(self._recent.values()), None) if self._recent else None
+        if last is not None and item.visit_time < last.visit_time:
+            # Запись старее последней - порядок восстановим при следующем запросе
+            self._needs_sort = True
+        self._link(item)
+        self.search_index.add(item.url, item.title)
+        self._host_change(item.url, old, self._rank[item.url])
+        return item
+
+    def record_visit(self, url, title, visit_time=None):
+        """Отмечает посещение URL: O(1) поиск и перенос записи в конец"""
+        visit_time = int(time.time()) if visit_time is None else self.to_epoch(visit_time)
+        item = self._recent.get(url)
+        old = self._rank.get(url)
+        if item is None:
+            item = HistoryItem(url, title, visit_time, 1)
+        else:
+            self._unlink(url)
+            item.visit_count += 1
+            item.visit_time = visit_time
+            item.title = title
+        self._link(item)
+        self.search_index.add(url, title)
+        self._host_change(url, old, self._rank[url])
+        return item
+
+    def remove(self, url):
+        """Удаляет запись по URL"""
+        if url in self._recent:
+            self.search_index.remove(url)
+            self._host_change(url, self._rank[url], None)
+            return self._unlink(url)
+        return None
+
+    def clear(self):
+        """Очищает историю"""
+        self._clear_order()
+        self.search_index.clear()
+        # Пустой истории соответствует пустой индекс; незаконченная фоновая постройка больше не нужна
+        self._hosts = HostFrecencyIndex()
+        self._hosts_pending = None
+
+    def search(self, query, limit=50, budget=None):
+        """Ищет по словам URL и заголовка; ранжирует по числу посещений и давности.
+        budget - сколько свежих записей проверить при широком запросе; ответ тогда приближенный"""
+        expanded = self.search_index.expand(query, budget)
+        if not expanded:
+            return []
+        if expanded[0][0] > (self.SEARCH_SCAN_THRESHOLD if budget is None else budget):
+            # Пересечение обходит множества всех слов целиком; оценка в записях просмотра
+            intersect_cost = sum(size for size, _, _ in expanded) // self.SEARCH_INTERSECT_COST
+            found = self._scan_recent(self.search_index.match_terms(expanded), limit, budget, intersect_cost)
+            if found is not None:
+                return found
+        urls = self.search_index.intersect(expanded)
+        rank = self._rank
+        if len(urls) > limit * 8:
+            # Сначала порог по одним ключам (без обертки key=), затем ранжируются только записи выше него
+            keys = list(map(rank.__getitem__, urls))
+            cutoff = heapq.nlargest(limit, keys)[-1]
+            above = [url for url, key in zip(urls, keys) if key > cutoff]
+            # Равные порогу nlargest берет в порядке перебора, поэтому нужны только первые из них
+            equal = (url for url, key in zip(urls, keys) if key == cutoff)
+            urls = above + list(itertools.islice(equal, limit - len(above)))
+        return [self._recent[url] for url in heapq.nlargest(limit, urls, key=rank.__getitem__)]
+
+    def _scan_recent(self, terms, limit, budget=None, intersect_cost=None):
+        # Широкий запрос: идем от свежих записей. Ключ записи не больше log(max посещений) + λ·время,
+        # поэтому как только эта граница не выше худшего из найденных, лучших записей дальше нет.
+        # Если лучшие не нашлись за intersect_cost записей, дальше дешевле пересечь множества (None).
+        # Если дорого и пересечение (все слова частые, а их сочетание редкое), отдаем лучшее
+        # из SEARCH_SCAN_LIMIT свежих записей: точный ответ стоил бы десятки миллисекунд
+        if budget is None:
+            switch = intersect_cost is not None and intersect_cost <= self.SEARCH_SCAN_LIMIT
+            budget = intersect_cost if switch else self.SEARCH_SCAN_LIMIT
+        else:
+            switch = False
+        self._ensure_order()
+        rank = self._rank
+        matches = self.search_index.matches
+        top_visits = math.log(max(1, self._max_visits))
+        best = []
+        scanned = 0
+        for item in reversed(self._recent.values()):
+            key = rank[item.url]
+            if len(best) >= limit and key - math.log(max(1, item.visit_count)) + top_visits <= best[0][0]:
+                break
+            scanned += 1
+            if scanned > budget:
+                if switch:
+                    return None
+                # Бюджет исчерпан - отдаем лучшее из просмотренного
+                break
+            if matches(item.url, terms):
+                if len(best) < limit:
+                    heapq.heappush(best, (key, scanned, item))
+                elif key > best[0][0]:
+                    heapq.heapreplace(best, (key, scanned, item))
+        return [item for _, _, item in sorted(best, key=lambda entry: (-entry[0], entry[1]))]
+
+    def recent(self, limit=None, since_days=None):
+        """Возвращает записи от самых свежих; since_days=0 - только сегодня"""
+        result = []
+        for item in self.iter_recent(since_days):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(item)
+        return result
+
+    def iter_recent(self, since_days=None):
+        """Перебирает записи от самых свежих, при необходимости только за последние дни"""
+        self._ensure_order()
+        if since_days is None:
+            yield from reversed(self._recent.values())
+            return
+        first_day = datetime.now().toordinal() - since_days
+        start = bisect.bisect_left(self._days, first_day)
+        for day in reversed(self._days[start:]):
+            yield from reversed(self._buckets[day].values())
+
+    def count_since(self, since_days):
+        """Количество записей за последние дни (без перебора записей)"""
+        first_day = datetime.now().toordinal() - since_days
+        start = bisect.bisect_left(self._days, first_day)
+        return sum(len(self._buckets[day]) for day in self._days[start:])
+
+    def _link(self, item):
+        self.revision += 1
+        day = self.day_key(item.visit_time)
+        self._recent[item.url] = item
+        self._rank[item.url] = math.log(max(1, item.visit_count)) + self.RANK_DECAY * item.visit_time
+        if item.visit_count > self._max_visits:
+            self._max_visits = item.visit_count
+        bucket = self._buckets.get(day)
+        if bucket is None:
+            bucket = self._buckets[day] = {}
+            bisect.insort(self._days, day)
+        bucket[item.url] = item
+
+    def _unlink(self, url):
+        self.revision += 1
+        item = self._recent.pop(url)
+        day = self.day_key(item.visit_time)
+        del self._rank[url]
+        bucket = self._buckets[day]
+        del bucket[url]
+        if not bucket:
+            del self._buckets[day]
+            del self._days[bisect.bisect_left(self._days, day)]
+        return item
+
+    def _clear_order(self):
+        self.revision += 1
+        self._recent.clear()
+        self._buckets.clear()
+        self._days.clear()
+        self._rank.clear()
+        self._max_visits = 1
+        self._needs_sort = False
+
+    def _ensure_order(self):
+        if not self._needs_sort:
+            return
+        items = sorted(self._recent.values(), key=lambda item: item.visit_time)
+        self._clear_order()
+        for item in items:
+            self._link(item)
+
+class HostFrecencyIndex:
+    """Хосты истории с суммарным ключом частоты и давности посещений; меняется вместе с историей"""
+    SHORT_PREFIX = 3  # Лучший хост для префиксов до этой длины хранится готовым
+    SCAN_LIMIT = 5000  # Сколько хостов с длинным префиксом сравнить на одно нажатие клавиши
+    TYPO_MIN_LENGTH = 4
+    TOP_SIZE = 32  # Столько лучших хостов поддерживается готовыми
+    SECOND_LEVEL = {"co", "com", "org", "net", "gov", "edu", "ac", "msk", "spb"}
+
+    def __init__(self):
+        # Хост -> log(сумма e^ключ по записям истории хоста); масштаб тот же, что у ключей HistoryStore,
+        # поэтому порядок хостов не зависит от текущего времени
+        self.keys = {}
+        self.counts = {}  # Хост -> число записей истории; хост без записей удаляется
+        self._hosts = []  # Отсортированные хосты для поиска по префиксу
+        self._best_short = {}  # Короткий префикс -> лучший хост
+        self._stale_prefixes = set()  # Короткие префиксы, чей лучший хост потерял ключ
+        self._deletes = {}  # Имя сайта и его варианты без одной буквы -> хосты (поиск с опечаткой)
+        self._top = []  # Лучшие хосты по убыванию ключа
+        self._top_dirty = False  # Ключ хоста из топа уменьшился - топ пересчитается при чтении
+        self.revision = 0
+        self.top_revision = 0  # Растет, только когда меняется состав или порядок лучших хостов
+        self.build_ms = 0.0  # Время постройки по всей истории
+
+    @classmethod
+    def from_ranks(cls, ranks):
+        """Строит индекс по парам (URL, ключ записи истории): суммы по хостам, затем одна сортировка"""
+        started = time.perf_counter()
+        index = cls()
+        ranks = list(ranks)
+        if not ranks:
+            return index
+        # Суммы считаются относительно самого свежего ключа: за десятилетия истории разность
+        # не выходит за пару сотен, так что exp не обнуляется и log берется один раз на хост
+        top = max(key for _, key in ranks)
+        # Сначала суммируем по хосту как он записан в URL, нормализуем только разные хосты
+        raw_sums, raw_counts = {}, {}
+        match_host = HOST_RE.match
+        exp = math.exp
+        for url, key in ranks:
+            match = match_host(url)
+            if match:
+                raw = match.group(1)
+                raw_sums[raw] = raw_sums.get(raw, 0.0) + exp(key - top)
+                raw_counts[raw] = raw_counts.get(raw, 0) + 1
+        sums, counts = {}, index.counts
+        for raw, total in raw_sums.items():
+            host = raw.lower()
+            host = host[4:] if host.startswith("www.") else host
+            if host:
+                sums[host] = sums.get(host, 0.0) + total
+                counts[host] = counts.get(host, 0) + raw_counts[raw]
+        index.keys.update((host, top + math.log(total)) for host, total in sums.items())
+        index._hosts = sorted(index.keys)
+        for host in index._hosts:
+            index._index_label(host)
+            index._update_best(host)
+        index._top = heapq.nlargest(cls.TOP_SIZE, index.keys, key=index.keys.__getitem__)
+        index.top_revision += 1
+        index.build_ms = (time.perf_counter() - started) * 1000
+        return index
+
+    @staticmethod
+    def host_of(url):
+        """Хост URL в нижнем регистре без www."""
+        host = url_host(url)
+        return host[4:] if host.startswith("www.") else host
+
+    @classmethod
+    def site_label(cls, host):
+        """Имя сайта: метка перед доменом верхнего уровня (github в gist.github.com, bbc в bbc.co.uk)"""
+        labels = host.split(".")
+        if len(labels) >= 3 and labels[-2] in cls.SECOND_LEVEL:
+            return labels[-3]
+        return labels[-2] if len(labels) >= 2 else labels[0]
+
+    @staticmethod
+    def deletes(word):
+        """Варианты слова без одной буквы"""
+        return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+    @staticmethod
+    def typo_distance(first, second):
+        """Расстояние Дамерау-Левенштейна: вставка, удаление, замена и перестановка соседних букв"""
+        previous, current = None, list(range(len(second) + 1))
+        for i in range(1, len(first) + 1):
+            before, previous, current = previous, current, [i] + [0] * len(second)
+            for j in range(1, len(second) + 1):
+                cost = first[i - 1] != second[j - 1]
+                current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                    current[j] = min(current[j], before[j - 2] + 1)
+        return current[-1]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, host):
+        return host in self.keys
+
+    def add(self, host, key):
+        """Добавляет к сумме хоста вклад e^key"""
+        old = self.keys.get(host)
+        if old is None:
+            self.keys[host] = key
+            bisect.insort(self._hosts, host)
+            self._index_label(host)
+        else:
+            # log(e^old + e^key) без переполнения: λ·время порядка тысячи
+            high, low = (old, key) if old >= key else (key, old)
+            self.keys[host] = high + math.log1p(math.exp(low - high))
+        self._update_best(host)
+        self._update_top(host)
+        self.revision += 1
+
+    def reduce(self, host, key):
+        """Вычитает из суммы хоста вклад e^key"""
+        old = self.keys[host]
+        # Остаток меньше точности float значит, что оставшиеся записи хоста старше вычтенной больше
+        # чем на полтора года (log 1e-12 при периоде полураспада 14 дней); ключ ставится на эту верхнюю оценку
+        self.keys[host] = old + math.log1p(-min(math.exp(key - old), 1 - 1e-12))
+        self._lower(host)
+
+    def change(self, url, old, new):
+        """Учитывает изменение записи истории: прежний и новый ключ записи (None - записи нет)"""
+        host = self.host_of(url)
+        if not host or old == new:
+            return
+        if old is None:
+            self.counts[host] = self.counts.get(host, 0) + 1
+            self.add(host, new)
+        elif new is None:
+            self.counts[host] -= 1
+            if self.counts[host]:
+                self.reduce(host, old)
+            else:
+                self._drop(host)
+        elif new > old:
+            # Сумма выросла на e^new - e^old
+            self.add(host, new + math.log1p(-math.exp(old - new)))
+        else:
+            self.reduce(host, old + math.log1p(-math.exp(new - old)))
+
+    def complete(self, prefix):
+        """Лучший хост, который начинается с префикса"""
+        if len(prefix) <= self.SHORT_PREFIX:
+            if prefix in self._stale_prefixes:
+                self._stale_prefixes.discard(prefix)
+                best = self._best_of(prefix)
+                if best is None:
+                    self._best_short.pop(prefix, None)
+                else:
+                    self._best_short[prefix] = best
+            return self._best_short.get(prefix)
+        return self._best_of(prefix, self.SCAN_LIMIT)
+
+    def _best_of(self, prefix, limit=None):
+        start = bisect.bisect_left(self._hosts, prefix)
+        end = bisect.bisect_left(self._hosts, prefix + "\uffff")
+        if limit is not None:
+            end = min(end, start + limit)
+        if start == end:
+            return None
+        return max(self._hosts[start:end], key=self.keys.__getitem__)
+
+    def typo_matches(self, text, limit=3):
+        """Хосты, имя сайта которых отличается от набранного не больше чем на одну букву"""
+        label = self.site_label(text)
+        if len(label) < self.TYPO_MIN_LENGTH:
+            return []
+        candidates = set()
+        for variant in self.deletes(label) | {label}:
+            candidates.update(self._deletes.get(variant, ()))
+        found = [host for host in candidates if self.typo_distance(label, self.site_label(host)) <= 1]
+        return heapq.nlargest(limit, found, key=self.keys.__getitem__)
+
+    def top(self, limit):
+        """Самые посещаемые хосты (до TOP_SIZE - готовый список, без перебора)"""
+        if self._top_dirty:
+            self._top = heapq.nlargest(self.TOP_SIZE, self.keys, key=self.keys.__getitem__)
+            self._top_dirty = False
+        if limit <= self.TOP_SIZE:
+            return self._top[:limit]
+        return heapq.nlargest(limit, self.keys, key=self.keys.__getitem__)
+
+    def _index_label(self, host):
+        label = self.site_label(host)
+        if len(label) >= self.TYPO_MIN_LENGTH:
+            for variant in self.deletes(label) | {label}:
+                self._deletes.setdefault(variant, []).append(host)
+
+    def _update_best(self, host):
+        # Ключ вырос, поэтому лучшему хосту префикса достаточно сравнения с новым ключом
+        key = self.keys[host]
+        best_short = self._best_short
+        for length in range(1, min(len(host), self.SHORT_PREFIX) + 1):
+            prefix = host[:length]
+            if prefix in self._stale_prefixes:
+                continue
+            best = best_short.get(prefix)
+            if best is None or self.keys[best] <= key:
+                best_short[prefix] = host
+
+    def _update_top(self, host):
+        # Ключ вырос: хост из топа может лишь подняться, а чужой войти в топ только
+        # при собственном росте - поэтому список точен без пересчета
+        if self._top_dirty:
+            return
+        top, keys = self._top, self.keys
+        key = keys[host]
+        if host in top:
+            index = top.index(host)
+            if index == 0 or keys[top[index - 1]] >= key:
+                return
+            del top[index]
+        elif len(top) >= self.TOP_SIZE and keys[top[-1]] >= key:
+            return
+        index = 0
+        while index < len(top) and keys[top[index]] >= key:
+            index += 1
+        top.insert(index, host)
+        del top[self.TOP_SIZE:]
+        self.top_revision += 1
+
+    def _lower(self, host):
+        # Ключ уменьшился (удаление записи): префиксы, где хост был лучшим, и топ с ним
+        # пересчитываются при следующем чтении - удаление многих записей не пересчитывает их каждый раз
+        for length in range(1, min(len(host), self.SHORT_PREFIX) + 1):
+            prefix = host[:length]
+            if self._best_short.get(prefix) == host:
+                self._stale_prefixes.add(prefix)
+        if host in self._top:
+            self._top_dirty = True
+            self.top_revision += 1
+        self.revision += 1
+
+    def _drop(self, host):
+        # У хоста не осталось записей истории
+        self._lower(host)
+        del self.keys[host]
+        del self.counts[host]
+        del self._hosts[bisect.bisect_left(self._hosts, host)]
+        label = self.site_label(host)
+        if len(label) >= self.TYPO_MIN_LENGTH:
+            for variant in self.deletes(label) | {label}:
+                hosts = self._deletes[variant]
+                hosts.remove(host)
+                if not hosts:
+                    del self._deletes[variant]
+
 class UserAccount:
+    __slots__ = ("username", "password_hash", "created_date", "last_login", "settings", "bookmarks", "history",
+                 "data_loaded")
+
     def __init__(self, username, password_hash):
         self.username = username
         self.password_hash = password_hash
         self.created_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.last_login = None
         self.settings = {}
-        self.bookmarks = []
-        self.history = []
+        self.bookmarks = BookmarkTree()
+        self.history = HistoryStore()
+        self.data_loaded = True  # False - история, закладки и настройки еще в базе
+
+    def __getstate__(self):
+        return {name: getattr(self, name, None) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        # Старые pickle хранят __dict__; отсутствующие в них поля получают значения по умолчанию
+        self.__init__(state.get("username"), state.get("password_hash"))
+        for name in self.__slots__:
+            if name in state:
+                setattr(self, name, state[name])
+
+class ProfileStore:
+    """Хранилище профилей пользователей в SQLite (таблица на каждую сущность)"""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL,
+            created_date TEXT,
+            last_login TEXT
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            username TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT,
+            visit_time TEXT,
+            visit_count INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (username, url)
+        );
+        CREATE TABLE IF NOT EXISTS bookmarks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            title TEXT,
+            url TEXT NOT NULL,
+            added_date TEXT,
+            category TEXT,
+            icon TEXT,
+            parent_id INTEGER,
+            position REAL
+        );
+        CREATE INDEX IF NOT EXISTS bookmarks_by_user ON bookmarks (username);
+        CREATE TABLE IF NOT EXISTS bookmark_folders (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            title TEXT,
+            parent_id INTEGER,
+            position REAL,
+            created_date TEXT
+        );
+        CREATE INDEX IF NOT EXISTS bookmark_folders_by_user ON bookmark_folders (username);
+        CREATE TABLE IF NOT EXISTS settings (
+            username TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT,
+            PRIMARY KEY (username, key)
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS session_tabs (
+            username TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            url TEXT,
+            title TEXT,
+            is_homepage INTEGER NOT NULL DEFAULT 0,
+            is_incognito INTEGER NOT NULL DEFAULT 0,
+            is_current INTEGER NOT NULL DEFAULT 0,
+            history BLOB,
+            PRIMARY KEY (username, position)
+        );
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Запись идет из фонового потока сохранения, чтение - из потока GUI
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._add_missing_columns("bookmarks", {"parent_id": "INTEGER", "position": "REAL"})
+        self.conn.commit()
+        self._id_lock = threading.Lock()
+        self._next_ids = {}
+
+    def _add_missing_columns(self, table, columns):
+        # Базы, созданные до появления папок закладок
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns.items():
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    def next_id(self, table):
+        """Выдает новый id для закладки или папки без обращения к диску.
+        Узел получает постоянный id сразу, а строка запишется позже в фоне"""
+        if table not in self._next_ids:
+            # Порядок блокировок как у фонового потока: сначала база, потом счетчик
+            with self.lock:
+                row = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+                with self._id_lock:
+                    self._next_ids.setdefault(table, row[0] + 1)
+        with self._id_lock:
+            next_id = self._next_ids[table]
+            self._next_ids[table] += 1
+        return next_id
+
+    def close(self):
+        """Закрывает соединение с базой"""
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def row_size(values):
+        """Оценивает объем данных строки в байтах"""
+        size = 0
+        for value in values:
+            if isinstance(value, str):
+                size += len(value.encode('utf-8'))
+            elif isinstance(value, bytes):
+                size += len(value)
+            else:
+                size += 8
+        return size
 
-class BrowserTab(QWidget):
-    """Вкладка браузера"""
-    def __init__(self, parent_browser=None, url=None, is_homepage=False, is_incognito=False):
-        super().__init__()
-        self.layout = QVBoxLayout(self)
-        self.layout.setContentsMargins(0, 0, 0, 0)
-        self.is_homepage = is_homepage
-        self.is_incognito = is_incognito
-        self.parent_browser = parent_browser
+    def get_meta(self, key, default=None):
+        """Возвращает служебное значение"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
 
-        if is_homepage:
-            # Для главной страницы создаем кастомный виджет
-            self.create_homepage()
+    def set_meta(self, key, value):
+        """Сохраняет служебное значение"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        return self.row_size((key, value))
+
+    def load_users(self):
+        """Загружает индекс учетных записей (без истории, закладок и настроек)"""
+        users = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT username, password_hash, created_date, last_login FROM users"
+            ).fetchall()
+        for username, password_hash, created_date, last_login in rows:
+            user = UserAccount(username, password_hash)
+            user.created_date = created_date
+            user.last_login = last_login
+            user.data_loaded = False
+            users[username] = user
+        return users
+
+    def load_user_data(self, user):
+        """Загружает историю, закладки и настройки пользователя"""
+        with self.lock:
+            self._load_user_data(user)
+        user.data_loaded = True
+
+    def _load_user_data(self, user):
+        user.history = HistoryStore(
+            HistoryItem(url, title or "", visit_time, visit_count)
+            for url, title, visit_time, visit_count in self.conn.execute(
+                "SELECT url, title, visit_time, visit_count FROM history "
+                "WHERE username = ?", (user.username,)
+            )
+        )
+
+        folders = []
+        for folder_id, title, parent_id, position, created_date in self.conn.execute(
+            "SELECT id, title, parent_id, position, created_date FROM bookmark_folders "
+            "WHERE username = ?", (user.username,)
+        ):
+            folder = BookmarkFolder(title or "", parent_id, position)
+            folder.id = folder_id
+            folder.created_date = created_date
+            folders.append(folder)
+
+        bookmarks = []
+        for bookmark_id, title, url, added_date, category, icon, parent_id, position in self.conn.execute(
+            "SELECT id, title, url, added_date, category, icon, parent_id, position FROM bookmarks "
+            "WHERE username = ? ORDER BY id", (user.username,)
+        ):
+            bookmark = Bookmark(title or "", url, added_date, category or "General", icon or "⭐")
+            bookmark.id = bookmark_id
+            bookmark.parent_id = parent_id
+            bookmark.position = position
+            bookmarks.append(bookmark)
+        user.bookmarks = BookmarkTree(bookmarks, folders)
+
+        user.settings = {}
+        for key, value in self.conn.execute(
+            "SELECT key, value FROM settings WHERE username = ?", (user.username,)
+        ):
+            user.settings[key] = json.loads(value)
+
+    def save_user(self, user):
+        """Сохраняет строку учетной записи"""
+        with self.lock, self.conn:
+            return self._upsert_user(user)
+
+    def update_last_login(self, username, last_login):
+        """Обновляет время входа одной строкой, не трогая остальных пользователей"""
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE users SET last_login = ? WHERE username = ?", (last_login, username))
+        return self.row_size((username, last_login))
+
+    def save_users(self, users):
+        """Сохраняет строки всех учетных записей (без истории и закладок)"""
+        with self.lock, self.conn:
+            return sum(self._upsert_user(user) for user in users)
+
+    def _upsert_user(self, user):
+        values = (user.username, user.password_hash, user.created_date, user.last_login)
+        self.conn.execute(
+            "INSERT INTO users (username, password_hash, created_date, last_login) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET password_hash = excluded.password_hash, "
+            "created_date = excluded.created_date, last_login = excluded.last_login",
+            values
+        )
+        return self.row_size(values)
+
+    def save_history_item(self, username, item):
+        """Добавляет или обновляет одну запись истории"""
+        with self.lock, self.conn:
+            return self._upsert_history(username, item)
+
+    def _upsert_history(self, username, item):
+        values = (username, item.url, item.title, item.visit_time_text, item.visit_count)
+        self.conn.execute(
+            "INSERT INTO history (username, url, title, visit_time, visit_count) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(username, url) DO UPDATE SET title = excluded.title, "
+            "visit_time = excluded.visit_time, visit_count = excluded.visit_count",
+            values
+        )
+        return self.row_size(values)
+
+    def fold_history(self, username, items, meta_key, seq):
+        """Сворачивает записи журнала в таблицу истории одной транзакцией"""
+        with self.lock, self.conn:
+            written = sum(self._upsert_history(username, item) for item in items)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (meta_key, str(seq)))
+        return written
+
+    def clear_history(self, username):
+        """Удаляет всю историю пользователя"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM history WHERE username = ?", (username,))
+        return 0
+
+    def save_bookmark(self, username, bookmark):
+        """Добавляет или обновляет одну закладку"""
+        with self.lock, self.conn:
+            return self._upsert_bookmark(username, bookmark)
+
+    def _upsert_bookmark(self, username, bookmark):
+        if getattr(bookmark, 'id', None) is None:
+            bookmark.id = self.next_id("bookmarks")
+        values = (bookmark.id, username, bookmark.title, bookmark.url, bookmark.added_date_text,
+                  bookmark.category, bookmark.icon, getattr(bookmark, 'parent_id', None),
+                  getattr(bookmark, 'position', None))
+        self.conn.execute(
+            "INSERT INTO bookmarks (id, username, title, url, added_date, category, icon, parent_id, position) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, url = excluded.url, "
+            "added_date = excluded.added_date, category = excluded.category, icon = excluded.icon, "
+            "parent_id = excluded.parent_id, position = excluded.position",
+            values
+        )
+        return self.row_size(values)
+
+    def save_bookmark_folder(self, username, folder):
+        """Добавляет или обновляет одну папку закладок"""
+        values = (folder.id, username, folder.title, folder.parent_id, folder.position, folder.created_date)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO bookmark_folders (id, username, title, parent_id, position, created_date) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET title = excluded.title, parent_id = excluded.parent_id, "
+                "position = excluded.position",
+                values
+            )
+        return self.row_size(values)
+
+    def delete_bookmark_folder(self, folder_id):
+        """Удаляет папку закладок по id"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM bookmark_folders WHERE id = ?", (folder_id,))
+        return 0
+
+    def delete_bookmark(self, bookmark_id):
+        """Удаляет закладку по id"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM bookmarks WHERE id = ?", (bookmark_id,))
+        return 0
+
+    def save_settings(self, username, settings):
+        """Сохраняет настройки пользователя (строка на каждый ключ)"""
+        rows = [(username, key, json.dumps(value, ensure_ascii=False)) for key, value in settings.items()]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO settings (username, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(username, key) DO UPDATE SET value = excluded.value",
+                rows
+            )
+        return sum(self.row_size(row) for row in rows)
+
+    def save_tabs(self, username, tabs):
+        """Заменяет сохраненный набор открытых вкладок пользователя одной транзакцией"""
+        rows = [(username, position, tab["url"], tab["title"], int(tab["is_homepage"]),
+                 int(tab["is_incognito"]), int(tab["is_current"]), tab["history"])
+                for position, tab in enumerate(tabs)]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM session_tabs WHERE username = ?", (username,))
+            self.conn.executemany(
+                "INSERT INTO session_tabs (username, position, url, title, is_homepage, is_incognito, "
+                "is_current, history) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return sum(self.row_size(row) for row in rows)
+
+    def load_tabs(self, username):
+        """Загружает вкладки прошлого сеанса в порядке их расположения"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url, title, is_homepage, is_incognito, is_current, history FROM session_tabs "
+                "WHERE username = ? ORDER BY position", (username,)
+            ).fetchall()
+        return [{"url": url or "", "title": title or "", "is_homepage": bool(is_homepage),
+                 "is_incognito": bool(is_incognito), "is_current": bool(is_current),
+                 "history": bytes(history) if history else None}
+                for url, title, is_homepage, is_incognito, is_current, history in rows]
+
+    def migrate_from_pickle(self, pickle_path):
+        """Однократно переносит пользователей из старого users.pkl"""
+        if self.get_meta("pickle_migrated") or not os.path.exists(pickle_path):
+            return False
+
+        with open(pickle_path, 'rb') as f:
+            users = pickle.load(f)
+
+        with self.lock, self.conn:
+            for username, user in users.items():
+                if not hasattr(user, 'created_date'):
+                    user.created_date = None
+                if not hasattr(user, 'last_login'):
+                    user.last_login = None
+                self._upsert_user(user)
+                for item in getattr(user, 'history', []):
+                    self._upsert_history(username, item)
+                for bookmark in getattr(user, 'bookmarks', []):
+                    bookmark.id = None
+                    self._upsert_bookmark(username, bookmark)
+                settings = getattr(user, 'settings', {}) or {}
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO settings (username, key, value) VALUES (?, ?, ?)",
+                    [(username, key, json.dumps(value, ensure_ascii=False)) for key, value in settings.items()]
+                )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('pickle_migrated', ?)",
+                              (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+
+        # Старый файл оставляем как резервную копию
+        os.replace(pickle_path, pickle_path + ".migrated")
+        print(f"Перенесено пользователей из users.pkl: {len(users)}")
+        return True
+
+class PersistenceWorker(threading.Thread):
+    """Фоновый поток отложенной записи профиля (write-behind)"""
+    def __init__(self, store, delay_ms=1500):
+        super().__init__(name="DerBrowserPersistence", daemon=True)
+        self.store = store
+        self.delay = delay_ms / 1000.0
+        self.condition = threading.Condition()
+        # Ключ -> (функция, аргументы); повторные изменения одного ключа сливаются
+        self.pending = {}
+        self.last_change = 0.0
+        self.force_flush = False
+        self.flushing = False
+        self.running = True
+
+        # Счетчики
+        self.flush_count = 0
+        self.op_count = 0
+        self.bytes_written = 0
+        self.total_flush_time = 0.0
+        self.last_flush_time = 0.0
+        self.max_flush_time = 0.0
+        self.error_count = 0
+
+    def set_delay(self, delay_ms):
+        """Меняет интервал тишины перед записью"""
+        with self.condition:
+            self.delay = max(0, delay_ms) / 1000.0
+            self.condition.notify()
+
+    def schedule(self, key, func, *args):
+        """Помечает данные как измененные; запись произойдет в фоне"""
+        with self.condition:
+            # Перемещаем ключ в конец, чтобы сохранить порядок операций (например, очистка -> новая запись)
+            self.pending.pop(key, None)
+            self.pending[key] = (func, args)
+            self.last_change = time.monotonic()
+            self.condition.notify()
+            stopped = not self.running
+        if stopped:
+            # Поток уже остановлен - пишем сразу
+            self.flush()
+
+    def flush(self, timeout=10.0):
+        """Немедленно записывает все изменения и ждет завершения"""
+        if not self.is_alive():
+            self._write(self._take_pending())
+            return
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.force_flush = True
+            self.condition.notify()
+            while self.pending or self.flushing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("Предупреждение: не дождались записи профиля")
+                    break
+                self.condition.wait(remaining)
+
+    def stop(self):
+        """Финальная запись и остановка потока"""
+        self.flush()
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=5.0)
+
+    def stats(self):
+        """Возвращает счетчики записи"""
+        with self.condition:
+            return {
+                "flushes": self.flush_count,
+                "operations": self.op_count,
+                "bytes_written": self.bytes_written,
+                "last_flush_ms": self.last_flush_time * 1000,
+                "avg_flush_ms": (self.total_flush_time / self.flush_count * 1000) if self.flush_count else 0.0,
+                "max_flush_ms": self.max_flush_time * 1000,
+                "pending": len(self.pending),
+                "errors": self.error_count,
+            }
+
+    def _take_pending(self):
+        with self.condition:
+            ops = list(self.pending.values())
+            self.pending.clear()
+            return ops
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running and not self.pending:
+                    return
+                # Ждем, пока изменения "успокоятся"
+                while self.running and not self.force_flush:
+                    remaining = self.last_change + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                ops = list(self.pending.values())
+                self.pending.clear()
+                self.force_flush = False
+                self.flushing = True
+
+            try:
+                self._write(ops)
+            finally:
+                with self.condition:
+                    self.flushing = False
+                    self.condition.notify_all()
+
+    def _write(self, ops):
+        if not ops:
+            return
+        started = time.perf_counter()
+        written = 0
+        for func, args in ops:
+            try:
+                written += func(*args) or 0
+            except Exception as e:
+                self.error_count += 1
+                print(f"Ошибка фоновой записи профиля: {e}")
+        elapsed = time.perf_counter() - started
+
+        with self.condition:
+            self.flush_count += 1
+            self.op_count += len(ops)
+            self.bytes_written += written
+            self.last_flush_time = elapsed
+            self.total_flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+
+class HistoryJournal:
+    """Журнал посещений пользователя: только дозапись, свертка в SQLite в фоне"""
+    # crc32, seq, visit_time (epoch), visit_count, длина url, длина заголовка
+    RECORD_HEADER = struct.Struct("<IQdIIH")
+    MAX_TITLE_BYTES = 1024
+
+    def __init__(self, journal_dir, username, store, compact_threshold=256 * 1024):
+        os.makedirs(journal_dir, exist_ok=True)
+        name = hashlib.sha1(username.encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(journal_dir, f"{name}.log")
+        self.compacting_path = self.path + ".compacting"
+        self.username = username
+        self.store = store
+        self.compact_threshold = compact_threshold
+        self.meta_key = f"journal_seq:{username}"
+        self.lock = threading.Lock()
+        self.file = None
+        self.size = 0
+        self.snapshot_seq = int(self.store.get_meta(self.meta_key, 0))
+        self.next_seq = self.snapshot_seq + 1
+
+    @classmethod
+    def encode(cls, seq, item):
+        """Кодирует запись журнала"""
+        url = item.url.encode('utf-8')
+        title = (item.title or "").encode('utf-8')[:cls.MAX_TITLE_BYTES]
+        body = cls.RECORD_HEADER.pack(0, seq, HistoryStore.to_epoch(item.visit_time), item.visit_count,
+                                      len(url), len(title))[4:] + url + title
+        return struct.pack("<I", zlib.crc32(body)) + body
+
+    @classmethod
+    def read_records(cls, path):
+        """Читает целые записи; возвращает (записи, смещение конца последней целой записи)"""
+        records = []
+        offset = 0
+        if not os.path.exists(path):
+            return records, offset
+        with open(path, 'rb') as f:
+            data = f.read()
+        header_size = cls.RECORD_HEADER.size
+        while offset + header_size <= len(data):
+            crc, seq, epoch, visit_count, url_len, title_len = cls.RECORD_HEADER.unpack_from(data, offset)
+            end = offset + header_size + url_len + title_len
+            if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+                break  # Недописанная или поврежденная запись - дальше не читаем
+            url_start = offset + header_size
+            url = data[url_start:url_start + url_len].decode('utf-8', 'replace')
+            title = data[url_start + url_len:end].decode('utf-8', 'replace')
+            records.append((seq, HistoryItem(url, title, int(epoch), visit_count)))
+            offset = end
+        return records, offset
+
+    def recover(self, history):
+        """Применяет к истории записи журнала, сделанные после последнего снимка"""
+        with self.lock:
+            replayed = 0
+            for path in (self.compacting_path, self.path):
+                records, good_end = self.read_records(path)
+                if path == self.path and os.path.exists(path) and good_end < os.path.getsize(path):
+                    # Отрезаем недописанный хвост после сбоя
+                    with open(path, 'r+b') as f:
+                        f.truncate(good_end)
+                for seq, record in records:
+                    self.next_seq = max(self.next_seq, seq + 1)
+                    if seq <= self.snapshot_seq:
+                        continue
+                    history.add(record)
+                    replayed += 1
+            self.size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            return replayed
+
+    def append(self, item):
+        """Дописывает одну запись о посещении; возвращает True, если пора сворачивать журнал"""
+        with self.lock:
+            record = self.encode(self.next_seq, item)
+            self.next_seq += 1
+            if self.file is None:
+                self.file = open(self.path, 'ab')
+            self.file.write(record)
+            self.file.flush()
+            self.size += len(record)
+            return self.size >= self.compact_threshold
+
+    def compact(self):
+        """Сворачивает журнал в снимок SQLite (вызывается в фоновом потоке)"""
+        with self.lock:
+            if not os.path.exists(self.compacting_path):
+                if self.size == 0:
+                    return 0
+                # Новые записи пойдут в свежий файл, пока старый сворачивается
+                if self.file is not None:
+                    self.file.close()
+                    self.file = None
+                os.replace(self.path, self.compacting_path)
+                self.size = 0
+
+        records, _ = self.read_records(self.compacting_path)
+        latest = {}
+        last_seq = self.snapshot_seq
+        for seq, record in records:
+            if seq > self.snapshot_seq:
+                latest[record.url] = record
+                last_seq = max(last_seq, seq)
+
+        written = self.store.fold_history(self.username, latest.values(), self.meta_key, last_seq)
+        self.snapshot_seq = last_seq
+        try:
+            os.remove(self.compacting_path)
+        except FileNotFoundError:
+            pass  # Журнал уже очищен
+        return written
+
+    def clear(self):
+        """Удаляет журнал (при очистке истории)"""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            for path in (self.path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.size = 0
+
+    def close(self):
+        """Закрывает файл журнала"""
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+class FilterPattern:
+    """Шаблон правила, компилируемый в регулярное выражение при первой проверке"""
+    __slots__ = ("source", "search")
+
+    def __init__(self, source):
+        self.source = source
+        self.search = self.compile_and_search
+
+    def compile_and_search(self, url):
+        # Большинство правил никогда не проверяется: их токены не встречаются в адресах
+        self.search = re.compile(self.source).search
+        return self.search(url)
+
+class AdFilterEngine:
+    """Фильтры рекламы в формате EasyList, скомпилированные для быстрой проверки запросов"""
+    TOKEN_RE = re.compile(r'[a-z0-9%]{2,}')
+    HOST_RULE_RE = re.compile(r'^\|\|([a-z0-9.-]+)\^?$')
+    # Разделитель "^": любой символ, кроме букв, цифр и _-.%, или конец адреса
+    SEPARATOR = r'(?:[^a-z0-9_.%-]|$)'
+    RESOURCE_TYPES = frozenset({"script", "image", "stylesheet", "object", "xmlhttprequest", "subdocument",
+                                "document", "font", "media", "websocket", "ping", "other", "popup"})
+    TYPE_ALIASES = {"xhr": "xmlhttprequest", "css": "stylesheet", "frame": "subdocument", "doc": "document"}
+    # Без явного типа правило не применяется к самой странице и всплывающим окнам
+    DEFAULT_TYPES = RESOURCE_TYPES - {"document", "popup"}
+    IGNORED_OPTIONS = frozenset({"match-case", "important", "collapse", "~collapse"})
+
+    def __init__(self):
+        self.block_hosts = set()
+        self.allow_hosts = set()
+        # токен -> правила, которые могут сработать только при наличии токена в адресе ("" - без токена)
+        self.block_rules = {}
+        self.allow_rules = {}
+        self.rule_count = 0
+        self.skipped_count = 0
+        self.compile_ms = 0.0
+
+    @classmethod
+    def from_files(cls, paths):
+        """Компилирует фильтры из файлов"""
+        engine = cls()
+        started = time.perf_counter()
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    for line in f:
+                        engine.add_rule(line)
+            except OSError as e:
+                print(f"Ошибка чтения фильтров {path}: {e}")
+        engine.compile_ms = (time.perf_counter() - started) * 1000
+        return engine
+
+    def add_rule(self, line):
+        """Добавляет одно правило; косметические и неподдерживаемые правила пропускаются"""
+        line = line.strip()
+        if not line or line[0] in "![" or "##" in line or "#@#" in line or "#?#" in line or "#$#" in line:
+            return False
+        allow = line.startswith("@@")
+        if allow:
+            line = line[2:]
+
+        pattern, options = line, None
+        if "$" in line and not (line.startswith("/") and line.endswith("/")):
+            pattern, _, option_text = line.rpartition("$")
+            options = self.parse_options(option_text)
+            if options is None:
+                self.skipped_count += 1
+                return False
+        pattern = pattern.lower()
+        # Регулярные выражения слишком медленные для проверки каждого запроса
+        if not pattern or len(pattern) > 2 and pattern.startswith("/") and pattern.endswith("/"):
+            self.skipped_count += 1
+            return False
+
+        host_rule = self.HOST_RULE_RE.match(pattern)
+        if host_rule and options is None:
+            (self.allow_hosts if allow else self.block_hosts).add(host_rule.group(1))
         else:
-            # Создаем WebView для обычных страниц
-            self.browser = QWebEngineView()
-            if url:
-                self.browser.setUrl(QUrl(url))
+            filter_pattern, token = self.compile_pattern(pattern)
+            types, third_party, domains, not_domains = options or (self.DEFAULT_TYPES, None, None, None)
+            rules = self.allow_rules if allow else self.block_rules
+            rules.setdefault(token, []).append((filter_pattern, types, third_party, domains, not_domains))
+        self.rule_count += 1
+        return True
+
+    def parse_options(self, option_text):
+        """Разбирает опции правила; None - правило с неподдерживаемыми опциями"""
+        types, not_types = set(), set()
+        third_party, domains, not_domains = None, set(), set()
+        for option in option_text.lower().split(","):
+            negated = option.startswith("~")
+            name = option.lstrip("~")
+            name = self.TYPE_ALIASES.get(name, name)
+            if name in ("third-party", "3p"):
+                third_party = not negated
+            elif name in ("first-party", "1p"):
+                third_party = negated
+            elif name.startswith("domain="):
+                for domain in name[7:].split("|"):
+                    if domain.startswith("~"):
+                        not_domains.add(domain[1:])
+                    elif domain:
+                        domains.add(domain)
+            elif name in self.RESOURCE_TYPES:
+                (not_types if negated else types).add(name)
+            elif option not in self.IGNORED_OPTIONS:
+                # csp=, redirect=, removeparam= и т.п. меняют ответ, а не блокируют запрос
+                return None
+        if not types:
+            types = (self.RESOURCE_TYPES - {"popup"} if not_types else self.DEFAULT_TYPES) - not_types
+        return frozenset(types), third_party, frozenset(domains) or None, frozenset(not_domains) or None
+
+    def compile_pattern(self, pattern):
+        """Превращает шаблон правила в регулярное выражение и выбирает токен для индекса"""
+        prefix = suffix = ""
+        start_anchored = end_anchored = False
+        if pattern.startswith("||"):
+            prefix, pattern, start_anchored = r'^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?', pattern[2:], True
+        elif pattern.startswith("|"):
+            prefix, pattern, start_anchored = "^", pattern[1:], True
+        if pattern.endswith("|"):
+            suffix, pattern, end_anchored = "$", pattern[:-1], True
+        # "*" по краям без привязки ничего не меняет, а поиск с ".*" в начале медленнее
+        if not start_anchored:
+            pattern = pattern.lstrip("*")
+        if not end_anchored:
+            pattern = pattern.rstrip("*")
+
+        # Токен должен целиком встречаться в любом подходящем адресе: с обеих сторон - не буква и не цифра
+        token = ""
+        for match in self.TOKEN_RE.finditer(pattern):
+            start, end = match.span()
+            if start == 0 and not start_anchored or start > 0 and pattern[start - 1] == "*":
+                continue
+            if end == len(pattern) and not end_anchored or end < len(pattern) and pattern[end] == "*":
+                continue
+            if len(match.group()) > len(token):
+                token = match.group()
+
+        body = re.escape(pattern).replace(r"\*", ".*").replace(r"\^", self.SEPARATOR)
+        return FilterPattern(prefix + body + suffix), token
+
+    @staticmethod
+    def host_in(host, hosts):
+        """Проверяет домен и все его родительские домены"""
+        while host:
+            if host in hosts:
+                return True
+            dot = host.find(".")
+            if dot < 0:
+                return False
+            host = host[dot + 1:]
+        return False
 
-            self.layout.addWidget(self.browser)
+    @staticmethod
+    def site_of(host):
+        """Приблизительный регистрируемый домен (два последних уровня)"""
+        return ".".join(host.rsplit(".", 2)[-2:])
+
+    def match_rules(self, buckets, url, tokens, source_host, third_party, resource_type):
+        for token in tokens:
+            rules = buckets.get(token)
+            if rules:
+                for filter_pattern, types, party, domains, not_domains in rules:
+                    if resource_type not in types or party is not None and party != third_party:
+                        continue
+                    if domains and not self.host_in(source_host, domains):
+                        continue
+                    if not_domains and self.host_in(source_host, not_domains):
+                        continue
+                    if filter_pattern.search(url):
+                        return True
+        return False
 
-        # Инициализация переменных
-        self.url = ""
-        self.title = ""
+    def should_block(self, url, source_host="", resource_type="other"):
+        """Решает, блокировать ли запрос"""
+        url = url.lower()
+        host = url_host(url)
+        source_host = source_host.lower()
+        third_party = bool(source_host) and self.site_of(host) != self.site_of(source_host)
+
+        tokens = None
+        blocked = resource_type in self.DEFAULT_TYPES and self.host_in(host, self.block_hosts)
+        if not blocked and self.block_rules:
+            tokens = set(self.TOKEN_RE.findall(url))
+            tokens.add("")
+            blocked = self.match_rules(self.block_rules, url, tokens, source_host, third_party, resource_type)
+        if not blocked:
+            return False
+
+        if self.host_in(host, self.allow_hosts):
+            return False
+        if self.allow_rules:
+            if tokens is None:
+                tokens = set(self.TOKEN_RE.findall(url))
+                tokens.add("")
+            if self.match_rules(self.allow_rules, url, tokens, source_host, third_party, resource_type):
+                return False
+        return True
+
+    def stats(self):
+        """Размер скомпилированных фильтров"""
+        return {
+            "rules": self.rule_count,
+            "skipped": self.skipped_count,
+            "hosts": len(self.block_hosts),
+            "patterns": sum(len(rules) for rules in self.block_rules.values()),
+            "generic": len(self.block_rules.get("", ())),
+            "exceptions": len(self.allow_hosts) + sum(len(rules) for rules in self.allow_rules.values()),
+            "compile_ms": self.compile_ms,
+        }
+
+class DomainBlocklist:
+    """Большие списки доменов: отсортированный массив перевернутых имен с фильтром Блума перед ним"""
+    BLOOM_BITS_PER_ENTRY = 10  # ~1% ложных срабатываний при 7 хешах
+    BLOOM_HASHES = 7
+    BLOCK_SIZE = 64  # записей между элементами разреженного индекса
+
+    def __init__(self, domains=()):
+        started = time.perf_counter()
+        # "ads.example.com" -> "com.example.ads": поддомены одного сайта лежат в массиве рядом
+        entries = sorted({".".join(reversed(domain.split("."))) for domain in domains})
+        self.count = len(entries)
+        # Одна строка "\nзапись\nзапись\n" вместо сотен тысяч объектов str
+        self.blob = "\n" + "\n".join(entries) + "\n"
+        # Каждая BLOCK_SIZE-я запись и смещение ее "\n" в строке: bisect по индексу, затем find в блоке
+        self.index_keys = entries[::self.BLOCK_SIZE]
+        self.index_offsets = array.array('I')
+        position = 0
+        for number, entry in enumerate(entries):
+            if number % self.BLOCK_SIZE == 0:
+                self.index_offsets.append(position)
+            position += len(entry) + 1
+        self.index_offsets.append(position)
+
+        self.bloom_size = max(64, len(entries) * self.BLOOM_BITS_PER_ENTRY)
+        self.bloom = bytearray((self.bloom_size + 7) // 8)
+        for entry in entries:
+            for bit in self.bloom_bits(entry):
+                self.bloom[bit >> 3] |= 1 << (bit & 7)
+
+        self.build_ms = (time.perf_counter() - started) * 1000
+        self.lookups = 0
+        self.lookup_ns = 0
+        self.bloom_rejects = 0
+
+    @classmethod
+    def from_files(cls, paths):
+        """Читает списки доменов: по одному в строке или в формате hosts ("0.0.0.0 domain")"""
+        domains = []
+        for path in paths:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    for line in f:
+                        parts = line.split("#", 1)[0].split()
+                        if not parts:
+                            continue
+                        domain = parts[-1].lower().rstrip(".")
+                        if "." in domain and domain not in ("localhost.localdomain", "local"):
+                            domains.append(domain)
+            except OSError as e:
+                print(f"Ошибка чтения списка доменов {path}: {e}")
+        return cls(domains)
+
+    def bloom_bits(self, key):
+        # Двойное хеширование: k позиций из двух половин одного хеша строки
+        value = hash(key) & 0xFFFFFFFFFFFFFFFF
+        first, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        return [(first + i * step) % self.bloom_size for i in range(self.BLOOM_HASHES)]
+
+    def might_contain(self, key):
+        """Быстрая отрицательная проверка: False - записи точно нет"""
+        bloom, size = self.bloom, self.bloom_size
+        value = hash(key) & 0xFFFFFFFFFFFFFFFF
+        bit, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        # Для отсутствующего ключа обычно хватает одной-двух позиций
+        for _ in range(self.BLOOM_HASHES):
+            bit %= size
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+            bit += step
+        return True
+
+    def contains_entry(self, key):
+        """Поиск записи: блок по разреженному индексу, затем поиск подстроки внутри блока"""
+        block = bisect.bisect_right(self.index_keys, key) - 1
+        if block < 0:
+            return False
+        return self.blob.find("\n" + key + "\n", self.index_offsets[block], self.index_offsets[block + 1] + 1) >= 0
+
+    def is_blocked(self, host):
+        """Проверяет домен и все его родительские домены"""
+        started = time.perf_counter_ns()
+        labels = host.lower().rstrip(".").split(".")
+        labels.reverse()
+        blocked = False
+        key = labels[0]
+        for label in labels[1:]:
+            key += "." + label
+            if not self.might_contain(key):
+                self.bloom_rejects += 1
+            elif self.contains_entry(key):
+                blocked = True
+                break
+        self.lookups += 1
+        self.lookup_ns += time.perf_counter_ns() - started
+        return blocked
+
+    def __len__(self):
+        return self.count
+
+    def stats(self):
+        """Объем в памяти и средняя задержка проверки"""
+        return {
+            "domains": len(self),
+            "memory_bytes": (sys.getsizeof(self.blob) + sys.getsizeof(self.bloom) + sys.getsizeof(self.index_offsets)
+                             + sys.getsizeof(self.index_keys) + sum(sys.getsizeof(key) for key in self.index_keys)),
+            "build_ms": self.build_ms,
+            "lookups": self.lookups,
+            "avg_lookup_us": self.lookup_ns / self.lookups / 1000 if self.lookups else 0.0,
+            "bloom_rejects": self.bloom_rejects,
+        }
+
+class HostResolver:
+    """Предварительное разрешение имен в пуле потоков с LRU-кэшем ограниченного времени жизни"""
+    NEGATIVE_TTL = 30  # неразрешенные имена не запрашиваются повторно в течение этого времени
+
+    def __init__(self, resolve=None, workers=4, ttl=300, capacity=512):
+        # resolve(host) -> список адресов; для проверок подставляется локальная заглушка
+        self.resolve = resolve or self.system_resolve
+        self.ttl = ttl
+        self.capacity = capacity
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dns-prefetch")
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # host -> (момент устаревания, адреса)
+        self.pending = {}           # host -> Future
+        self.hits = 0
+        self.misses = 0
+        self.resolved = 0
+        self.failed = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    @staticmethod
+    def system_resolve(host):
+        """Разрешение через системный резолвер; заодно прогревает его кэш для Chromium"""
+        return sorted({info[4][0] for info in socket.getaddrinfo(host, 443, proto=socket.IPPROTO_TCP)})
+
+    @staticmethod
+    def host_of(text):
+        """Имя хоста из адреса или набранного текста (None, если это не похоже на домен)"""
+        text = text.strip()
+        if not text or " " in text:
+            return None
+        if "://" not in text:
+            text = "https://" + text
+        host = url_host(text)
+        if not host or "." not in host or host.replace(".", "").isdigit() or len(host.rsplit(".", 1)[-1]) < 2:
+            return None
+        return host
+
+    def prefetch(self, host):
+        """Ставит разрешение имени в очередь, если его нет в кэше; возвращает Future или None"""
+        with self.lock:
+            entry = self.cache.get(host)
+            if entry is not None and entry[0] > time.monotonic():
+                self.cache.move_to_end(host)
+                self.hits += 1
+                return None
+            future = self.pending.get(host)
+            if future is not None:
+                return future
+            self.misses += 1
+            future = self.executor.submit(self.resolve_now, host)
+            self.pending[host] = future
+            return future
+
+    def prefetch_many(self, hosts):
+        """Ставит в очередь несколько имен"""
+        return [future for future in map(self.prefetch, hosts) if future is not None]
+
+    def resolve_now(self, host):
+        started = time.perf_counter()
+        try:
+            addresses = list(self.resolve(host))
+        except (OSError, UnicodeError):
+            addresses = []
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        expires = time.monotonic() + (self.ttl if addresses else self.NEGATIVE_TTL)
+        with self.lock:
+            self.pending.pop(host, None)
+            if addresses:
+                self.resolved += 1
+            else:
+                self.failed += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.cache[host] = (expires, addresses)
+            self.cache.move_to_end(host)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        return addresses
+
+    def lookup(self, host):
+        """Адреса из кэша без обращения к сети (None - нет или устарели)"""
+        with self.lock:
+            entry = self.cache.get(host)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.cache.move_to_end(host)
+            self.hits += 1
+            return entry[1]
+
+    def stats(self):
+        """Попадания, промахи и задержка разрешения"""
+        with self.lock:
+            lookups = self.resolved + self.failed
+            return {
+                "cached": len(self.cache),
+                "pending": len(self.pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "resolved": self.resolved,
+                "failed": self.failed,
+                "avg_ms": self.total_ms / lookups if lookups else 0.0,
+                "max_ms": self.max_ms,
+            }
+
+    def shutdown(self):
+        """Останавливает пул, не дожидаясь запросов в очереди"""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+        self.executor.shutdown(wait=False)
+
+class HistoryListModel(QAbstractListModel):
+    """Модель истории для QListView: строки подгружаются порциями по мере прокрутки"""
+    BATCH_SIZE = 200
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.since_days = None
+        self._rows = []  # только ссылки на записи HistoryStore, без виджета на строку
+        self._source = None
+        self._revision = None
+        self._exhausted = True
+        self.refresh()
+
+    def set_range(self, since_days):
+        """Показывает записи за последние дни (None - все)"""
+        self.since_days = since_days
+        self.refresh()
+
+    def set_history(self, history):
+        """Переключает модель на другое хранилище истории"""
+        self.history = history
+        self.refresh()
+
+    def refresh(self):
+        """Сбрасывает модель и начинает выборку заново"""
+        self.beginResetModel()
+        self._rows = []
+        self._source = self.history.iter_recent(self.since_days)
+        self._revision = self.history.revision
+        self._exhausted = False
+        self.endResetModel()
+
+    def total_count(self):
+        """Количество записей в выбранном диапазоне"""
+        if self.since_days is None:
+            return len(self.history)
+        return self.history.count_since(self.since_days)
+
+    def item_at(self, row):
+        """Возвращает запись истории для строки"""
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        if self._revision != self.history.revision:
+            self.resync()
+        batch = list(itertools.islice(self._source, self.BATCH_SIZE))
+        if len(batch) < self.BATCH_SIZE:
+            self._exhausted = True
+        if not batch:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(batch) - 1)
+        self._rows.extend(batch)
+        self.endInsertRows()
+
+    def resync(self):
+        """Перечитывает показанные строки по новому порядку истории и продолжает выборку после них"""
+        # История изменилась (например, фоновая вкладка дописала посещение). Смещение по номеру строки
+        # повторило бы строку, сдвинутую новым посещением, и пропустило бы запись, поднятую наверх,
+        # поэтому строки берутся заново - до последней показанной записи, которая еще в истории
+        history = self.history
+        shown = {id(item) for item in self._rows if history.get(item.url) is item}
+        source = history.iter_recent(self.since_days)
+        rows = []
+        while shown:
+            item = next(source, None)
+            if item is None:
+                break
+            rows.append(item)
+            shown.discard(id(item))
+        self.beginResetModel()
+        self._rows = rows
+        self._source = source
+        self._revision = history.revision
+        self.endResetModel()
+
+    def data(self, index, role=Qt.DisplayRole):
+        item = self.item_at(index.row()) if index.isValid() else None
+        if item is None:
+            return None
+        if role == Qt.DisplayRole:
+            visits = f" ({item.visit_count} посещ.)" if item.visit_count > 1 else ""
+            display_text = f"{item.visit_time_text} - {item.title[:50]}{visits}"
+            if len(item.title) > 50:
+                display_text += "..."
+            return display_text
+        if role == Qt.ToolTipRole:
+            return item.url
+        if role == Qt.UserRole:
+            return item.url
+        return None
+
+class BookmarkListModel(QAbstractListModel):
+    """Модель списка закладок поверх списка Bookmark"""
+
+    def __init__(self, bookmarks, parent=None):
+        super().__init__(parent)
+        self.bookmarks = bookmarks
+        self._row_of = None  # закладка -> строка, строится при первом запросе
+
+    def set_bookmarks(self, bookmarks):
+        """Заменяет список закладок"""
+        self.beginResetModel()
+        self.bookmarks = bookmarks
+        self._row_of = None
+        self.endResetModel()
+
+    def rows_of(self, bookmarks):
+        """Отсортированные номера строк для набора закладок"""
+        if self._row_of is None:
+            self._row_of = {item: row for row, item in enumerate(self.bookmarks)}
+        try:
+            return sorted(map(self._row_of.__getitem__, bookmarks))
+        except KeyError:
+            return sorted(self._row_of[item] for item in bookmarks if item in self._row_of)
+
+    def bookmark_at(self, row):
+        """Возвращает закладку по номеру строки"""
+        if 0 <= row < len(self.bookmarks):
+            return self.bookmarks[row]
+        return None
+
+    def remove_bookmark(self, bookmark):
+        """Убирает закладку из списка"""
+        rows = self.rows_of([bookmark])
+        if not rows:
+            return
+        self.beginRemoveRows(QModelIndex(), rows[0], rows[0])
+        del self.bookmarks[rows[0]]
+        self._row_of = None
+        self.endRemoveRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.bookmarks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        bookmark = self.bookmark_at(index.row()) if index.isValid() else None
+        if bookmark is None:
+            return None
+        if role == Qt.DisplayRole:
+            # Всегда две строки, чтобы представление считало высоту строк одинаковой
+            details = bookmark.url
+            if bookmark.category and bookmark.category != "General":
+                details += f"   📁 {bookmark.category}"
+            return f"{bookmark.icon} {bookmark.title}\n{details}"
+        if role == Qt.ToolTipRole:
+            return bookmark.url
+        if role == Qt.UserRole:
+            return bookmark
+        return None
+
+class BookmarkFilterModel(QAbstractProxyModel):
+    """Фильтр закладок по префиксному индексу: при наборе меняется только список строк"""
+
+    def __init__(self, search_index, parent=None):
+        super().__init__(parent)
+        self.search_index = search_index
+        self.query = ""
+        self._rows = None  # отсортированные строки источника; None - без фильтра
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelReset.connect(self.refresh)
+        model.rowsInserted.connect(self.refresh)
+        model.rowsRemoved.connect(self.refresh)
+        self.refresh()
+
+    def set_query(self, query):
+        """Задает строку фильтра"""
+        self.query = query.strip()
+        self.refresh()
+
+    def refresh(self):
+        """Пересчитывает отфильтрованные строки"""
+        self.beginResetModel()
+        source = self.sourceModel()
+        if not self.query or source is None:
+            self._rows = None
+        else:
+            matches = self.search_index.candidates(self.query)
+            if len(matches) == source.rowCount():
+                self._rows = None  # подходят все закладки
+            else:
+                self._rows = source.rows_of(matches)
+        self.endResetModel()
+
+    def source_row(self, row):
+        """Номер строки источника для строки фильтра"""
+        if self._rows is None:
+            return row
+        return self._rows[row] if 0 <= row < len(self._rows) else -1
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().rowCount() if self._rows is None else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not 0 <= row < self.rowCount() or column != 0:
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid() or self.sourceModel() is None:
+            return QModelIndex()
+        return self.sourceModel().index(self.source_row(proxy_index.row()), 0)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if self._rows is not None:
+            position = bisect.bisect_left(self._rows, row)
+            if position == len(self._rows) or self._rows[position] != row:
+                return QModelIndex()
+            row = position
+        return self.index(row, 0)
+
+class BookmarkTreeModel(QAbstractItemModel):
+    """Модель дерева закладок с переносом перетаскиванием"""
+    MIME_TYPE = "application/x-derbrowser-bookmark-nodes"
+
+    def __init__(self, tree, on_changed=None, parent=None):
+        super().__init__(parent)
+        self.tree = tree
+        # Вызывается со списком измененных узлов, чтобы сохранить только их
+        self.on_changed = on_changed
+
+    def set_tree(self, tree):
+        """Заменяет дерево закладок"""
+        self.beginResetModel()
+        self.tree = tree
+        self.endResetModel()
+
+    def node(self, index):
+        """Узел дерева для индекса (None - корень)"""
+        return index.internalPointer() if index.isValid() else None
+
+    def index_of(self, node):
+        """Индекс модели для узла"""
+        if node is None:
+            return QModelIndex()
+        return self.createIndex(self.tree.row_of(node), 0, node)
+
+    def index(self, row, column, parent=QModelIndex()):
+        parent_node = self.node(parent)
+        if parent_node is not None and not isinstance(parent_node, BookmarkFolder):
+            return QModelIndex()
+        children = self.tree.children(parent_node.id if parent_node else None)
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, column, children[row])
+
+    def parent(self, index):
+        node = self.node(index)
+        if node is None or node.parent_id is None:
+            return QModelIndex()
+        return self.index_of(self.tree.get_folder(node.parent_id))
+
+    def rowCount(self, parent=QModelIndex()):
+        node = self.node(parent)
+        if node is None:
+            return len(self.tree.children(None))
+        if isinstance(node, BookmarkFolder):
+            return len(self.tree.children(node.id))
+        return 0
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        node = self.node(index)
+        if node is None:
+            return None
+        is_folder = isinstance(node, BookmarkFolder)
+        if role == Qt.DisplayRole:
+            return f"📁 {node.title}" if is_folder else f"{node.icon} {node.title}"
+        if role == Qt.EditRole:
+            return node.title
+        if role == Qt.ToolTipRole:
+            return node.title if is_folder else node.url
+        if role == Qt.UserRole:
+            return node
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        node = self.node(index)
+        if node is None or role != Qt.EditRole or not str(value).strip():
+            return False
+        self._changed(self.tree.rename(node, str(value).strip()))
+        self.dataChanged.emit(index, index)
+        return True
+
+    def flags(self, index):
+        node = self.node(index)
+        if node is None:
+            return Qt.ItemIsDropEnabled
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable | Qt.ItemIsDragEnabled
+        if isinstance(node, BookmarkFolder):
+            flags |= Qt.ItemIsDropEnabled
+        return flags
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        keys = []
+        for index in indexes:
+            node = self.node(index)
+            if node is not None:
+                keys.append(("f:" if isinstance(node, BookmarkFolder) else "b:") + str(node.id))
+        mime_data = QMimeData()
+        mime_data.setData(self.MIME_TYPE, "\n".join(keys).encode('utf-8'))
+        return mime_data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(self.MIME_TYPE):
+            return False
+        target = self.node(parent)
+        if target is not None and not isinstance(target, BookmarkFolder):
+            return False
+        parent_id = target.id if target else None
+        if row < 0:
+            row = self.rowCount(parent)
+
+        nodes = []
+        for key in bytes(data.data(self.MIME_TYPE)).decode('utf-8').split("\n"):
+            kind, _, node_id = key.partition(":")
+            if not node_id.isdigit():
+                continue
+            node = (self.tree.get_folder if kind == "f" else self.tree.get)(int(node_id))
+            if node is not None:
+                nodes.append(node)
+
+        moved = False
+        for node in nodes:
+            source_row = self.tree.row_of(node)
+            if self.move_node(node, parent_id, row):
+                moved = True
+                # Следующий узел встает сразу за перенесенным
+                row = self.tree.row_of(node) + 1
+            elif node.parent_id == parent_id and source_row < row:
+                row = source_row + 1
+        # Перенос уже выполнен; removeRows не переопределен, так что представлению удалять нечего
+        return moved
+
+    def move_node(self, node, parent_id, row=None):
+        """Переносит узел в папку перед строкой row"""
+        if self.tree.is_inside(node, parent_id):
+            return False
+        target_parent = self.index_of(self.tree.get_folder(parent_id)) if parent_id is not None else QModelIndex()
+        source_row = self.tree.row_of(node)
+        destination = self.rowCount(target_parent) if row is None else row
+        if not self.beginMoveRows(self.parent(self.index_of(node)), source_row, source_row,
+                                  target_parent, destination):
+            return False
+        changed = self.tree.move(node, parent_id, destination)
+        self.endMoveRows()
+        self._changed(changed)
+        return True
+
+    def insert_node(self, node, parent_id=None, row=None):
+        """Добавляет новую папку или закладку"""
+        target_parent = self.index_of(self.tree.get_folder(parent_id)) if parent_id is not None else QModelIndex()
+        destination = self.rowCount(target_parent) if row is None else row
+        self.beginInsertRows(target_parent, destination, destination)
+        changed = self.tree.insert(node, parent_id, destination)
+        self.endInsertRows()
+        self._changed(changed)
+        return self.index_of(node)
+
+    def remove_node(self, node):
+        """Удаляет узел вместе с содержимым; возвращает удаленные узлы"""
+        row = self.tree.row_of(node)
+        self.beginRemoveRows(self.parent(self.index_of(node)), row, row)
+        removed = self.tree.remove(node)
+        self.endRemoveRows()
+        return removed
+
+    def _changed(self, nodes):
+        if self.on_changed and nodes:
+            self.on_changed(nodes)
+
+class OmniboxSuggester:
+    """Подсказки адресной строки: лучший хост, открытые вкладки, закладки и история по частоте и давности"""
+    SCHEME_RE = re.compile(r"^[a-z][a-z0-9+.-]*://")
+    SEARCH_URL = "https://www.google.com/search?q={}"
+    HISTORY_BUDGET = 500  # Сколько свежих записей истории проверить при широком запросе
+    TAB_LIMIT = 2
+    BOOKMARK_LIMIT = 3
+    BOOKMARK_SCAN = 500  # Сколько совпавших закладок ранжировать на одно нажатие клавиши
+
+    def __init__(self, history, bookmark_index):
+        self.history = history
+        self.bookmark_index = bookmark_index
+
+    @classmethod
+    def host_prefix(cls, text):
+        """Набранный текст как начало хоста (без схемы и www.) или пустая строка"""
+        prefix = cls.SCHEME_RE.sub("", text.strip().lower())
+        if prefix.startswith("www."):
+            prefix = prefix[4:]
+        if not prefix or any(char in prefix for char in " /?#:"):
+            return ""
+        return prefix
+
+    def suggest(self, text, tabs=(), limit=8):
+        """Строки подсказок (вид, заголовок, URL) для набранного текста; последняя - поиск в Google"""
+        query = text.strip()
+        if not query:
+            return []
+        rows, seen = [], set()
+
+        def push(kind, title, url):
+            key = url.rstrip("/")
+            if key not in seen:
+                seen.add(key)
+                rows.append((kind, title, url))
+
+        # Пока индекс хостов строится в фоне, дописывания хоста нет
+        hosts = self.history.hosts_ready
+        prefix = self.host_prefix(query) if hosts is not None else ""
+        if prefix:
+            host = hosts.complete(prefix)
+            if host:
+                push("host", host, f"https://{host}/")
+            else:
+                for host in hosts.typo_matches(prefix):
+                    push("typo", host, f"https://{host}/")
+
+        terms = query.lower().split()
+        tab_count = 0
+        for title, url in tabs:
+            if tab_count < self.TAB_LIMIT and all(term in f"{title} {url}".lower() for term in terms):
+                push("tab", title or url, url)
+                tab_count += 1
+
+        matches = self.bookmark_index.candidates(query)
+        if matches:
+            rank = self.history.rank
+            for bookmark in heapq.nlargest(self.BOOKMARK_LIMIT, itertools.islice(matches, self.BOOKMARK_SCAN),
+                                           key=lambda bookmark: rank(bookmark.url)):
+                push("bookmark", bookmark.title or bookmark.url, bookmark.url)
+
+        if len(rows) < limit - 1:
+            for item in self.history.search(query, limit, self.HISTORY_BUDGET):
+                push("history", item.title or item.url, item.url)
+
+        rows = rows[:limit - 1]
+        rows.append(("search", query, self.SEARCH_URL.format(urllib.parse.quote(query))))
+        return rows
+
+class OmniboxModel(QAbstractListModel):
+    """Модель выпадающего списка адресной строки"""
+    KIND_ICONS = {"host": "🌐", "typo": "✏️", "tab": "📑", "bookmark": "⭐", "history": "🕘", "search": "🔍"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def set_rows(self, rows):
+        """Заменяет подсказки"""
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def row_at(self, row):
+        """Возвращает подсказку (вид, заголовок, URL) для строки"""
+        if 0 <= row < len(self._rows):
+            return self._rows[row]
+        return None
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = self.row_at(index.row()) if index.isValid() else None
+        if row is None:
+            return None
+        kind, title, url = row
+        if role == Qt.DisplayRole:
+            icon = self.KIND_ICONS.get(kind, "")
+            if kind == "host":
+                return f"{icon} {title}"
+            if kind == "typo":
+                return f"{icon} Возможно, вы имели в виду {title}"
+            if kind == "tab":
+                return f"{icon} Перейти на вкладку: {title[:60]}"
+            if kind == "search":
+                return f"{icon} Искать в Google: {title}"
+            return f"{icon} {title[:60]} — {url}"
+        if role in (Qt.EditRole, Qt.ToolTipRole, Qt.UserRole):
+            return url
+        return None
+
+class ThemeEngine:
+    """Темы как наборы токенов, отрисованные в один QSS шаблон"""
+    TEMPLATE = """
+    /* Основные стили */
+    QMainWindow {
+        background-color: %(window_bg)s;
+    }
+
+    /* Панель навигации */
+    QWidget#navBar {
+        background-color: %(nav_bg)s;
+        border-bottom: 2px solid %(nav_border)s;
+        border-radius: %(nav_radius)s;
+        margin: %(nav_margin)s;
+    }
+
+    QLabel#navLogoIcon {
+        font-size: 24px;
+        color: %(accent)s;
+        font-weight: bold;
+    }
+
+    QLabel#navLogoText {
+        color: %(text)s;
+        font-size: 18px;
+        font-weight: bold;
+    }
+
+    QPushButton#navButton {
+        background-color: %(nav_button_bg)s;
+        border: 2px solid %(nav_button_border)s;
+        border-radius: %(button_radius)s;
+        color: %(button_text)s;
+        font-size: %(font_button)s;
+        font-weight: bold;
+    }
+
+    QPushButton#navButton:hover {
+        background-color: %(nav_button_hover_bg)s;
+        border-color: %(button_hover_border)s;
+        color: %(button_hover_text)s;
+    }
+
+    QPushButton#navButton:pressed {
+        background-color: %(button_pressed_bg)s;
+    }
+
+    QPushButton#navButton:disabled {
+        background-color: %(button_disabled_bg)s;
+        color: %(button_disabled_text)s;
+    }
+
+    /* Поле URL */
+    QLineEdit#urlBar {
+        background-color: %(input_bg)s;
+        border: 2px solid %(input_border)s;
+        border-radius: %(input_radius)s;
+        padding: 10px 15px;
+        font-size: %(font_input)s;
+        color: %(input_text)s;
+        font-weight: 500;
+        selection-background-color: %(accent)s;
+        min-height: 40px;
+    }
+
+    QLineEdit#urlBar:focus {
+        border-color: %(accent)s;
+        background-color: %(input_focus_bg)s;
+    }
+
+    QLineEdit#urlBar:hover {
+        border-color: %(input_hover_border)s;
+    }
+
+    /* Кнопка перехода */
+    QPushButton#goButton {
+        background-color: %(accent)s;
+        border: none;
+        border-radius: %(button_radius)s;
+        color: white;
+        font-size: 18px;
+        font-weight: bold;
+    }
+
+    QPushButton#goButton:hover {
+        background-color: %(accent_hover)s;
+        border: 2px solid %(go_hover_border)s;
+    }
+
+    QPushButton#goButton:pressed {
+        background-color: %(accent_pressed)s;
+    }
+
+    /* Кнопки действий */
+    QPushButton#actionButton {
+        background-color: %(action_bg)s;
+        border: 2px solid %(action_border)s;
+        border-radius: %(button_radius)s;
+        color: %(button_text)s;
+        font-size: %(font_button)s;
+        font-weight: bold;
+    }
+
+    QPushButton#actionButton:hover {
+        background-color: %(action_hover_bg)s;
+        border-color: %(button_hover_border)s;
+        color: %(button_hover_text)s;
+    }
+
+    QPushButton#actionButton:pressed {
+        background-color: %(action_pressed_bg)s;
+    }
+
+    /* Кнопка инкогнито во включенном режиме */
+    QPushButton#actionButton[incognito="true"] {
+        background-color: #2ecc71;
+        border: 2px solid #27ae60;
+        color: white;
+    }
+
+    QPushButton#actionButton[incognito="true"]:hover {
+        background-color: #27ae60;
+        border-color: #219955;
+    }
+
+    /* Вкладки */
+    QTabWidget::pane {
+        border: 1px solid %(pane_border)s;
+        background-color: %(pane_bg)s;
+    }
+
+    QTabBar::tab {
+        background-color: %(tab_bg)s;
+        color: %(tab_text)s;
+        padding: 10px 20px;
+        margin-right: 2px;
+        border-top-left-radius: 8px;
+        border-top-right-radius: 8px;
+        font-weight: 600;
+        font-size: %(font_small)s;
+        min-width: 120px;
+    }
+
+    QTabBar::tab:selected {
+        background-color: %(tab_selected_bg)s;
+        color: %(text)s;
+        border-bottom: 3px solid %(accent)s;
+    }
+
+    QTabBar::tab:hover:!selected {
+        background-color: %(tab_hover_bg)s;
+        color: %(text)s;
+    }
+
+    /* Статус бар */
+    QWidget#statusBar {
+        background-color: %(nav_bg)s;
+        border-top: 1px solid %(pane_border)s;
+    }
+
+    QLabel#statusLabel {
+        color: %(text_muted)s;
+        font-size: %(font_small)s;
+        font-weight: 500;
+    }
+
+    QProgressBar#progressBar {
+        border: 1px solid %(pane_border)s;
+        border-radius: 3px;
+        background-color: %(progress_bg)s;
+    }
+
+    QProgressBar#progressBar::chunk {
+        background-color: %(accent)s;
+        border-radius: 3px;
+    }
+
+    /* Меню */
+    QMenuBar#menuBar {
+        background-color: %(nav_bg)s;
+        color: %(text)s;
+        padding: 5px;
+    }
+
+    QMenuBar::item {
+        background-color: transparent;
+        padding: 8px 15px;
+    }
+
+    QMenuBar::item:selected {
+        background-color: %(accent)s;
+        color: %(menu_selected_text)s;
+    }
+
+    QMenu {
+        background-color: %(nav_bg)s;
+        color: %(text)s;
+        border: 1px solid %(pane_border)s;
+    }
+
+    QMenu::item:selected {
+        background-color: %(accent)s;
+        color: %(menu_selected_text)s;
+    }
+    """
+
+    # Общие правила для всех кнопок и полей ввода (используются цветными темами)
+    CONTROLS_TEMPLATE = """
+    QPushButton {
+        background-color: %(nav_button_bg)s;
+        border: 2px solid %(nav_button_border)s;
+        border-radius: %(button_radius)s;
+        color: %(button_text)s;
+        font-weight: bold;
+    }
+
+    QPushButton:hover {
+        background-color: %(nav_button_hover_bg)s;
+        border-color: %(button_hover_border)s;
+        color: %(button_hover_text)s;
+    }
+
+    QLineEdit {
+        background-color: %(input_bg)s;
+        border: 2px solid %(input_border)s;
+        border-radius: %(input_radius)s;
+        color: %(input_text)s;
+        padding: 10px;
+    }
+    """
+
+    DARK = {
+        "window_bg": "#0a0a14",
+        "nav_bg": "#1a1a2a",
+        "nav_border": "#3498db",
+        "nav_radius": "0px",
+        "nav_margin": "0px",
+        "text": "#e0e0e0",
+        "text_muted": "#b0b0b0",
+        "accent": "#3498db",
+        "accent_hover": "#2980b9",
+        "accent_pressed": "#1c6ea4",
+        "go_hover_border": "#2ecc71",
+        "button_text": "#e0e0e0",
+        "button_hover_text": "#e0e0e0",
+        "button_hover_border": "#3498db",
+        "button_radius": "20px",
+        "nav_button_bg": "#3a3a4a",
+        "nav_button_border": "#4a4a5a",
+        "nav_button_hover_bg": "#4a4a5a",
+        "button_pressed_bg": "#2a2a3a",
+        "button_disabled_bg": "#2a2a3a",
+        "button_disabled_text": "#666",
+        "action_bg": "#2a2a3a",
+        "action_border": "#3a3a4a",
+        "action_hover_bg": "#3a3a4a",
+        "action_pressed_bg": "#1a1a2a",
+        "input_bg": "#2a2a3a",
+        "input_border": "#3a3a4a",
+        "input_focus_bg": "#3a3a4a",
+        "input_hover_border": "#4a4a5a",
+        "input_text": "#e0e0e0",
+        "input_radius": "20px",
+        "pane_border": "#2a2a3a",
+        "pane_bg": "#0a0a14",
+        "tab_bg": "#2a2a3a",
+        "tab_text": "#b0b0b0",
+        "tab_selected_bg": "#1a1a2a",
+        "tab_hover_bg": "#3a3a4a",
+        "progress_bg": "#2a2a3a",
+        "menu_selected_text": "#e0e0e0",
+        "font_button": "16px",
+        "font_input": "14px",
+        "font_small": "12px",
+        "controls": False,
+    }
+
+    LIGHT = dict(DARK, **{
+        "window_bg": "#f5f5f5",
+        "nav_bg": "#ffffff",
+        "text": "#333333",
+        "text_muted": "#666666",
+        "button_text": "#333333",
+        "button_hover_text": "#333333",
+        "nav_button_bg": "#f0f0f0",
+        "nav_button_border": "#e0e0e0",
+        "nav_button_hover_bg": "#e0e0e0",
+        "button_pressed_bg": "#d0d0d0",
+        "button_disabled_bg": "#f5f5f5",
+        "button_disabled_text": "#aaaaaa",
+        "action_bg": "#f0f0f0",
+        "action_border": "#e0e0e0",
+        "action_hover_bg": "#e0e0e0",
+        "action_pressed_bg": "#d0d0d0",
+        "input_bg": "#ffffff",
+        "input_border": "#e0e0e0",
+        "input_focus_bg": "#ffffff",
+        "input_hover_border": "#cccccc",
+        "input_text": "#333333",
+        "pane_border": "#e0e0e0",
+        "pane_bg": "#ffffff",
+        "tab_bg": "#f0f0f0",
+        "tab_text": "#666666",
+        "tab_selected_bg": "#ffffff",
+        "tab_hover_bg": "#e8e8e8",
+        "progress_bg": "#f0f0f0",
+        "menu_selected_text": "white",
+    })
+
+    @staticmethod
+    def accent_theme(window_bg, nav_bg, nav_border, button_bg, button_border, hover_bg, hover_border,
+                     input_bg, input_border, text, radius, nav_radius="0px", nav_margin="0px",
+                     hover_text="white", input_text=None):
+        """Собирает цветную тему поверх темной: все кнопки и поля в цветах темы"""
+        return dict(ThemeEngine.DARK, **{
+            "window_bg": window_bg,
+            "nav_bg": nav_bg,
+            "nav_border": nav_border,
+            "nav_radius": nav_radius,
+            "nav_margin": nav_margin,
+            "accent": nav_border,
+            "button_text": text,
+            "button_hover_text": hover_text,
+            "button_hover_border": hover_border,
+            "button_radius": radius,
+            "nav_button_bg": button_bg,
+            "nav_button_border": button_border,
+            "nav_button_hover_bg": hover_bg,
+            "action_bg": button_bg,
+            "action_border": button_border,
+            "action_hover_bg": hover_bg,
+            "input_bg": input_bg,
+            "input_border": input_border,
+            "input_focus_bg": input_bg,
+            "input_text": input_text or text,
+            "input_radius": radius,
+            "controls": True,
+        })
+
+    # Заполняется после объявления класса, так как цветные темы строятся через accent_theme
+    THEMES = {}
+
+    def __init__(self):
+        self._cache = {}
+        self.current = None
+
+    def stylesheet(self, name):
+        """Возвращает готовый QSS темы, собирая его один раз"""
+        stylesheet = self._cache.get(name)
+        if stylesheet is None:
+            tokens = self.THEMES.get(name, self.THEMES["dark"])
+            stylesheet = self.TEMPLATE % tokens
+            if tokens["controls"]:
+                stylesheet += self.CONTROLS_TEMPLATE % tokens
+            self._cache[name] = stylesheet
+        return stylesheet
+
+    def apply(self, widget, name):
+        """Применяет тему к окну одним проходом; повторное применение той же темы ничего не делает"""
+        if name not in self.THEMES:
+            name = "dark"
+        if name == self.current:
+            return False
+        widget.setStyleSheet(self.stylesheet(name))
+        self.current = name
+        return True
+
+ThemeEngine.THEMES = {
+    "dark": ThemeEngine.DARK,
+    "light": ThemeEngine.LIGHT,
+    "liquid_glass": ThemeEngine.accent_theme(
+        "qlineargradient(x1: 0, y1: 0, x2: 1, y2: 1, stop: 0 #0f2027, stop: 0.5 #203a43, stop: 1 #2c5364)",
+        "rgba(16, 32, 39, 180)", "#00d4ff", "rgba(0, 212, 255, 100)", "rgba(255, 255, 255, 100)",
+        "rgba(0, 212, 255, 180)", "#00ff88", "rgba(255, 255, 255, 50)", "rgba(0, 212, 255, 150)",
+        "white", "20px", nav_radius="15px", nav_margin="10px"),
+    "dark_matter": ThemeEngine.accent_theme(
+        "#0a0a0f", "#151520", "#8a2be2", "#252535", "#8a2be2", "#8a2be2", "#8a2be2",
+        "#1a1a25", "#8a2be2", "#e0e0ff", "15px"),
+    "cyberpunk": ThemeEngine.accent_theme(
+        "#0a0015", "#1a0025", "#ff00ff", "#2a0035", "#00ffff", "#ff00ff", "#ff00ff",
+        "#1a0025", "#00ffff", "#00ffff", "10px", hover_text="#0a0015"),
+    "nature": ThemeEngine.accent_theme(
+        "#1a3c27", "#2a5c37", "#4caf50", "#3a7c47", "#4caf50", "#4caf50", "#81c784",
+        "#2a5c37", "#4caf50", "white", "20px", nav_radius="15px", nav_margin="10px"),
+    "fire": ThemeEngine.accent_theme(
+        "#2c0a0a", "#4a1a1a", "#ff5722", "#6a2a2a", "#ff5722", "#ff5722", "#ff8a65",
+        "#4a1a1a", "#ff5722", "white", "15px", nav_radius="10px", nav_margin="10px"),
+    "ice": ThemeEngine.accent_theme(
+        "#0a1a2c", "#1a2a4a", "#29b6f6", "#2a3a6a", "#29b6f6", "#29b6f6", "#81d4fa",
+        "#1a2a4a", "#29b6f6", "white", "20px", nav_radius="15px", nav_margin="10px"),
+    "neon": ThemeEngine.accent_theme(
+        "#0a0a1a", "#1a1a3a", "#00ff00", "#2a2a5a", "#ff00ff", "#ff00ff", "#00ff00",
+        "#1a1a3a", "#00ff00", "white", "10px", nav_radius="10px", nav_margin="10px",
+        hover_text="#0a0a1a", input_text="#00ff00"),
+}
+
+class DialogPool:
+    """Диалоги, которые создаются один раз и потом только показываются снова"""
+
+    def __init__(self):
+        self.dialogs = {}    # имя -> QDialog
+        self.revisions = {}  # имя -> состояние данных, которое сейчас показывает диалог
+
+    def get(self, name, build, revision, refresh):
+        """Возвращает диалог, создавая его при первом вызове; refresh(dialog) - только если данные изменились"""
+        dialog = self.dialogs.get(name)
+        if dialog is None:
+            dialog = self.dialogs[name] = build()
+        elif self.revisions.get(name) != revision:
+            refresh(dialog)
+        self.revisions[name] = revision
+        return dialog
+
+    def mark_clean(self, name, revision):
+        """Запоминает состояние данных после правок, сделанных в самом диалоге"""
+        if name in self.dialogs:
+            self.revisions[name] = revision
+
+class HomePage(QWidget):
+    """Главная страница, общая для всех домашних вкладок окна"""
+    # Один стиль на всю страницу вместо отдельного setStyleSheet у каждого виджета
+    STYLE_SHEET = """
+        QWidget {
+            background-color: transparent;
+        }
+        QWidget#homepageContainer, QWidget#homepageContent {
+            background-color: #0a0a14;
+        }
+        QScrollArea#homepageScroll {
+            border: none;
+            background-color: #0a0a14;
+        }
+        QScrollBar:vertical {
+            background-color: #2a2a3a;
+            width: 10px;
+            border-radius: 5px;
+        }
+        QScrollBar::handle:vertical {
+            background-color: #4a4a5a;
+            border-radius: 5px;
+            min-height: 20px;
+        }
+        QLabel#homepageLogo {
+            color: #3498db;
+            font-size: 42px;
+            font-weight: bold;
+            font-family: 'Segoe UI', Arial, sans-serif;
+        }
+        QLabel#homepageTagline {
+            color: #b0b0b0;
+            font-size: 16px;
+            font-weight: 300;
+        }
+        QLabel#homepageSearchLabel, QLabel#homepageSitesLabel,
+        QLabel#homepageInfoLabel, QLabel#homepageActionsLabel {
+            color: #e0e0e0;
+            font-size: 20px;
+            font-weight: bold;
+            font-family: 'Segoe UI', Arial, sans-serif;
+        }
+        QLineEdit#homepageSearchBar {
+            background-color: #2a2a3a;
+            border: 2px solid #3a3a4a;
+            border-radius: 25px;
+            padding: 15px 20px;
+            font-size: 14px;
+            color: #e0e0e0;
+            font-weight: 500;
+            min-height: 45px;
+        }
+        QLineEdit#homepageSearchBar:focus {
+            border-color: #3498db;
+            background-color: #3a3a4a;
+        }
+        QPushButton#homepageSearchButton {
+            background-color: #3498db;
+            border: none;
+            border-radius: 25px;
+            padding: 15px 25px;
+            color: white;
+            font-size: 14px;
+            font-weight: bold;
+            min-height: 45px;
+        }
+        QPushButton#homepageSearchButton:hover {
+            background-color: #2980b9;
+        }
+        QPushButton#homepageSiteButton {
+            background-color: #3a3a4a;
+            color: white;
+            border: none;
+            border-radius: 15px;
+            padding: 15px 20px;
+            font-size: 14px;
+            font-weight: bold;
+            min-height: 50px;
+        }
+        QPushButton#homepageActionButton {
+            background-color: #3a3a4a;
+            color: white;
+            border: none;
+            border-radius: 12px;
+            padding: 12px 20px;
+            font-size: 13px;
+            font-weight: bold;
+            min-height: 45px;
+        }
+        QPushButton#homepageSiteButton:hover, QPushButton#homepageActionButton:hover {
+            background-color: #4a4a5a;
+            border: 2px solid #3498db;
+        }
+        QPushButton#homepageSiteButton:pressed, QPushButton#homepageActionButton:pressed {
+            background-color: #2a2a3a;
+        }
+        QLabel#homepageFooterText {
+            color: #ffffff;
+            font-size: 12px;
+            font-weight: 300;
+        }
+        QLabel#homepageVersionText {
+            color: #ffffff;
+            font-size: 11px;
+            font-weight: 300;
+        }
+    """
+
+    QUICK_SITES = [
+        ("🐱 GitHub", "https://www.github.com"),
+        ("📺 YouTube", "https://www.youtube.com"),
+        ("🎵 Spotify", "https://www.spotify.com"),
+        ("✈️ Telegram", "https://web.telegram.org"),
+        ("🔍 Google", "https://www.google.com"),
+        ("📘 Facebook", "https://www.facebook.com"),
+        ("🐦 Twitter", "https://twitter.com"),
+        ("💼 LinkedIn", "https://www.linkedin.com"),
+        ("📷 Instagram", "https://www.instagram.com"),
+        ("🛒 Amazon", "https://www.amazon.com"),
+        ("📚 Wikipedia", "https://wikipedia.org"),
+        ("🎮 Twitch", "https://www.twitch.tv"),
+        ("💬 Discord", "https://discord.com"),
+        ("☁️ Dropbox", "https://www.dropbox.com"),
+        ("📦 Google Drive", "https://drive.google.com"),
+        ("📃 Наш сайт", "https://derbrowser.tilda.ws/"),
+    ]
+    # Названия известных сайтов для плиток из истории
+    SITE_NAMES = {HostFrecencyIndex.host_of(url): name for name, url in QUICK_SITES}
+    TILE_COUNT = 15
+    TILE_COLUMNS = 3
+
+    def __init__(self, parent_browser=None, defer=True):
+        super().__init__()
+        self.parent_browser = parent_browser
+        self.below_fold_built = False
+        self.site_buttons = []
+        self.setStyleSheet(self.STYLE_SHEET)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
 
-    def create_homepage(self):
-        """Создает красивую главную страницу"""
         # Основной контейнер с темным фоном (будет меняться в зависимости от темы)
         container = QWidget()
         container.setObjectName("homepageContainer")
-        container.setStyleSheet("background-color: #0a0a14;")
-        self.layout.addWidget(container)
+        layout.addWidget(container)
 
         homepage_layout = QVBoxLayout(container)
         homepage_layout.setContentsMargins(0, 0, 0, 0)
 
         # Прокручиваемая область
         scroll_area = QScrollArea()
+        scroll_area.setObjectName("homepageScroll")
         scroll_area.setWidgetResizable(True)
         scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        scroll_area.setStyleSheet("""
-            QScrollArea {
-                border: none;
-                background-color: #0a0a14;
-            }
-            QScrollBar:vertical {
-                background-color: #2a2a3a;
-                width: 10px;
-                border-radius: 5px;
-            }
-            QScrollBar::handle:vertical {
-                background-color: #4a4a5a;
-                border-radius: 5px;
-                min-height: 20px;
-            }
-        """)
 
         scroll_content = QWidget()
-        scroll_content.setStyleSheet("background-color: #0a0a14;")
-        scroll_layout = QVBoxLayout(scroll_content)
-        scroll_layout.setAlignment(Qt.AlignTop)
+        scroll_content.setObjectName("homepageContent")
+        self.scroll_layout = QVBoxLayout(scroll_content)
+        self.scroll_layout.setAlignment(Qt.AlignTop)
+
+        self.build_above_fold()
+
+        # Устанавливаем содержимое прокрутки
+        scroll_area.setWidget(scroll_content)
+        homepage_layout.addWidget(scroll_area)
+
+        if defer:
+            # Нижняя часть страницы не видна сразу - строим ее после первой отрисовки
+            QTimer.singleShot(0, self.build_below_fold)
+        else:
+            self.build_below_fold()
 
+    def build_above_fold(self):
+        """Строит видимую без прокрутки часть: логотип, поиск и популярные сайты"""
         # 1. Верхняя панель с логотипом
         header_widget = QWidget()
-        header_widget.setStyleSheet("background-color: transparent;")
         header_layout = QVBoxLayout(header_widget)
         header_layout.setContentsMargins(40, 40, 40, 30)
 
         # Логотип Der Browser
         logo_label = QLabel("🌐 Der Browser")
         logo_label.setObjectName("homepageLogo")
-        logo_label.setStyleSheet("""
-            QLabel {
-                color: #3498db;
-                font-size: 42px;
-                font-weight: bold;
-                font-family: 'Segoe UI', Arial, sans-serif;
-            }
-        """)
         logo_label.setAlignment(Qt.AlignCenter)
 
         tagline_label = QLabel("Modern Web Experience")
         tagline_label.setObjectName("homepageTagline")
-        tagline_label.setStyleSheet("""
-            QLabel {
-                color: #b0b0b0;
-                font-size: 16px;
-                font-weight: 300;
-            }
-        """)
         tagline_label.setAlignment(Qt.AlignCenter)
 
         header_layout.addWidget(logo_label)
         header_layout.addWidget(tagline_label)
-        scroll_layout.addWidget(header_widget)
+        self.scroll_layout.addWidget(header_widget)
 
         # 2. Быстрый поиск
         search_widget = QWidget()
-        search_widget.setStyleSheet("background-color: transparent;")
         search_layout = QVBoxLayout(search_widget)
         search_layout.setContentsMargins(0, 20, 0, 30)
 
         search_label = QLabel("🔍 Быстрый поиск")
         search_label.setObjectName("homepageSearchLabel")
-        search_label.setStyleSheet("""
-            QLabel {
-                color: #e0e0e0;
-                font-size: 20px;
-                font-weight: bold;
-                font-family: 'Segoe UI', Arial, sans-serif;
-            }
-        """)
         search_label.setAlignment(Qt.AlignCenter)
         search_layout.addWidget(search_label)
 
@@ -163,142 +3295,96 @@ class BrowserTab(QWidget):
         self.quick_search_bar = QLineEdit()
         self.quick_search_bar.setObjectName("homepageSearchBar")
         self.quick_search_bar.setPlaceholderText("Введите запрос или URL...")
-        self.quick_search_bar.setStyleSheet("""
-            QLineEdit {
-                background-color: #2a2a3a;
-                border: 2px solid #3a3a4a;
-                border-radius: 25px;
-                padding: 15px 20px;
-                font-size: 14px;
-                color: #e0e0e0;
-                font-weight: 500;
-                min-height: 45px;
-            }
-            QLineEdit:focus {
-                border-color: #3498db;
-                background-color: #3a3a4a;
-            }
-        """)
         self.quick_search_bar.returnPressed.connect(self.perform_quick_search)
 
         quick_search_btn = QPushButton("🚀 Поиск")
         quick_search_btn.setObjectName("homepageSearchButton")
-        quick_search_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #3498db;
-                border: none;
-                border-radius: 25px;
-                padding: 15px 25px;
-                color: white;
-                font-size: 14px;
-                font-weight: bold;
-                min-height: 45px;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-        """)
         quick_search_btn.clicked.connect(self.perform_quick_search)
 
         quick_search_layout.addWidget(self.quick_search_bar)
         quick_search_layout.addWidget(quick_search_btn)
         search_layout.addLayout(quick_search_layout)
 
-        scroll_layout.addWidget(search_widget)
+        self.scroll_layout.addWidget(search_widget)
 
         # 3. Популярные сайты
         sites_widget = QWidget()
-        sites_widget.setStyleSheet("background-color: transparent;")
         sites_layout = QVBoxLayout(sites_widget)
         sites_layout.setContentsMargins(40, 0, 40, 30)
 
         sites_label = QLabel("⭐ Популярные сервисы")
         sites_label.setObjectName("homepageSitesLabel")
-        sites_label.setStyleSheet("""
-            QLabel {
-                color: #e0e0e0;
-                font-size: 20px;
-                font-weight: bold;
-                font-family: 'Segoe UI', Arial, sans-serif;
-            }
-        """)
         sites_label.setAlignment(Qt.AlignCenter)
         sites_layout.addWidget(sites_label)
 
-        # Кнопки популярных сайтов
-        quick_sites = [
-            ("🐱 GitHub", "https://www.github.com"),
-            ("📺 YouTube", "https://www.youtube.com"),
-            ("🎵 Spotify", "https://www.spotify.com"),
-            ("✈️ Telegram", "https://web.telegram.org"),
-            ("🔍 Google", "https://www.google.com"),
-            ("📘 Facebook", "https://www.facebook.com"),
-            ("🐦 Twitter", "https://twitter.com"),
-            ("💼 LinkedIn", "https://www.linkedin.com"),
-            ("📷 Instagram", "https://www.instagram.com"),
-            ("🛒 Amazon", "https://www.amazon.com"),
-            ("📚 Wikipedia", "https://wikipedia.org"),
-            ("🎮 Twitch", "https://www.twitch.tv"),
-            ("💬 Discord", "https://discord.com"),
-            ("☁️ Dropbox", "https://www.dropbox.com"),
-            ("📦 Google Drive", "https://drive.google.com"),
-            ("📃 Наш сайт", "https://derbrowser.tilda.ws/"),
-        ]
-
         # Сетка для кнопок (3 колонки)
-        grid_layout = QGridLayout()
-        grid_layout.setSpacing(15)
-
-        for i, (name, url) in enumerate(quick_sites):
-            btn = QPushButton(name)
+        self.sites_grid = QGridLayout()
+        self.sites_grid.setSpacing(15)
+        if self.parent_browser is not None:
+            self.set_tiles(self.parent_browser.top_site_tiles())
+        else:
+            self.set_tiles(self.default_tiles())
+
+        sites_layout.addLayout(self.sites_grid)
+        self.scroll_layout.addWidget(sites_widget)
+
+    @classmethod
+    def default_tiles(cls):
+        """Плитки по умолчанию - популярные сервисы"""
+        return [(name, url, False) for name, url in cls.QUICK_SITES[:cls.TILE_COUNT]]
+
+    @classmethod
+    def parse_pin(cls, text):
+        """Плитка, закрепленная админом: «эмоджи Название | адрес»; строка без адреса сайт не закрепляет"""
+        name, separator, url = text.rpartition("|")
+        url = url.strip()
+        if not separator or not url:
+            return None
+        if "://" not in url:
+            url = "https://" + url
+        return name.strip() or url, url
+
+    @classmethod
+    def tile_name(cls, host):
+        """Название плитки для хоста из истории"""
+        return cls.SITE_NAMES.get(host) or f"🌐 {host}"
+
+    def set_tiles(self, tiles):
+        """Обновляет плитки на месте: меняет текст и адрес кнопок, недостающие создает"""
+        while len(self.site_buttons) < len(tiles):
+            btn = QPushButton()
             btn.setObjectName("homepageSiteButton")
             btn.setCursor(Qt.PointingHandCursor)
+            # Адрес читается при нажатии - кнопку можно перенастроить без переподключения
+            btn.clicked.connect(lambda checked, button=btn: self.open_site(button.property("url")))
+            # Наведение - намерение перейти: по нему браузер может заранее загрузить сайт
+            btn.installEventFilter(self)
+            index = len(self.site_buttons)
+            self.sites_grid.addWidget(btn, index // self.TILE_COLUMNS, index % self.TILE_COLUMNS)
+            self.site_buttons.append(btn)
+
+        for btn, (name, url, pinned) in zip(self.site_buttons, tiles):
+            if btn.text() != name:
+                btn.setText(name)
             btn.setProperty("url", url)
-            # Серый фон для всех кнопок с закругленными углами
-            btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #3a3a4a;
-                    color: white;
-                    border: none;
-                    border-radius: 15px;
-                    padding: 15px 20px;
-                    font-size: 14px;
-                    font-weight: bold;
-                    min-height: 50px;
-                }
-                QPushButton:hover {
-                    background-color: #4a4a5a;
-                    border: 2px solid #3498db;
-                }
-                QPushButton:pressed {
-                    background-color: #2a2a3a;
-                }
-            """)
-            btn.clicked.connect(lambda checked, u=url: self.open_site(u))
-
-            row = i // 3
-            col = i % 3
-            grid_layout.addWidget(btn, row, col)
-
-        sites_layout.addLayout(grid_layout)
-        scroll_layout.addWidget(sites_widget)
+            btn.setToolTip(f"📌 {url}" if pinned else url)
+            btn.show()
+        for btn in self.site_buttons[len(tiles):]:
+            btn.hide()
+
+    def build_below_fold(self):
+        """Достраивает нижнюю часть: информацию, быстрые действия и футер"""
+        if self.below_fold_built:
+            return
+        self.below_fold_built = True
 
         # 4. Информационная панель
         info_widget = QWidget()
-        info_widget.setStyleSheet("background-color: transparent;")
         info_layout = QVBoxLayout(info_widget)
         info_layout.setContentsMargins(40, 0, 40, 40)
 
         info_label = QLabel("📊 Информация о браузере")
         info_label.setObjectName("homepageInfoLabel")
-        info_label.setStyleSheet("""
-            QLabel {
-                color: #e0e0e0;
-                font-size: 20px;
-                font-weight: bold;
-                font-family: 'Segoe UI', Arial, sans-serif;
-            }
-        """)
         info_label.setAlignment(Qt.AlignCenter)
         info_layout.addWidget(info_label)
 
@@ -320,30 +3406,20 @@ class BrowserTab(QWidget):
         stats_label.setAlignment(Qt.AlignCenter)
         info_layout.addWidget(stats_label)
 
-        scroll_layout.addWidget(info_widget)
+        self.scroll_layout.addWidget(info_widget)
 
         # 5. Быстрые действия
         actions_widget = QWidget()
-        actions_widget.setStyleSheet("background-color: transparent;")
         actions_layout = QVBoxLayout(actions_widget)
         actions_layout.setContentsMargins(40, 0, 40, 40)
 
         actions_label = QLabel("⚡ Быстрые действия")
         actions_label.setObjectName("homepageActionsLabel")
-        actions_label.setStyleSheet("""
-            QLabel {
-                color: #e0e0e0;
-                font-size: 20px;
-                font-weight: bold;
-                font-family: 'Segoe UI', Arial, sans-serif;
-            }
-        """)
         actions_label.setAlignment(Qt.AlignCenter)
         actions_layout.addWidget(actions_label)
 
         # Кнопки действий в горизонтальном ряду
         actions_buttons = QWidget()
-        actions_buttons.setStyleSheet("background-color: transparent;")
         actions_buttons_layout = QHBoxLayout(actions_buttons)
         actions_buttons_layout.setSpacing(15)
 
@@ -358,54 +3434,39 @@ class BrowserTab(QWidget):
             btn = QPushButton(text)
             btn.setObjectName("homepageActionButton")
             btn.setCursor(Qt.PointingHandCursor)
-            btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #3a3a4a;
-                    color: white;
-                    border: none;
-                    border-radius: 12px;
-                    padding: 12px 20px;
-                    font-size: 13px;
-                    font-weight: bold;
-                    min-height: 45px;
-                }
-                QPushButton:hover {
-                    background-color: #4a4a5a;
-                    border: 2px solid #3498db;
-                }
-                QPushButton:pressed {
-                    background-color: #2a2a3a;
-                }
-            """)
             btn.clicked.connect(callback)
             actions_buttons_layout.addWidget(btn)
 
         actions_layout.addWidget(actions_buttons)
-        scroll_layout.addWidget(actions_widget)
+        self.scroll_layout.addWidget(actions_widget)
 
-        # 6. Футер - исправлен цвет текста на белый
+        # 6. Футер
         footer_widget = QWidget()
-        footer_widget.setStyleSheet("background-color: transparent;")
         footer_layout = QVBoxLayout(footer_widget)
         footer_layout.setContentsMargins(40, 20, 40, 40)
 
         footer_text = QLabel("© 2026 Der Browser | Современный веб-браузер с премиальным дизайном")
         footer_text.setObjectName("homepageFooterText")
-        footer_text.setStyleSheet("color: #ffffff; font-size: 12px; font-weight: 300;")  # Изменено на белый
         footer_text.setAlignment(Qt.AlignCenter)
 
         version_text = QLabel("Версия 3.0.0 | PyQtWebEngine 5.15.2")
         version_text.setObjectName("homepageVersionText")
-        version_text.setStyleSheet("color: #ffffff; font-size: 11px; font-weight: 300;")  # Изменено на белый
         version_text.setAlignment(Qt.AlignCenter)
 
         footer_layout.addWidget(footer_text)
         footer_layout.addWidget(version_text)
-        scroll_layout.addWidget(footer_widget)
+        self.scroll_layout.addWidget(footer_widget)
 
-        # Устанавливаем содержимое прокрутки
-        scroll_area.setWidget(scroll_content)
-        homepage_layout.addWidget(scroll_area)
+    def eventFilter(self, obj, event):
+        """Передает браузеру наведение на кнопки сайтов"""
+        if self.parent_browser is not None and event.type() in (QEvent.Enter, QEvent.Leave):
+            url = obj.property("url")
+            if url:
+                if event.type() == QEvent.Enter:
+                    self.parent_browser.speculation.hover(url)
+                else:
+                    self.parent_browser.speculation.unhover(url)
+        return super().eventFilter(obj, event)
 
     def open_site(self, url):
         """Открывает сайт в браузере"""
@@ -417,6 +3478,7 @@ class BrowserTab(QWidget):
         query = self.quick_search_bar.text()
         if query and self.parent_browser:
             # Создаем новую вкладку для поиска
+            self.quick_search_bar.clear()
             self.parent_browser.add_new_tab(query, "Поиск", False)
 
     def new_tab(self):
@@ -439,6 +3501,143 @@ class BrowserTab(QWidget):
         if self.parent_browser:
             self.parent_browser.show_settings_dialog()
 
+class BrowserTab(QWidget):
+    """Вкладка браузера"""
+    def __init__(self, parent_browser=None, url=None, is_homepage=False, is_incognito=False,
+                 lazy=False, title="", history_data=None, profile=None):
+        super().__init__()
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.is_homepage = is_homepage
+        self.is_incognito = is_incognito
+        self.parent_browser = parent_browser
+
+        # Инициализация переменных
+        self.url = url or ""
+        self.title = title
+        # История навигации восстановленной вкладки до создания WebView
+        self.pending_history = history_data
+        # Профиль WebEngine пользователя (None - профиль по умолчанию)
+        self.profile = profile
+        self.blocked_requests = 0
+        self.interceptor = None
+        self.load_timing = None  # Отметки сигналов загрузки последнего перехода
+
+        if is_homepage:
+            # Главная страница строится один раз на окно и показывается поверх стека вкладок,
+            # сама вкладка остается пустой; без окна (отдельная вкладка) страница своя
+            if parent_browser is None:
+                self.layout.addWidget(HomePage())
+        elif not lazy:
+            self.create_browser()
+
+    def create_browser(self):
+        """Создает WebView вкладки (для восстановленной вкладки - при первом показе)"""
+        self.browser = QWebEngineView()
+        if self.profile is not None:
+            self.browser.setPage(QWebEnginePage(self.profile, self.browser))
+        restored = False
+        if self.pending_history:
+            try:
+                stream = QDataStream(QByteArray(self.pending_history), QIODevice.ReadOnly)
+                stream >> self.browser.history()
+                restored = stream.status() == QDataStream.Ok
+            except Exception as e:
+                print(f"Ошибка восстановления истории вкладки: {e}")
+        if not restored and self.url:
+            self.browser.setUrl(QUrl(self.url))
+        self.pending_history = None
+
+        self.layout.addWidget(self.browser)
+
+    def is_lazy(self):
+        """Восстановленная вкладка, WebView которой еще не создан"""
+        return not self.is_homepage and not hasattr(self, 'browser')
+
+    def session_record(self):
+        """Состояние вкладки для сохранения сеанса"""
+        record = {"url": "", "title": "", "is_homepage": self.is_homepage,
+                  "is_incognito": self.is_incognito, "is_current": False, "history": None}
+        if self.is_incognito:
+            # От вкладки инкогнито остается только место в ряду вкладок
+            return record
+        if self.is_lazy():
+            record.update(url=self.url, title=self.title, history=self.pending_history)
+        elif not self.is_homepage:
+            record.update(url=self.browser.url().toString(), title=self.browser.title() or self.title)
+            try:
+                data = QByteArray()
+                stream = QDataStream(data, QIODevice.WriteOnly)
+                stream << self.browser.history()
+                record["history"] = bytes(data)
+            except Exception as e:
+                print(f"Ошибка сохранения истории вкладки: {e}")
+        return record
+
+class WaterfallWidget(QWidget):
+    """Водопад загрузки: полоса на каждый запрос и отметки FCP, DOMContentLoaded и load"""
+    ROW_HEIGHT = 18
+    LABEL_WIDTH = 280
+    TYPE_COLORS = {"navigation": "#e67e22", "script": "#f1c40f", "css": "#9b59b6", "link": "#9b59b6",
+                   "img": "#2ecc71", "image": "#2ecc71", "fetch": "#3498db", "xmlhttprequest": "#3498db",
+                   "font": "#1abc9c"}
+    MARKS = (("fcp", "FCP", "#2ecc71"), ("dcl", "DCL", "#3498db"), ("load", "load", "#e74c3c"))
+
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.rows = result["waterfall"]
+        self.total = max(1.0, result["total_ms"])
+        self.marks = [(label, color, result.get(key)) for key, label, color in self.MARKS if result.get(key)]
+        self.setMinimumSize(self.LABEL_WIDTH + 320, (len(self.rows) + 1) * self.ROW_HEIGHT + 4)
+        self.setMouseTracking(True)
+
+    def bar_x(self, ms):
+        return self.LABEL_WIDTH + ms / self.total * (self.width() - self.LABEL_WIDTH - 10)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        metrics = painter.fontMetrics()
+        painter.fillRect(self.rect(), QColor("#1a1a2a"))
+
+        # Шкала времени в первой строке
+        painter.setPen(QColor("#a0a0a0"))
+        for step in range(5):
+            ms = self.total * step / 4
+            x = self.bar_x(ms)
+            painter.drawLine(QPointF(x, self.ROW_HEIGHT - 3), QPointF(x, self.ROW_HEIGHT))
+            painter.drawText(QRectF(x - 40, 0, 80, self.ROW_HEIGHT - 3), Qt.AlignCenter, f"{ms:.0f} мс")
+
+        for row, (name, kind, start, end, size) in enumerate(self.rows):
+            y = (row + 1) * self.ROW_HEIGHT
+            if row % 2:
+                painter.fillRect(QRectF(0, y, self.width(), self.ROW_HEIGHT), QColor("#22223a"))
+            painter.setPen(QColor("#e0e0e0"))
+            label = metrics.elidedText(name, Qt.ElideMiddle, self.LABEL_WIDTH - 8)
+            painter.drawText(QRectF(4, y, self.LABEL_WIDTH - 8, self.ROW_HEIGHT), Qt.AlignVCenter | Qt.AlignLeft, label)
+            x = self.bar_x(start)
+            width = max(2.0, self.bar_x(end) - x)
+            painter.fillRect(QRectF(x, y + 4, width, self.ROW_HEIGHT - 8),
+                             QColor(self.TYPE_COLORS.get(kind, "#95a5a6")))
+
+        for label, color, ms in self.marks:
+            x = self.bar_x(ms)
+            painter.setPen(QPen(QColor(color), 1, Qt.DashLine))
+            painter.drawLine(QPointF(x, self.ROW_HEIGHT), QPointF(x, self.height()))
+        painter.end()
+
+    def event(self, event):
+        # Подсказка над строкой: тип, время и размер запроса
+        if event.type() == QEvent.ToolTip:
+            row = int(event.pos().y() // self.ROW_HEIGHT) - 1
+            if 0 <= row < len(self.rows):
+                name, kind, start, end, size = self.rows[row]
+                QToolTip.showText(event.globalPos(), f"{name}\n{kind}: {start:.0f}–{end:.0f} мс "
+                                                     f"({end - start:.0f} мс), {size / 1024:.1f} КБ", self)
+            else:
+                QToolTip.hideText()
+            return True
+        return super().event(event)
+
 class AuthDialog(QDialog):
     """Диалог аутентификации"""
     def __init__(self, parent=None, mode="login"):
@@ -574,7 +3773,766 @@ class AuthDialog(QDialog):
         else:
             return self.login_edit.text(), self.password_edit.text(), self.confirm_edit.text()
 
+class StartupProfiler:
+    """Фазы запуска с отметками времени для отчета --profile-startup"""
+    BAR_WIDTH = 40
+
+    def __init__(self, import_marks):
+        self.started = import_marks[0][1]
+        self.phases = []  # [имя, категория, глубина, начало, конец] по perf_counter
+        self._depth = 0
+        for (_, begin), (name, end) in zip(import_marks, import_marks[1:]):
+            self.phases.append([name, "import", 0, begin, end])
+
+    @contextlib.contextmanager
+    def phase(self, name, category="startup"):
+        """Замеряет фазу; вложенные фазы попадают в отчет с отступом"""
+        entry = [name, category, self._depth, time.perf_counter(), None]
+        self.phases.append(entry)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            entry[4] = time.perf_counter()
+
+    def record(self, name, category, begin, end=None):
+        """Добавляет уже прошедшую фазу"""
+        self.phases.append([name, category, self._depth, begin, end if end is not None else time.perf_counter()])
+
+    def mark(self, name):
+        """Отмечает момент без длительности (например, первый кадр)"""
+        now = time.perf_counter()
+        self.phases.append([name, "mark", self._depth, now, now])
+
+    def to_dict(self):
+        """Отчет в виде словаря для JSON"""
+        finished = max((phase[4] for phase in self.phases if phase[4] is not None), default=self.started)
+        # Ожидание ввода пользователя (окно входа) не считается временем запуска
+        waiting = sum(end - begin for _, category, _, begin, end in self.phases if category == "wait" and end)
+        imports = sum(end - begin for _, category, _, begin, end in self.phases if category == "import")
+        first_frame = next((begin for name, category, _, begin, _ in self.phases if category == "mark"), None)
+        return {
+            "total_ms": round((finished - self.started) * 1000, 2),
+            "imports_ms": round(imports * 1000, 2),
+            "waiting_ms": round(waiting * 1000, 2),
+            "startup_ms": round((finished - self.started - waiting) * 1000, 2),
+            "first_frame_ms": round((first_frame - self.started) * 1000, 2) if first_frame else None,
+            "phases": [
+                {
+                    "name": name,
+                    "category": category,
+                    "depth": depth,
+                    "start_ms": round((begin - self.started) * 1000, 2),
+                    "duration_ms": round(((end if end is not None else begin) - begin) * 1000, 2),
+                }
+                for name, category, depth, begin, end in self.phases
+            ],
+        }
+
+    def report(self):
+        """Отчет-водопад: начало и длительность каждой фазы от запуска модуля"""
+        data = self.to_dict()
+        scale = self.BAR_WIDTH / max(data["total_ms"], 1)
+        lines = [f"{'Фаза':<44}{'начало, мс':>12}{'длит., мс':>12}"]
+        for phase in data["phases"]:
+            name = "  " * phase["depth"] + phase["name"]
+            offset = int(phase["start_ms"] * scale)
+            bar = "|" if phase["category"] == "mark" else "█" * max(1, int(phase["duration_ms"] * scale))
+            lines.append(f"{name[:44]:<44}{phase['start_ms']:>12.1f}{phase['duration_ms']:>12.1f}  "
+                         f"{' ' * offset}{bar}")
+        lines.append("")
+        lines.append(f"Импорты: {data['imports_ms']:.1f} мс, ожидание ввода: {data['waiting_ms']:.1f} мс, "
+                     f"запуск без ожидания: {data['startup_ms']:.1f} мс")
+        if data["first_frame_ms"] is not None:
+            lines.append(f"Первый кадр: {data['first_frame_ms']:.1f} мс")
+        return "\n".join(lines)
+
+    def write(self, target):
+        """Печатает водопад ("" ), JSON ("json") или сохраняет JSON в файл"""
+        try:
+            if not target:
+                print(self.report())
+            elif target == "json":
+                print(json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+            else:
+                with open(target, 'w', encoding='utf-8') as f:
+                    json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+                print(f"Отчет о запуске сохранен: {target}")
+        except Exception as e:
+            print(f"Ошибка сохранения отчета о запуске: {e}")
+
+startup_profiler = StartupProfiler(STARTUP_IMPORT_MARKS)
+
+class RequestInterceptor(QWebEngineUrlRequestInterceptor):
+    """Проверяет запросы страницы вкладки списком доменов и фильтрами рекламы"""
+    # Испускается внутри interceptRequest (в Qt 5.13+ это поток GUI, пока страница ждет ответа
+    # перехватчика), поэтому подключается через очередь: новая навигация начнется после перехвата
+    navigation_blocked = pyqtSignal(str)
+
+    RESOURCE_TYPES = {
+        getattr(QWebEngineUrlRequestInfo, name): resource_type
+        for name, resource_type in [
+            ("ResourceTypeMainFrame", "document"), ("ResourceTypeSubFrame", "subdocument"),
+            ("ResourceTypeStylesheet", "stylesheet"), ("ResourceTypeScript", "script"),
+            ("ResourceTypeImage", "image"), ("ResourceTypeFontResource", "font"),
+            ("ResourceTypeSubResource", "other"), ("ResourceTypeObject", "object"),
+            ("ResourceTypeMedia", "media"), ("ResourceTypeFavicon", "image"),
+            ("ResourceTypeXhr", "xmlhttprequest"), ("ResourceTypePing", "ping"),
+            ("ResourceTypePluginResource", "object"),
+        ]
+        if hasattr(QWebEngineUrlRequestInfo, name)
+    }
+
+    def __init__(self, browser, tab, parent=None):
+        super().__init__(parent)
+        self.browser = browser
+        # None - страница предзагрузки, еще не принятая во вкладку
+        self.tab = tab
+
+    def interceptRequest(self, info):
+        # Движки только читаются, а включение и перезагрузка лишь подменяют ссылку на них
+        resource_type = self.RESOURCE_TYPES.get(info.resourceType(), "other")
+        blocklist = self.browser.site_blocklist
+        if blocklist is not None and resource_type in ("document", "subdocument"):
+            if blocklist.is_blocked(info.requestUrl().host()):
+                info.block(True)
+                if self.tab is not None:
+                    self.tab.blocked_requests += 1
+                if resource_type == "document":
+                    self.navigation_blocked.emit(info.requestUrl().toString())
+                return
+
+        engine = self.browser.ad_filter
+        if engine is None:
+            return
+        if engine.should_block(info.requestUrl().toString(), info.firstPartyUrl().host(), resource_type):
+            info.block(True)
+            if self.tab is not None:
+                self.tab.blocked_requests += 1
+
+class TabLifecycleManager(QObject):
+    """Заморозка и выгрузка фоновых вкладок через lifecycleState страницы"""
+    CHECK_INTERVAL_MS = 30000
+    MB = 1024 * 1024
+
+    # Есть ли на странице несохраненный ввод в формах
+    FORM_INPUT_SCRIPT = """
+    (function() {
+        var fields = document.querySelectorAll('input, textarea, select');
+        for (var i = 0; i < fields.length; i++) {
+            var field = fields[i];
+            if (field.tagName === 'SELECT') {
+                for (var j = 0; j < field.options.length; j++) {
+                    if (field.options[j].selected !== field.options[j].defaultSelected) return true;
+                }
+            } else if (field.type === 'checkbox' || field.type === 'radio') {
+                if (field.checked !== field.defaultChecked) return true;
+            } else if (['hidden', 'submit', 'button', 'reset', 'image'].indexOf(field.type) < 0) {
+                if (field.value !== field.defaultValue) return true;
+            }
+        }
+        var active = document.activeElement;
+        return !!(active && active.isContentEditable);
+    })()
+    """
+
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self.supported = hasattr(QWebEnginePage, "setLifecycleState")
+        self.current = None
+        self.hidden_since = {}  # вкладка -> time.monotonic() момента скрытия
+        self.frozen_count = 0
+        self.discarded_count = 0
+        self.reclaimed_bytes = 0
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.CHECK_INTERVAL_MS)
+        self.timer.timeout.connect(self.sweep)
+        if self.supported:
+            self.timer.start()
+
+    def activate(self, tab):
+        """Вкладка стала текущей: предыдущая уходит в фон, выгруженная перезагружается"""
+        now = time.monotonic()
+        if self.current is not None and self.current is not tab:
+            self.hidden_since[self.current] = now
+        self.current = tab
+        self.hidden_since.pop(tab, None)
+        page = self.page_of(tab)
+        if page is not None and page.lifecycleState() != QWebEnginePage.LifecycleState.Active:
+            # Из Discarded страница загружается заново по сохраненной истории
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Active)
+
+    def forget(self, tab):
+        """Забывает закрытую вкладку"""
+        self.hidden_since.pop(tab, None)
+        if self.current is tab:
+            self.current = None
+
+    def page_of(self, tab):
+        """Страница вкладки (None для главной и без поддержки lifecycleState)"""
+        if not self.supported or tab is None or tab.is_homepage or not hasattr(tab, 'browser'):
+            return None
+        return tab.browser.page()
+
+    def web_tabs(self):
+        """Веб-вкладки окна с их страницами"""
+        tabs = []
+        for i in range(self.browser.tab_widget.count()):
+            tab = self.browser.tab_widget.widget(i)
+            page = self.page_of(tab)
+            if page is not None:
+                tabs.append((tab, page))
+        return tabs
+
+    def background_tabs(self):
+        """Фоновые веб-вкладки с их страницами"""
+        return [(tab, page) for tab, page in self.web_tabs() if tab is not self.current]
+
+    def sweep(self):
+        """Периодическая проверка: заморозка давно скрытых вкладок и выгрузка при нехватке памяти"""
+        settings = self.browser.settings
+        if not settings.get("tab_lifecycle_enabled", True):
+            return
+        now = time.monotonic()
+        freeze_after = settings.get("tab_freeze_after_min", 5) * 60
+        tabs = self.background_tabs()
+        for tab, page in tabs:
+            hidden_since = self.hidden_since.setdefault(tab, now)
+            if page.lifecycleState() == QWebEnginePage.LifecycleState.Active and now - hidden_since >= freeze_after:
+                self.try_freeze(tab, page)
+
+        # Нехватка памяти: слишком много живых вкладок или мало свободной памяти в системе
+        live = [tab for tab, page in tabs
+                if page.lifecycleState() != QWebEnginePage.LifecycleState.Discarded]
+        excess_tabs = len(live) - settings.get("tab_max_live", 20)
+        excess_bytes = 0
+        available = self.available_memory_bytes()
+        if available is not None:
+            excess_bytes = settings.get("tab_discard_free_mb", 1024) * self.MB - available
+        if excess_tabs <= 0 and excess_bytes <= 0:
+            return
+
+        # Выгружаем сначала дольше всех скрытые замороженные вкладки
+        frozen = [(self.hidden_since[tab], tab, page) for tab, page in tabs
+                  if page.lifecycleState() == QWebEnginePage.LifecycleState.Frozen]
+        frozen.sort(key=lambda entry: entry[0])
+        discarded = 0
+        for _, tab, page in frozen:
+            if excess_tabs <= 0 and excess_bytes <= 0:
+                break
+            freed = self.discard(page)
+            excess_tabs -= 1
+            excess_bytes -= freed
+            discarded += 1
+        if discarded:
+            self.browser.show_notification(
+                f"💤 Выгружено фоновых вкладок: {discarded}, освобождено ~{self.reclaimed_bytes // self.MB} МБ")
+
+    def try_freeze(self, tab, page):
+        """Замораживает вкладку, если она не играет звук и в ней нет несохраненного ввода"""
+        if page.recentlyAudible() or page.recommendedState() == QWebEnginePage.LifecycleState.Active:
+            return
+        # Проверка форм асинхронная: замораживаем в ответе, если вкладка все еще в фоне
+        page.runJavaScript(self.FORM_INPUT_SCRIPT, lambda has_input: self._freeze_checked(tab, page, has_input))
+
+    def _freeze_checked(self, tab, page, has_input):
+        if tab is self.current or tab not in self.hidden_since:
+            return  # вкладку уже открыли или закрыли
+        tab.has_form_input = bool(has_input)
+        if has_input:
+            return
+        if page.lifecycleState() == QWebEnginePage.LifecycleState.Active and not page.recentlyAudible():
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+            self.frozen_count += 1
+
+    def discard(self, page):
+        """Выгружает страницу; возвращает оценку освобожденной памяти в байтах"""
+        freed = self.browser.settings.get("tab_memory_estimate_mb", 150) * self.MB
+        pid = page.renderProcessPid() if hasattr(page, "renderProcessPid") else 0
+        rss = self.process_memory_bytes(pid) if pid else None
+        if rss:
+            # Процесс отрисовки может быть общим для нескольких вкладок - делим поровну
+            sharing = sum(1 for _, other in self.web_tabs()
+                          if other.renderProcessPid() == pid
+                          and other.lifecycleState() != QWebEnginePage.LifecycleState.Discarded)
+            freed = rss // max(1, sharing)
+        page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        self.discarded_count += 1
+        self.reclaimed_bytes += freed
+        return freed
+
+    def stats(self):
+        """Текущее состояние вкладок и счетчики"""
+        states = {"active": 0, "frozen": 0, "discarded": 0}
+        for _, page in self.background_tabs():
+            state = page.lifecycleState()
+            if state == QWebEnginePage.LifecycleState.Frozen:
+                states["frozen"] += 1
+            elif state == QWebEnginePage.LifecycleState.Discarded:
+                states["discarded"] += 1
+            else:
+                states["active"] += 1
+        states.update(frozen_total=self.frozen_count, discarded_total=self.discarded_count,
+                      reclaimed_mb=self.reclaimed_bytes // self.MB)
+        return states
+
+    @staticmethod
+    def available_memory_bytes():
+        """Свободная память системы (None, если узнать не удалось)"""
+        try:
+            if sys.platform.startswith("linux"):
+                with open("/proc/meminfo", encoding="ascii") as f:
+                    for line in f:
+                        if line.startswith("MemAvailable:"):
+                            return int(line.split()[1]) * 1024
+            elif sys.platform == "win32":
+                import ctypes
+
+                class MEMORYSTATUSEX(ctypes.Structure):
+                    _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                                ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                                ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                                ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                                ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+                status = MEMORYSTATUSEX()
+                status.dwLength = ctypes.sizeof(status)
+                if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                    return status.ullAvailPhys
+        except Exception as e:
+            print(f"Ошибка чтения свободной памяти: {e}")
+        return None
+
+    @staticmethod
+    def process_memory_bytes(pid):
+        """Резидентная память процесса отрисовки (None, если узнать не удалось)"""
+        try:
+            if sys.platform.startswith("linux"):
+                with open(f"/proc/{pid}/status", encoding="ascii") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            return int(line.split()[1]) * 1024
+            elif sys.platform == "win32":
+                import ctypes
+
+                class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                    _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                                ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                                ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+                counters = PROCESS_MEMORY_COUNTERS()
+                counters.cb = ctypes.sizeof(counters)
+                # PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+                handle = ctypes.windll.kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+                if handle:
+                    try:
+                        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                            return counters.WorkingSetSize
+                    finally:
+                        ctypes.windll.kernel32.CloseHandle(handle)
+        except Exception as e:
+            print(f"Ошибка чтения памяти процесса {pid}: {e}")
+        return None
+
+class SpeculationEngine(QObject):
+    """Заранее загружает самый вероятный следующий адрес в одной скрытой странице"""
+    HOVER_DELAY_MS = 150        # наведение короче этого - не намерение перейти
+    EXPIRE_MS = 2 * 60 * 1000   # неиспользованная предзагрузка освобождается
+
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self.page = None
+        self.interceptor = None
+        self.target = None
+        self.source = None
+        self.loaded = False
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.skipped = 0
+        self.network_manager = None
+        self.metered = None
+
+        self.hover_url = None
+        self.hover_timer = QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.timeout.connect(lambda: self.speculate(self.hover_url, "hover"))
+        self.expire_timer = QTimer(self)
+        self.expire_timer.setSingleShot(True)
+        self.expire_timer.timeout.connect(self.discard)
+
+    @staticmethod
+    def normalize(url):
+        """Адрес без схемы, www. и завершающего слэша - для сравнения предсказания с переходом"""
+        url = url.strip().lower()
+        for prefix in ("https://", "http://"):
+            if url.startswith(prefix):
+                url = url[len(prefix):]
+        if url.startswith("www."):
+            url = url[4:]
+        return url.rstrip("/")
+
+    def metered_connection(self):
+        """Мобильное подключение по данным Qt bearer (на лимитном трафике не предзагружаем)"""
+        if self.metered is None:
+            # Опрос bearer медленный: запоминаем ответ и обновляем его только при смене подключения
+            self.network_manager = QNetworkConfigurationManager(self)
+            self.network_manager.configurationChanged.connect(lambda config: self.update_metered())
+            self.update_metered()
+        return self.metered
+
+    def update_metered(self):
+        """Перечитывает тип подключения по умолчанию"""
+        try:
+            family = self.network_manager.defaultConfiguration().bearerTypeFamily()
+            self.metered = family in (QNetworkConfiguration.Bearer2G, QNetworkConfiguration.Bearer3G,
+                                      QNetworkConfiguration.Bearer4G)
+        except Exception as e:
+            print(f"Ошибка определения типа подключения: {e}")
+            self.metered = False
+
+    def allowed(self):
+        """Предзагрузка включена, не инкогнито и подключение не лимитное"""
+        browser = self.browser
+        if not browser.settings.get("speculative_prerender", False):
+            return False
+        tab = browser.get_current_tab()
+        if browser.is_incognito or (tab is not None and tab.is_incognito) or self.metered_connection():
+            self.skipped += 1
+            return False
+        return True
+
+    def hover(self, url):
+        """Курсор над кнопкой сайта: предзагрузка, если он задержится"""
+        self.hover_url = url
+        self.hover_timer.start(self.HOVER_DELAY_MS)
+
+    def unhover(self, url):
+        """Курсор ушел с кнопки раньше, чем сработало намерение"""
+        if self.hover_url == url:
+            self.hover_timer.stop()
+
+    def speculate(self, url, source):
+        """Начинает загрузку адреса в скрытой странице вместо прежнего предсказания"""
+        if not url or not self.allowed():
+            return
+        if self.target is not None and self.normalize(url) == self.normalize(self.target):
+            return
+        blocklist = self.browser.site_blocklist
+        if blocklist is not None and blocklist.is_blocked(QUrl(url).host()):
+            return
+
+        self.discard()
+        self.page = QWebEnginePage(self.browser.web_profile(), self)
+        if hasattr(self.page, 'setUrlRequestInterceptor'):
+            # Фильтры действуют и на предзагрузку; вкладка появится, когда страница будет принята
+            self.interceptor = RequestInterceptor(self.browser, None, self.page)
+            self.page.setUrlRequestInterceptor(self.interceptor)
+        self.loaded = False
+        page = self.page
+        page.loadFinished.connect(lambda ok: self.page_finished(page, ok))
+        self.page.setUrl(QUrl(url))
+        self.target = url
+        self.source = source
+        self.started += 1
+        self.expire_timer.start(self.EXPIRE_MS)
+
+    def take(self, url, is_incognito=False):
+        """Отдает страницу, если переход совпал с предсказанием: (страница, перехватчик, загружена) или None"""
+        if self.page is None:
+            return None
+        if is_incognito or self.normalize(url) != self.normalize(self.target):
+            # Переход мимо предсказания: страница больше не нужна
+            self.discard()
+            return None
+        taken = (self.page, self.interceptor, self.loaded)
+        self.page = self.interceptor = self.target = None
+        self.expire_timer.stop()
+        self.hits += 1
+        return taken
+
+    def page_finished(self, page, ok):
+        """Загрузка скрытой страницы завершилась - вкладка уже не получит loadFinished"""
+        if page is self.page:
+            self.loaded = ok
+
+    def discard(self):
+        """Освобождает неиспользованную предзагрузку"""
+        if self.page is not None:
+            self.wasted += 1
+            self.page.deleteLater()
+            self.page = self.interceptor = self.target = None
+        self.expire_timer.stop()
+
+    def stats(self):
+        """Счетчики попаданий и напрасных предзагрузок"""
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "wasted": self.wasted,
+            "skipped": self.skipped,
+            "target": self.target,
+            "source": self.source if self.target else None,
+        }
+
+class PageTimingEngine(QObject):
+    """Замеры загрузки страниц: сигналы вкладки, Navigation и Resource Timing из страницы, разбор в фоне"""
+    analyzed = pyqtSignal(object, object)  # вкладка, результат разбора (None - ошибка)
+    SCRIPT_NAME = "derbrowser-page-timing"
+    LONG_TASK_MS = 50
+    WATERFALL_ROWS = 80
+    LARGEST_COUNT = 8
+    # Метрика -> (хорошо, плохо) в мс и вес в общей оценке, пороги как в Lighthouse
+    SCORE_THRESHOLDS = {"fcp": (1800, 3000, 0.25), "lcp": (2500, 4000, 0.35), "tbt": (200, 600, 0.3),
+                        "ttfb": (800, 1800, 0.1)}
+    # Ставится в каждую страницу до ее скриптов: длинные задачи и LCP видны только наблюдателю,
+    # а буфер Resource Timing по умолчанию - всего 250 записей
+    OBSERVER_SCRIPT = """
+        (function () {
+            if (window.__derTiming) return;
+            var timing = window.__derTiming = {longTasks: [], lcp: 0};
+            try { performance.setResourceTimingBufferSize(1000); } catch (e) {}
+            try {
+                new PerformanceObserver(function (list) {
+                    list.getEntries().forEach(function (e) { timing.longTasks.push([e.startTime, e.duration]); });
+                }).observe({entryTypes: ['longtask']});
+            } catch (e) {}
+            try {
+                new PerformanceObserver(function (list) {
+                    var entries = list.getEntries();
+                    timing.lcp = entries[entries.length - 1].startTime;
+                }).observe({type: 'largest-contentful-paint', buffered: true});
+            } catch (e) {}
+        })();
+    """
+    COLLECT_SCRIPT = """
+        (function () {
+            function pick(entry, fields) {
+                var out = {};
+                fields.forEach(function (field) { out[field] = entry[field]; });
+                return out;
+            }
+            var nav = performance.getEntriesByType('navigation')[0];
+            var timing = window.__derTiming || {longTasks: [], lcp: 0};
+            return JSON.stringify({
+                url: location.href,
+                navigation: nav ? pick(nav, ['redirectStart', 'redirectEnd', 'domainLookupStart', 'domainLookupEnd',
+                    'connectStart', 'connectEnd', 'secureConnectionStart', 'requestStart', 'responseStart',
+                    'responseEnd', 'domInteractive', 'domContentLoadedEventEnd', 'loadEventEnd', 'transferSize',
+                    'encodedBodySize', 'decodedBodySize']) : null,
+                resources: performance.getEntriesByType('resource').map(function (entry) {
+                    return pick(entry, ['name', 'initiatorType', 'startTime', 'responseEnd', 'transferSize',
+                        'encodedBodySize', 'decodedBodySize', 'renderBlockingStatus']);
+                }),
+                paint: performance.getEntriesByType('paint').map(function (e) { return [e.name, e.startTime]; }),
+                longTasks: timing.longTasks,
+                lcp: timing.lcp
+            });
+        })()
+    """
+
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+
+    @staticmethod
+    def new_marks(url, prerendered=False):
+        """Отметки нового перехода"""
+        return {"url": url, "started": time.perf_counter(), "progress": [], "finished_ms": None, "ok": None,
+                "prerendered": prerendered}
+
+    def attach(self, tab):
+        """Подключает отметки загрузки вкладки и наблюдатель в профиле ее страницы"""
+        try:
+            self.install(tab.browser.page().profile())
+        except Exception as e:
+            print(f"Ошибка установки замера загрузки: {e}")
+        tab.browser.loadStarted.connect(lambda: self.load_started(tab))
+        tab.browser.loadProgress.connect(lambda progress: self.load_progress(tab, progress))
+        tab.browser.loadFinished.connect(lambda ok: self.load_finished(tab, ok))
+
+    def install(self, profile):
+        """Ставит наблюдатель в профиль один раз - он работает и в страницах предзагрузки"""
+        scripts = profile.scripts()
+        if not scripts.findScript(self.SCRIPT_NAME).isNull():
+            return
+        script = QWebEngineScript()
+        script.setName(self.SCRIPT_NAME)
+        script.setSourceCode(self.OBSERVER_SCRIPT)
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        # Отдельный мир: переменные наблюдателя не видны скриптам страницы
+        script.setWorldId(QWebEngineScript.ApplicationWorld)
+        script.setRunsOnSubFrames(False)
+        scripts.insert(script)
+
+    def load_started(self, tab):
+        tab.load_timing = self.new_marks(tab.browser.url().toString())
+
+    def load_progress(self, tab, progress):
+        marks = tab.load_timing
+        if marks and marks["finished_ms"] is None and (not marks["progress"] or marks["progress"][-1][1] != progress):
+            marks["progress"].append(((time.perf_counter() - marks["started"]) * 1000, progress))
+
+    def load_finished(self, tab, ok):
+        marks = tab.load_timing
+        if marks and marks["finished_ms"] is None:
+            marks["finished_ms"] = (time.perf_counter() - marks["started"]) * 1000
+            marks["ok"] = ok
+
+    def measure(self, tab):
+        """Забирает замеры из страницы; результат придет сигналом analyzed"""
+        marks = dict(tab.load_timing or {})
+        marks["progress"] = list(marks.get("progress", ()))
+
+        def collected(payload):
+            # Разбор сотен записей не должен задерживать интерфейс
+            threading.Thread(target=self.analyze_in_background, args=(tab, payload, marks), daemon=True).start()
+
+        tab.browser.page().runJavaScript(self.COLLECT_SCRIPT, QWebEngineScript.ApplicationWorld, collected)
+
+    def analyze_in_background(self, tab, payload, marks):
+        try:
+            result = self.analyze(json.loads(payload), marks)
+        except Exception as e:
+            print(f"Ошибка анализа скорости: {e}")
+            result = None
+        # Сигнал из другого потока доставляется в поток интерфейса через очередь
+        self.analyzed.emit(tab, result)
+
+    @classmethod
+    def analyze(cls, raw, marks=None):
+        """Считает метрики загрузки по данным Performance API и отметкам сигналов вкладки"""
+        started = time.perf_counter()
+        marks = marks or {}
+        nav = raw.get("navigation") or {}
+
+        def span(start, end):
+            first, last = nav.get(start) or 0, nav.get(end) or 0
+            return last - first if first and last >= first else 0.0
+
+        secure = nav.get("secureConnectionStart") or 0
+        phases = [
+            ("Перенаправления", span("redirectStart", "redirectEnd")),
+            ("DNS", span("domainLookupStart", "domainLookupEnd")),
+            ("Соединение", span("connectStart", "secureConnectionStart" if secure else "connectEnd")),
+            ("TLS", span("secureConnectionStart", "connectEnd") if secure else 0.0),
+            ("Ожидание ответа", span("requestStart", "responseStart")),
+            ("Загрузка документа", span("responseStart", "responseEnd")),
+        ]
+        paint = dict(raw.get("paint") or ())
+        fcp = paint.get("first-contentful-paint", 0.0)
+        long_tasks = [(start, duration) for start, duration in raw.get("longTasks") or ()
+                      if duration > cls.LONG_TASK_MS]
+        # Total Blocking Time: время сверх 50 мс у длинных задач после первой отрисовки
+        tbt = sum(duration - cls.LONG_TASK_MS for start, duration in long_tasks if start >= fcp)
+        result = {
+            "url": raw.get("url", marks.get("url", "")),
+            "phases": phases,
+            "ttfb": nav.get("responseStart") or 0.0,
+            "fcp": fcp,
+            "lcp": raw.get("lcp") or 0.0,
+            "dom_interactive": nav.get("domInteractive") or 0.0,
+            "dcl": nav.get("domContentLoadedEventEnd") or 0.0,
+            "load": nav.get("loadEventEnd") or 0.0,
+            "tbt": tbt,
+            "long_tasks": len(long_tasks),
+            "qt_load_ms": marks.get("finished_ms"),
+            "qt_progress": marks.get("progress") or [],
+            "prerendered": marks.get("prerendered", False),
+            "loading": bool(marks) and marks.get("finished_ms") is None,
+        }
+
+        resources = raw.get("resources") or []
+        document_size = nav.get("transferSize") or nav.get("encodedBodySize") or 0
+        total_bytes, cached, by_type = document_size, 0, {}
+        rows = []
+        has_blocking_status = any("renderBlockingStatus" in entry for entry in resources)
+        blocking = []
+        for entry in resources:
+            kind = entry.get("initiatorType") or "other"
+            name = entry.get("name") or ""
+            path = urllib.parse.urlsplit(name).path.lower()
+            if kind == "link" and path.endswith(".css"):
+                kind = "css"
+            size = entry.get("transferSize") or entry.get("encodedBodySize") or 0
+            if not entry.get("transferSize") and entry.get("encodedBodySize"):
+                cached += 1
+            total_bytes += size
+            count, kind_bytes = by_type.get(kind, (0, 0))
+            by_type[kind] = (count + 1, kind_bytes + size)
+            start = entry.get("startTime") or 0.0
+            end = max(start, entry.get("responseEnd") or start)
+            rows.append((name, kind, start, end, size, entry))
+            # Chromium до 107 не сообщает renderBlockingStatus - тогда блокирующими считаем
+            # стили и скрипты, запрошенные до готовности DOM
+            if has_blocking_status:
+                if entry.get("renderBlockingStatus") == "blocking":
+                    blocking.append((name, kind, end - start))
+            elif kind in ("css", "script") and result["dom_interactive"] and start < result["dom_interactive"]:
+                blocking.append((name, kind, end - start))
+
+        rows.sort(key=lambda row: row[2])
+        document_row = (result["url"], "navigation", 0.0, nav.get("responseEnd") or 0.0, document_size)
+        result["waterfall"] = [document_row] + [row[:5] for row in rows[:cls.WATERFALL_ROWS - 1]]
+        result["total_ms"] = max([result["load"], result["dcl"], document_row[3]] + [row[3] for row in rows])
+        result["largest"] = [row[:5] for row in heapq.nlargest(cls.LARGEST_COUNT, rows,
+                                                                 key=lambda row: (row[4], row[3] - row[2]))]
+        result["blocking"] = blocking
+        result["requests"] = len(resources) + 1
+        result["bytes"] = total_bytes
+        result["cached"] = cached
+        result["by_type"] = sorted(by_type.items(), key=lambda item: -item[1][1])
+
+        # Оценка: каждая метрика линейно от 1 (хорошо) до 0 (плохо); неизмеренные не учитываются
+        score, weights = 0.0, 0.0
+        for key, (good, poor, weight) in cls.SCORE_THRESHOLDS.items():
+            value = result[key]
+            if not value and key != "tbt":
+                continue
+            score += weight * min(1.0, max(0.0, (poor - value) / (poor - good)))
+            weights += weight
+        result["score"] = round(100 * score / weights) if weights else None
+        result["recommendations"] = cls.recommendations(result, rows)
+        result["analysis_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    @classmethod
+    def recommendations(cls, result, rows):
+        """Советы по найденным проблемам"""
+        advice = []
+        if result["ttfb"] > cls.SCORE_THRESHOLDS["ttfb"][0]:
+            advice.append(f"Сервер отвечает медленно: первый байт через {result['ttfb']:.0f} мс")
+        if result["tbt"] > cls.SCORE_THRESHOLDS["tbt"][0]:
+            advice.append(f"Длинные задачи JavaScript ({result['long_tasks']}) блокируют страницу на "
+                          f"{result['tbt']:.0f} мс - разбейте их или отложите")
+        if result["blocking"]:
+            advice.append(f"Блокирующие отрисовку стили и скрипты: {len(result['blocking'])} - "
+                          f"используйте defer/async и встраивайте критичный CSS")
+        large_images = [row for row in rows if row[1] in ("img", "image") and row[4] > 200 * 1024]
+        if large_images:
+            advice.append(f"Крупные изображения: {len(large_images)} больше 200 КБ - сожмите их или используйте WebP")
+        uncompressed = [row for row in rows if row[1] in ("script", "css") and row[4] > 20 * 1024
+                        and row[5].get("encodedBodySize") and row[5].get("encodedBodySize") == row[5].get("decodedBodySize")]
+        if uncompressed:
+            advice.append(f"Без сжатия отдаются {len(uncompressed)} скриптов и стилей - включите gzip или brotli")
+        if result["requests"] > 100:
+            advice.append(f"Много запросов: {result['requests']} - объедините мелкие ресурсы")
+        if not advice:
+            advice.append("Серьезных проблем не найдено")
+        return advice
+
 class ModernBrowser(QMainWindow):
+    # Профили WebEngine по пользователям: создаются один раз на процесс и общие для всех вкладок
+    web_profiles = {}
+    host_index_built = pyqtSignal(object, object)  # история, индекс хостов, построенный в фоне
+
     def __init__(self):
                 # Админ настройки
         self.is_admin = False
@@ -583,12 +4541,7 @@ class ModernBrowser(QMainWindow):
             "logo_text": "Der Browser",
             "main_title": "🌐 Der Browser - Made by AI",
             "subtitle": "Modern Web Experience",
-            "quick_buttons": [
-                "🐱 GitHub", "📺 YouTube", "🎵 Spotify", "✈️ Telegram",
-                "🔍 Google", "📘 Facebook", "🐦 Twitter", "💼 LinkedIn",
-                "📷 Instagram", "🛒 Amazon", "📚 Wikipedia", "🎮 Twitch",
-                "💬 Discord", "☁️ Dropbox", "📦 Google Drive"
-            ]
+            "quick_buttons": []  # закрепленные плитки «эмоджи Название | адрес»
         }
         super().__init__()
         self.setWindowTitle("Der Browser")
@@ -597,11 +4550,25 @@ class ModernBrowser(QMainWindow):
         # Инициализация данных
         self.current_user = None
         self.is_incognito = False
-        self.incognito_history = []
-        self.bookmarks = []
-        self.history = []
+        self.incognito_history = HistoryStore()
+        self.bookmarks = BookmarkTree()
+        self.bookmark_index = BookmarkSearchIndex()
+        self.history = HistoryStore()
         self.zoom_level = 100
         self.homepage = "about:blank"
+        self.homepage_widget = None
+        self.theme_engine = ThemeEngine()
+        self.homepage_tiles_state = None  # Индекс хостов, его версия и режим инкогнито, по которым построены плитки
+        self.dialog_pool = DialogPool()
+        # Скомпилированные фильтры рекламы (None - блокировка выключена или еще не готова)
+        self.ad_filter = None
+        self.ad_filter_generation = 0
+        # Список заблокированных доменов (None - блокировка сайтов выключена)
+        self.site_blocklist = None
+        self.site_blocklist_generation = 0
+        # Предварительное разрешение имен популярных и набираемых сайтов
+        self.host_resolver = HostResolver()
+        self.host_index_built.connect(self.install_host_index)
         self.current_tab_index = 0
 
         # Настройки
@@ -617,18 +4584,44 @@ class ModernBrowser(QMainWindow):
             "home_page": "about:blank",
             "download_path": os.path.join(os.path.expanduser("~"), "Downloads"),
             "notifications": True,
-            "hardware_acceleration": True
+            "hardware_acceleration": True,
+            "save_delay_ms": 1500,
+            "journal_compact_kb": 256,
+            "tab_lifecycle_enabled": True,
+            "tab_freeze_after_min": 5,    # фоновая вкладка замораживается через столько минут
+            "tab_discard_free_mb": 1024,  # выгружать замороженные вкладки, если свободной памяти меньше
+            "tab_max_live": 20,           # или если живых фоновых вкладок больше
+            "tab_memory_estimate_mb": 150,
+            "cache_type": "disk",         # "disk", "memory" или "none"
+            "cache_size_mb": 100,
+            "dns_prefetch": True,         # заранее разрешать имена популярных и набираемых сайтов
+            "speculative_prerender": False,  # заранее загружать вероятный следующий адрес в скрытой странице
+            "omnibox_suggestions": True,  # подсказки и дописывание адреса при наборе
+            "restore_tabs": True,      # восстанавливать открытые вкладки при запуске
+            "tabs_save_sec": 30           # как часто сохранять открытые вкладки
         }
 
         # Путь для данных
         self.data_dir = os.path.join(os.path.expanduser("~"), ".derbrowser")
         os.makedirs(self.data_dir, exist_ok=True)
 
+        # Хранилище профилей (SQLite)
+        with startup_profiler.phase("ProfileStore"):
+            self.profile_store = ProfileStore(os.path.join(self.data_dir, 'profiles.db'))
+
+        # Фоновая запись профиля, чтобы не блокировать поток GUI
+        self.persistence = PersistenceWorker(self.profile_store, self.settings["save_delay_ms"])
+        self.persistence.start()
+        self.history_journal = None
+        self.journal_replayed = 0  # Посещений, восстановленных из журнала при входе
+
         # Загрузка данных пользователей
-        self.users = self.load_users()
+        with startup_profiler.phase("load_users"):
+            self.users = self.load_users()
 
         # Аутентификация - нужно запустить до создания UI
-        self.authenticate_and_init()
+        with startup_profiler.phase("authenticate_and_init"):
+            self.authenticate_and_init()
 
     def authenticate_and_init(self):
         """Аутентификация пользователя и инициализация интерфейса"""
@@ -641,13 +4634,14 @@ class ModernBrowser(QMainWindow):
                     username = session_data.get('username')
                     if username in self.users:
                         self.current_user = self.users[username]
-                        self.current_user.last_login = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        self.save_users()
+                        self.save_last_login(self.current_user)
 
                         # Проверка на админа при автовходе
                         if username in ['admin', 'RobertusaAdmin']:
                             password = session_data.get('password_hash')
-                            if password and self.verify_password("1555", password):
+                            with startup_profiler.phase("PBKDF2 (автовход)"):
+                                verified = bool(password) and self.verify_password("1555", password)
+                            if verified:
                                 self.is_admin = True
                             else:
                                 self.is_admin = False
@@ -665,7 +4659,8 @@ class ModernBrowser(QMainWindow):
 
         while True:
             dialog = AuthDialog(self, current_mode)
-            result = dialog.exec_()
+            with startup_profiler.phase("окно входа (ожидание ввода)", "wait"):
+                result = dialog.exec_()
 
             if result == QDialog.Rejected:
                 # Пользователь нажал Отмена или хочет сменить режим
@@ -675,6 +4670,7 @@ class ModernBrowser(QMainWindow):
                     continue
                 else:
                     # Пользователь действительно отменил
+                    self.persistence.stop()
                     sys.exit(0)
 
             elif result == QDialog.Accepted:
@@ -693,10 +4689,11 @@ class ModernBrowser(QMainWindow):
                         continue
 
                     if username in self.users:
-                        if self.verify_password(password, self.users[username].password_hash):
+                        with startup_profiler.phase("PBKDF2 (вход)"):
+                            verified = self.verify_password(password, self.users[username].password_hash)
+                        if verified:
                             self.current_user = self.users[username]
-                            self.current_user.last_login = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            self.save_users()
+                            self.save_last_login(self.current_user)
                             self.save_session(username, password if self.is_admin else "")
                             print(f"Успешный вход: {username}")
                             if self.is_admin:
@@ -732,11 +4729,12 @@ class ModernBrowser(QMainWindow):
                         continue
 
                     # Создаем нового пользователя
-                    password_hash = self.hash_password(password)
+                    with startup_profiler.phase("PBKDF2 (регистрация)"):
+                        password_hash = self.hash_password(password)
                     new_user = UserAccount(username, password_hash)
                     self.users[username] = new_user
                     self.current_user = new_user
-                    self.save_users()
+                    self.persistence.schedule(("user", username), self.profile_store.save_user, new_user)
                     self.save_session(username, password if self.is_admin else "")
 
                     QMessageBox.information(self, "Успех", "Регистрация прошла успешно!")
@@ -749,26 +4747,40 @@ class ModernBrowser(QMainWindow):
     def init_browser_ui(self):
         """Инициализация интерфейса браузера после успешной аутентификации"""
         # Загрузка данных пользователя
-        self.load_user_data()
+        with startup_profiler.phase("load_user_data"):
+            self.load_user_data()
 
         # Загрузка админ настроек
-        self.load_admin_settings()
+        with startup_profiler.phase("load_admin_settings"):
+            self.load_admin_settings()
 
         # Настройка интерфейса
-        self.init_ui()
+        with startup_profiler.phase("init_ui"):
+            self.init_ui()
+
+        # Фильтры компилируются в фоне и подключаются, когда готовы
+        if self.settings.get("block_ads"):
+            self.load_ad_filters()
+        if self.settings.get("site_blocking_enabled"):
+            self.load_site_blocklist()
+
+        # Имена сайтов разрешаются после первого кадра, в пуле потоков
+        if self.settings.get("dns_prefetch", True):
+            QTimer.singleShot(0, self.prefetch_startup_hosts)
 
         # Настройка горячих клавиш
-        self.setup_shortcuts()
+        with startup_profiler.phase("setup_shortcuts"):
+            self.setup_shortcuts()
 
         # Центрирование окна
         self.center_window()
 
-        # Применяем тему по умолчанию
-        self.apply_theme(self.settings["theme"])
-
-        # Применяем админ тему если пользователь админ
-        if self.is_admin:
-            self.apply_admin_theme()
+        # Применяем тему один раз: у админа админ тема заменяет пользовательскую
+        with startup_profiler.phase("apply_admin_theme" if self.is_admin else "apply_theme"):
+            if self.is_admin:
+                self.apply_admin_theme()
+            else:
+                self.apply_theme(self.settings["theme"])
 
         # Инициализация VPN
         self.vpn_status = False
@@ -809,38 +4821,148 @@ class ModernBrowser(QMainWindow):
     def load_users(self):
         """Загружает пользователей"""
         try:
+            # Однократный перенос из старого users.pkl
             users_file = os.path.join(self.data_dir, 'users.pkl')
-            if os.path.exists(users_file):
-                with open(users_file, 'rb') as f:
-                    return pickle.load(f)
+            self.profile_store.migrate_from_pickle(users_file)
+        except Exception as e:
+            print(f"Ошибка переноса users.pkl: {e}")
+
+        try:
+            return self.profile_store.load_users()
         except Exception as e:
             print(f"Ошибка загрузки пользователей: {e}")
         return {}
 
     def save_users(self):
-        """Сохраняет пользователей"""
-        try:
-            users_file = os.path.join(self.data_dir, 'users.pkl')
-            with open(users_file, 'wb') as f:
-                pickle.dump(self.users, f)
-        except Exception as e:
-            print(f"Ошибка сохранения пользователей: {e}")
+        """Сохраняет учетные записи пользователей"""
+        self.persistence.schedule(("users",), self.profile_store.save_users, list(self.users.values()))
+
+    def save_last_login(self, user):
+        """Отмечает вход пользователя (одна строка в таблице users)"""
+        user.last_login = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.persistence.schedule(("last_login", user.username), self.profile_store.update_last_login,
+                                  user.username, user.last_login)
 
     def load_user_data(self):
         """Загружает данные пользователя"""
         if self.current_user:
+            if not self.current_user.data_loaded:
+                # Данные читаются только для вошедшего пользователя
+                try:
+                    self.profile_store.load_user_data(self.current_user)
+                except Exception as e:
+                    print(f"Ошибка загрузки данных пользователя: {e}")
             self.bookmarks = self.current_user.bookmarks
+            self.bookmark_index.rebuild(self.bookmarks)
             self.history = self.current_user.history
             if hasattr(self.current_user, 'settings'):
                 self.settings.update(self.current_user.settings)
+            self.persistence.set_delay(self.settings.get("save_delay_ms", 1500))
+            self.open_history_journal()
+            self.build_host_index()
+
+    def build_host_index(self):
+        """Строит индекс хостов истории в фоне; до его готовности главная показывает популярные сайты"""
+        history = self.history
+        ranks = history.start_hosts_build()
+        if ranks is None:
+            return
+        threading.Thread(target=lambda: self.host_index_built.emit(history, HostFrecencyIndex.from_ranks(ranks.items())),
+                         daemon=True).start()
+
+    def install_host_index(self, history, index):
+        """Подключает готовый индекс хостов и перестраивает по нему плитки главной"""
+        if not history.finish_hosts_build(index) or history is not self.history:
+            return
+        self.refresh_homepage_tiles(force=True)
+        if self.settings.get("dns_prefetch", True) and not self.is_incognito:
+            self.host_resolver.prefetch_many(index.top(10))
+
+    def open_history_journal(self):
+        """Открывает журнал истории пользователя и восстанавливает его хвост"""
+        username = self.current_user.username
+        if self.history_journal and self.history_journal.username == username:
+            return
+        if self.history_journal:
+            self.history_journal.close()
+        try:
+            self.history_journal = HistoryJournal(
+                os.path.join(self.data_dir, 'journal'), username, self.profile_store,
+                self.settings.get("journal_compact_kb", 256) * 1024
+            )
+            self.journal_replayed = self.history_journal.recover(self.current_user.history)
+            if self.journal_replayed:
+                self.persistence.schedule(("compact", username), self.history_journal.compact)
+        except Exception as e:
+            print(f"Ошибка открытия журнала истории: {e}")
+            self.history_journal = None
 
     def save_user_data(self):
-        """Сохраняет данные пользователя"""
-        if self.current_user and not self.is_incognito:
+        """Сохраняет данные пользователя (запись выполняется в фоне)"""
+        # Если данные не удалось прочитать, не затираем их в базе настройками по умолчанию
+        if self.current_user and not self.is_incognito and self.current_user.data_loaded:
             self.current_user.bookmarks = self.bookmarks
             self.current_user.history = self.history
             self.current_user.settings = self.settings
-            self.save_users()
+            username = self.current_user.username
+            self.persistence.schedule(("user", username), self.profile_store.save_user, self.current_user)
+            self.persistence.schedule(("settings", username), self.profile_store.save_settings,
+                                      username, dict(self.settings))
+
+    def save_history_item(self, item):
+        """Сохраняет одну запись истории"""
+        if self.current_user and not self.is_incognito:
+            username = self.current_user.username
+            if self.history_journal is None:
+                self.persistence.schedule(("history", username, item.url),
+                                          self.profile_store.save_history_item, username, item)
+                return
+            try:
+                # Одна запись фиксированного формата в конец журнала
+                if self.history_journal.append(item):
+                    self.persistence.schedule(("compact", username), self.history_journal.compact)
+            except Exception as e:
+                print(f"Ошибка записи журнала истории: {e}")
+
+    def clear_history_records(self):
+        """Удаляет сохраненную историю пользователя"""
+        if self.current_user and not self.is_incognito:
+            username = self.current_user.username
+            if self.history_journal:
+                self.history_journal.clear()
+            self.persistence.schedule(("history_clear", username), self.profile_store.clear_history, username)
+
+    def save_bookmark(self, bookmark):
+        """Сохраняет одну закладку"""
+        if self.current_user and not self.is_incognito:
+            self.persistence.schedule(("bookmark", bookmark.id), self.profile_store.save_bookmark,
+                                      self.current_user.username, bookmark)
+
+    def save_bookmark_nodes(self, nodes):
+        """Сохраняет измененные закладки и папки (по строке на узел)"""
+        for node in nodes:
+            if isinstance(node, BookmarkFolder):
+                if self.current_user and not self.is_incognito:
+                    self.persistence.schedule(("bookmark_folder", node.id), self.profile_store.save_bookmark_folder,
+                                              self.current_user.username, node)
+            else:
+                self.bookmark_index.add(node)
+                self.save_bookmark(node)
+
+    def remove_bookmark_record(self, node):
+        """Удаляет сохраненную закладку или папку"""
+        if self.current_user:
+            # Заменяет еще не записанное сохранение этого же узла
+            if isinstance(node, BookmarkFolder):
+                self.persistence.schedule(("bookmark_folder", node.id), self.profile_store.delete_bookmark_folder,
+                                          node.id)
+            else:
+                self.persistence.schedule(("bookmark", node.id), self.profile_store.delete_bookmark, node.id)
+
+    def flush_user_data(self):
+        """Сохраняет данные и дожидается записи на диск"""
+        self.save_user_data()
+        self.persistence.flush()
 
     def center_window(self):
         """Центрирует окно на экране"""
@@ -868,6 +4990,16 @@ class ModernBrowser(QMainWindow):
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
         self.tab_widget.currentChanged.connect(self.tab_changed)
+        self.tab_lifecycle = TabLifecycleManager(self)
+        self.speculation = SpeculationEngine(self)
+        self.page_timing = PageTimingEngine(self)
+        self.page_timing.analyzed.connect(self.show_speed_results)
+
+        # Периодическое сохранение открытых вкладок (на случай аварийного завершения)
+        self.last_tabs = None
+        self.tabs_save_timer = QTimer(self)
+        self.tabs_save_timer.timeout.connect(self.save_tabs)
+        self.tabs_save_timer.start(max(5, self.settings.get("tabs_save_sec", 30)) * 1000)
 
         main_layout.addWidget(self.tab_widget)
 
@@ -877,8 +5009,11 @@ class ModernBrowser(QMainWindow):
         # Создание меню
         self.create_menu_bar()
 
-        # Создаем первую вкладку (главную страницу)
-        self.add_new_tab("", "🏠 Главная", True)
+        # Восстанавливаем вкладки прошлого сеанса или создаем главную страницу
+        with startup_profiler.phase("restore_tabs"):
+            restored = self.restore_tabs()
+        if not restored:
+            self.add_new_tab("", "🏠 Главная", True)
 
     def create_nav_bar(self, parent_layout):
         """Создает панель навигации"""
@@ -898,12 +5033,10 @@ class ModernBrowser(QMainWindow):
 
         logo_icon = QLabel("🌐")
         logo_icon.setObjectName("navLogoIcon")
-        logo_icon.setStyleSheet("font-size: 24px; color: #3498db; font-weight: bold;")
         logo_icon.setFixedSize(40, 40)
 
         logo_text = QLabel("Der Browser")
         logo_text.setObjectName("navLogoText")
-        logo_text.setStyleSheet("color: #e0e0e0; font-size: 18px; font-weight: bold;")
         logo_text.setFixedHeight(40)
 
         logo_layout.addWidget(logo_icon)
@@ -951,8 +5084,26 @@ class ModernBrowser(QMainWindow):
         self.url_bar.setObjectName("urlBar")
         self.url_bar.setPlaceholderText("Введите URL или поисковый запрос...")
         self.url_bar.returnPressed.connect(self.on_url_entered)
+        self.url_bar.textEdited.connect(self.on_url_text_edited)
         layout.addWidget(self.url_bar, 1)
 
+        # Подсказки адресной строки: своя модель без фильтрации внутри QCompleter
+        self.omnibox = OmniboxSuggester(self.history, self.bookmark_index)
+        self.omnibox_model = OmniboxModel(self)
+        self.omnibox_completer = QCompleter(self.omnibox_model, self)
+        self.omnibox_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.omnibox_completer.setMaxVisibleItems(8)
+        self.omnibox_completer.setWidget(self.url_bar)
+        self.omnibox_completer.activated[QModelIndex].connect(self.omnibox_activated)
+        self.omnibox_typed = ""
+        self.omnibox_committed = False
+
+        # Имя набираемого сайта разрешается, когда пользователь делает паузу
+        self.typed_prefetch_timer = QTimer(self)
+        self.typed_prefetch_timer.setSingleShot(True)
+        self.typed_prefetch_timer.setInterval(200)
+        self.typed_prefetch_timer.timeout.connect(self.prefetch_typed_host)
+
         # Кнопка перехода
         self.go_btn = QPushButton("➤")
         self.go_btn.setObjectName("goButton")
@@ -1150,6 +5301,26 @@ class ModernBrowser(QMainWindow):
         dev_tools_action.triggered.connect(self.show_dev_tools)
         tools_menu.addAction(dev_tools_action)
 
+        tab_memory_action = QAction('Память вкладок', self)
+        tab_memory_action.triggered.connect(self.show_tab_memory_stats)
+        tools_menu.addAction(tab_memory_action)
+
+        speculation_action = QAction('Предзагрузка страниц', self)
+        speculation_action.triggered.connect(self.show_speculation_stats)
+        tools_menu.addAction(speculation_action)
+
+        dns_stats_action = QAction('Кэш DNS', self)
+        dns_stats_action.triggered.connect(self.show_dns_stats)
+        tools_menu.addAction(dns_stats_action)
+
+        blocking_stats_action = QAction('Статистика блокировки', self)
+        blocking_stats_action.triggered.connect(self.show_blocking_stats)
+        tools_menu.addAction(blocking_stats_action)
+
+        reload_filters_action = QAction('Обновить фильтры', self)
+        reload_filters_action.triggered.connect(self.reload_filters)
+        tools_menu.addAction(reload_filters_action)
+
         # Меню "Справка"
         help_menu = menubar.addMenu('Справка')
 
@@ -1186,14 +5357,12 @@ class ModernBrowser(QMainWindow):
         if is_incognito is None:
             is_incognito = self.is_incognito
 
-        tab = BrowserTab(parent_browser=self, url=url, is_homepage=is_homepage, is_incognito=is_incognito)
+        tab = BrowserTab(parent_browser=self, url=url, is_homepage=is_homepage, is_incognito=is_incognito,
+                         profile=None if is_homepage else self.web_profile(is_incognito))
 
         if not is_homepage:
             # Настраиваем сигналы только для обычных вкладок
-            tab.browser.urlChanged.connect(self.update_url_bar)
-            tab.browser.loadProgress.connect(self.update_progress)
-            tab.browser.loadFinished.connect(self.page_loaded)
-            tab.browser.titleChanged.connect(lambda t: self.update_tab_title(tab, t))
+            self.connect_tab(tab)
 
         # Добавляем иконку инкогнито если нужно
         icon_text = "👤 " if is_incognito else ""
@@ -1204,6 +5373,156 @@ class ModernBrowser(QMainWindow):
 
         return tab
 
+    def web_profile(self, incognito=False):
+        """Профиль WebEngine текущего пользователя с собственными кэшем и cookies"""
+        if incognito:
+            key = None
+        elif self.current_user:
+            key = self.current_user.username
+        else:
+            return QWebEngineProfile.defaultProfile()
+
+        profile = self.web_profiles.get(key)
+        if profile is None:
+            # Родитель - приложение: профиль должен пережить страницы всех окон
+            if key is None:
+                # Профиль без имени ничего не пишет на диск
+                profile = QWebEngineProfile(QApplication.instance())
+            else:
+                storage_name = re.sub(r'[^A-Za-z0-9_-]', '_', key) + "-" + hashlib.sha1(key.encode()).hexdigest()[:8]
+                profile = QWebEngineProfile(storage_name, QApplication.instance())
+                storage_path = os.path.join(self.data_dir, "web_profiles", storage_name)
+                profile.setPersistentStoragePath(storage_path)
+                profile.setCachePath(os.path.join(storage_path, "cache"))
+            self.web_profiles[key] = profile
+            self.apply_cache_settings(profile)
+        return profile
+
+    def apply_cache_settings(self, profile=None):
+        """Применяет тип и размер HTTP кэша к профилю (по умолчанию - ко всем созданным)"""
+        profiles = [profile] if profile is not None else list(self.web_profiles.values())
+        cache_types = {
+            "disk": QWebEngineProfile.DiskHttpCache,
+            "memory": QWebEngineProfile.MemoryHttpCache,
+            "none": QWebEngineProfile.NoCache,
+        }
+        cache_type = cache_types.get(self.settings.get("cache_type", "disk"), QWebEngineProfile.DiskHttpCache)
+        max_size = int(self.settings.get("cache_size_mb", 100)) * 1024 * 1024
+        # Пресет производительности ограничивает кэш сверху
+        preset_cap = PERFORMANCE_PRESETS[active_performance.get("preset", "balanced")]["disk_cache_mb"]
+        if preset_cap:
+            max_size = min(max_size, preset_cap * 1024 * 1024)
+        for profile in profiles:
+            try:
+                # Профиль инкогнито держит кэш только в памяти
+                if profile.isOffTheRecord() and cache_type == QWebEngineProfile.DiskHttpCache:
+                    profile.setHttpCacheType(QWebEngineProfile.MemoryHttpCache)
+                else:
+                    profile.setHttpCacheType(cache_type)
+                profile.setHttpCacheMaximumSize(max_size)
+            except Exception as e:
+                print(f"Ошибка настройки кэша: {e}")
+
+    def attach_interceptor(self, tab, interceptor):
+        """Привязывает перехватчик запросов страницы к вкладке"""
+        interceptor.tab = tab
+        interceptor.navigation_blocked.connect(lambda url: self.show_block_page(tab, url), Qt.QueuedConnection)
+        tab.interceptor = interceptor
+
+    def adopt_page(self, tab, page, interceptor, loaded):
+        """Подставляет в только что созданную вкладку страницу, загруженную предзагрузкой"""
+        old_page = tab.browser.page()
+        page.setParent(tab.browser)
+        tab.browser.setPage(page)
+        if old_page is not page and old_page.parent() is tab.browser:
+            old_page.deleteLater()
+        # Счетчик прежней страницы к новой не относится
+        tab.blocked_requests = 0
+        if interceptor is not None:
+            self.attach_interceptor(tab, interceptor)
+        # Страница загружалась в фоне: сигналы вкладки ее загрузку не видели
+        tab.load_timing = PageTimingEngine.new_marks(page.url().toString(), prerendered=True)
+        self.url_bar.setText(page.url().toString())
+        if loaded:
+            tab.load_timing.update(finished_ms=0.0, ok=True)
+            # Загрузка закончилась в фоне: посещение и заголовок записываем сами, как по сигналам вкладки
+            self.update_progress(100)
+            self.page_loaded()
+
+    def connect_tab(self, tab):
+        """Подключает сигналы WebView вкладки и фильтр запросов"""
+        page = tab.browser.page()
+        if hasattr(page, 'setUrlRequestInterceptor'):
+            # Свой перехватчик у каждой страницы - счетчик заблокированного у каждой вкладки
+            self.attach_interceptor(tab, RequestInterceptor(self, tab, page))
+            page.setUrlRequestInterceptor(tab.interceptor)
+        tab.browser.urlChanged.connect(self.update_url_bar)
+        tab.browser.loadProgress.connect(self.update_progress)
+        tab.browser.loadFinished.connect(self.page_loaded)
+        tab.browser.titleChanged.connect(lambda t: self.update_tab_title(tab, t))
+        self.page_timing.attach(tab)
+
+    def add_restored_tab(self, record):
+        """Добавляет вкладку прошлого сеанса без WebView - он создается при первом показе"""
+        if record["is_homepage"] or record["is_incognito"] or not record["url"]:
+            title = "Инкогнито" if record["is_incognito"] else "🏠 Главная"
+            tab = BrowserTab(parent_browser=self, is_homepage=True, is_incognito=record["is_incognito"])
+        else:
+            title = record["title"] or record["url"]
+            tab = BrowserTab(parent_browser=self, url=record["url"], lazy=True, title=record["title"],
+                             history_data=record["history"], profile=self.web_profile())
+            title = title[:20] + "..." if len(title) > 20 else title
+
+        icon_text = "👤 " if tab.is_incognito else ""
+        return self.tab_widget.addTab(tab, f"{icon_text}{title}")
+
+    def restore_tabs(self):
+        """Восстанавливает вкладки прошлого сеанса, возвращает True при успехе"""
+        if not self.current_user or not self.settings.get("restore_tabs", True):
+            return False
+        try:
+            records = self.profile_store.load_tabs(self.current_user.username)
+        except Exception as e:
+            print(f"Ошибка загрузки сеанса: {e}")
+            return False
+        if not records:
+            return False
+
+        # Без сигналов первая добавленная вкладка не создаст свой WebView, став текущей
+        self.tab_widget.blockSignals(True)
+        current = 0
+        for record in records:
+            index = self.add_restored_tab(record)
+            if record["is_current"]:
+                current = index
+        self.tab_widget.setCurrentIndex(current)
+        self.tab_widget.blockSignals(False)
+
+        self.tab_changed(self.tab_widget.currentIndex())
+        self.last_tabs = records
+        return True
+
+    def collect_tabs(self):
+        """Собирает состояние всех открытых вкладок"""
+        records = []
+        current = self.tab_widget.currentIndex()
+        for i in range(self.tab_widget.count()):
+            record = self.tab_widget.widget(i).session_record()
+            record["is_current"] = i == current
+            records.append(record)
+        return records
+
+    def save_tabs(self):
+        """Сохраняет открытые вкладки (запись выполняется в фоне)"""
+        if not self.current_user or not self.current_user.data_loaded:
+            return
+        records = self.collect_tabs()
+        if records == self.last_tabs:
+            return
+        self.last_tabs = records
+        self.persistence.schedule(("tabs", self.current_user.username), self.profile_store.save_tabs,
+                                  self.current_user.username, records)
+
     def new_incognito_tab(self):
         """Создает новую вкладку в режиме инкогнито"""
         self.add_new_tab("", "Инкогнито", True, True)
@@ -1217,10 +5536,12 @@ class ModernBrowser(QMainWindow):
             self.show_notification("Режим инкогнито включен - история не сохраняется")
             # Сохраняем текущие данные перед переходом в инкогнито
             self.save_user_data()
-            self.incognito_history = []
+            self.incognito_history = HistoryStore()
         else:
             self.show_notification("Обычный режим включен")
             self.load_user_data()
+        # В инкогнито плитки из истории не показываются
+        self.refresh_homepage_tiles()
 
         # Обновляем статус бар
         user_info = f"Пользователь: {self.current_user.username}" if self.current_user else "Гость"
@@ -1233,29 +5554,295 @@ class ModernBrowser(QMainWindow):
         if self.is_incognito:
             self.incognito_btn.setText("👁")
             self.incognito_btn.setToolTip("Обычный режим")
-            self.incognito_btn.setStyleSheet("""
-                QPushButton {
-                    background-color: #2ecc71;
-                    border: 2px solid #27ae60;
-                    border-radius: 20px;
-                    color: white;
-                    font-size: 16px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #27ae60;
-                    border-color: #219955;
-                }
-            """)
         else:
             self.incognito_btn.setText("👤")
             self.incognito_btn.setToolTip("Режим инкогнито")
-            # Стиль будет применен через общий стиль темы
+        # Цвет кнопки задает тема по свойству incognito
+        self.incognito_btn.setProperty("incognito", self.is_incognito)
+        self.incognito_btn.style().unpolish(self.incognito_btn)
+        self.incognito_btn.style().polish(self.incognito_btn)
+
+    def get_homepage(self):
+        """Возвращает главную страницу окна, создавая ее при первом обращении"""
+        if self.homepage_widget is None:
+            self.homepage_widget = HomePage(self)
+        return self.homepage_widget
+
+    def top_site_tiles(self):
+        """Плитки главной: закрепленные админом, затем сайты по частоте и давности, затем популярные"""
+        tiles, seen = [], set()
+
+        def push(name, url, pinned):
+            host = HostFrecencyIndex.host_of(url)
+            if host and host not in seen and len(tiles) < HomePage.TILE_COUNT:
+                seen.add(host)
+                tiles.append((name, url, pinned))
+
+        for text in self.admin_settings.get("quick_buttons", []):
+            pin = HomePage.parse_pin(text)
+            if pin:
+                push(*pin, True)
+        hosts = self.history.hosts_ready
+        self.homepage_tiles_state = self.tiles_state(hosts)
+        if hosts is not None and not self.is_incognito:
+            # Готовый топ индекса хостов - история при этом не перебирается
+            for host in hosts.top(HomePage.TILE_COUNT):
+                push(HomePage.tile_name(host), f"https://{host}", False)
+        for name, url in HomePage.QUICK_SITES:
+            push(name, url, False)
+        return tiles
+
+    def tiles_state(self, hosts):
+        """Индекс хостов, версия его топа и режим инкогнито - по ним видно, устарели ли плитки"""
+        return hosts, hosts.top_revision if hosts is not None else 0, self.is_incognito
+
+    def refresh_homepage_tiles(self, force=False):
+        """Перестраивает плитки главной, если изменился топ сайтов или режим инкогнито"""
+        if self.homepage_widget is None:
+            return
+        if force or self.homepage_tiles_state != self.tiles_state(self.history.hosts_ready):
+            self.homepage_widget.set_tiles(self.top_site_tiles())
+
+    def show_homepage(self, tab):
+        """Показывает общую главную страницу поверх домашней вкладки"""
+        stack = tab.parentWidget()
+        if stack is None:
+            return
+        homepage = self.get_homepage()
+        if homepage.parent() is not stack:
+            # Страница лежит поверх вкладок, а не внутри них: смена вкладки не требует
+            # переноса виджета и повторного применения стилей
+            homepage.setParent(stack)
+            stack.installEventFilter(self)
+        self.refresh_homepage_tiles()
+        homepage.setGeometry(stack.contentsRect())
+        homepage.raise_()
+        homepage.show()
+
+    def hide_homepage(self):
+        """Скрывает общую главную страницу"""
+        if self.homepage_widget is not None:
+            self.homepage_widget.hide()
+
+    def eventFilter(self, obj, event):
+        """Подгоняет главную страницу под размер области вкладок"""
+        if event.type() == QEvent.Resize and self.homepage_widget is not None \
+                and self.homepage_widget.parent() is obj:
+            self.homepage_widget.setGeometry(obj.contentsRect())
+        return super().eventFilter(obj, event)
+
+    def filter_files(self, folder_name):
+        """Текстовые списки фильтров из папки данных"""
+        folder = os.path.join(self.data_dir, folder_name)
+        os.makedirs(folder, exist_ok=True)
+        return [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.endswith(".txt")]
+
+    def load_ad_filters(self):
+        """Компилирует фильтры рекламы в фоне (без остановки интерфейса)"""
+        paths = self.filter_files("filters")
+        if not paths:
+            self.show_notification(f"Нет фильтров рекламы: положите списки EasyList (*.txt) в "
+                                   f"{os.path.join(self.data_dir, 'filters')}")
+            return
+        self.ad_filter_generation += 1
+        threading.Thread(target=self.compile_ad_filters, args=(paths, self.ad_filter_generation),
+                         daemon=True).start()
+
+    def compile_ad_filters(self, paths, generation):
+        """Фоновая компиляция; готовый движок заменяет прежний одним присваиванием"""
+        try:
+            engine = AdFilterEngine.from_files(paths)
+        except Exception as e:
+            print(f"Ошибка компиляции фильтров рекламы: {e}")
+            return
+        # Пока шла компиляция, блокировку могли выключить или запустить перезагрузку
+        if generation == self.ad_filter_generation:
+            self.ad_filter = engine
+
+    def load_site_blocklist(self):
+        """Загружает списки доменов в фоне"""
+        paths = self.filter_files("blocklists")
+        if not paths:
+            self.show_notification(f"Нет списков доменов: положите файлы (*.txt, по домену в строке или "
+                                   f"формат hosts) в {os.path.join(self.data_dir, 'blocklists')}")
+            return
+        self.site_blocklist_generation += 1
+        threading.Thread(target=self.build_site_blocklist, args=(paths, self.site_blocklist_generation),
+                         daemon=True).start()
+
+    def build_site_blocklist(self, paths, generation):
+        """Фоновая сборка списка доменов; готовый список заменяет прежний одним присваиванием"""
+        try:
+            blocklist = DomainBlocklist.from_files(paths)
+        except Exception as e:
+            print(f"Ошибка загрузки списков доменов: {e}")
+            return
+        if generation == self.site_blocklist_generation:
+            self.site_blocklist = blocklist
+
+    def show_block_page(self, tab, url):
+        """Показывает во вкладке страницу блокировки вместо заблокированного сайта"""
+        if not hasattr(tab, 'browser'):
+            return
+        host = html.escape(QUrl(url).host())
+        tab.browser.setHtml(f"""
+            <html><head><meta charset="utf-8"><title>Сайт заблокирован</title></head>
+            <body style="background-color: #1a1a2a; color: #e0e0e0; font-family: 'Segoe UI', sans-serif;
+                         text-align: center; padding-top: 120px;">
+                <h1 style="color: #e74c3c;">🛡️ Сайт заблокирован</h1>
+                <p><b>{host}</b> есть в списке подозрительных сайтов.</p>
+                <p style="color: #888888;">Блокировку можно выключить в меню Инструменты.</p>
+            </body></html>
+        """, QUrl(url))
+
+    def reload_filters(self):
+        """Перечитывает списки фильтров и доменов без перезапуска"""
+        reloading = []
+        if self.settings.get("block_ads"):
+            self.load_ad_filters()
+            reloading.append("фильтры рекламы")
+        if self.settings.get("site_blocking_enabled"):
+            self.load_site_blocklist()
+            reloading.append("списки доменов")
+        if reloading:
+            self.show_notification(f"🛡️ Перезагружаются: {', '.join(reloading)}")
+        else:
+            self.show_notification("Блокировка рекламы и сайтов выключена")
+
+    def show_blocking_stats(self):
+        """Показывает размер фильтров и списков доменов и заблокированные запросы вкладок"""
+        parts = []
+        if self.ad_filter is not None:
+            stats = self.ad_filter.stats()
+            parts.append(f"правил {stats['rules']} (доменов {stats['hosts']}, шаблонов {stats['patterns']}, "
+                         f"пропущено {stats['skipped']}, компиляция {stats['compile_ms']:.0f} мс)")
+        if self.site_blocklist is not None:
+            stats = self.site_blocklist.stats()
+            parts.append(f"сайтов {stats['domains']} ({stats['memory_bytes'] / 1024 / 1024:.1f} МБ, "
+                         f"сборка {stats['build_ms']:.0f} мс, проверка {stats['avg_lookup_us']:.1f} мкс)")
+        if not parts:
+            self.show_notification("Блокировка выключена или списки еще загружаются")
+            return
+        total = sum(getattr(self.tab_widget.widget(i), 'blocked_requests', 0) for i in range(self.tab_widget.count()))
+        tab = self.get_current_tab()
+        self.show_notification(f"🛡️ {', '.join(parts)} | заблокировано: на вкладке "
+                               f"{tab.blocked_requests if tab else 0}, всего {total}")
+
+    def prefetch_startup_hosts(self):
+        """Разрешает имена сайтов главной страницы и самых посещаемых сайтов истории"""
+        # Самые посещаемые сайты разрешаются, когда в фоне будет готов индекс хостов
+        hosts = [HostResolver.host_of(url) for name, url, pinned in self.top_site_tiles()]
+        self.host_resolver.prefetch_many(dict.fromkeys(host for host in hosts if host))
+
+    def prefetch_typed_host(self):
+        """Разрешает имя сайта, набираемого в адресной строке, и предзагружает вероятный адрес"""
+        text = self.url_bar.text()
+        tab = self.get_current_tab()
+        # В инкогнито набранный адрес не должен уходить в DNS раньше, чем пользователь его откроет
+        is_incognito = self.is_incognito or (tab.is_incognito if tab else False)
+        if self.settings.get("dns_prefetch", True) and not is_incognito:
+            host = HostResolver.host_of(text)
+            if host:
+                self.host_resolver.prefetch(host)
+        # Предзагрузка принимается только в новую вкладку - то есть при наборе на главной
+        if self.settings.get("speculative_prerender", False) and self.get_current_browser() is None:
+            self.speculation.speculate(self.predict_typed_url(text), "url_bar")
+
+    def on_url_text_edited(self, text):
+        """Набор в адресной строке: подсказки, дописывание лучшего хоста и предзагрузка"""
+        self.typed_prefetch_timer.start()
+        typed_forward = len(text) > len(self.omnibox_typed) and text.startswith(self.omnibox_typed)
+        self.omnibox_typed = text
+        if not self.settings.get("omnibox_suggestions", True):
+            return
+        rows = self.omnibox.suggest(text, self.open_tab_entries())
+        self.omnibox_model.set_rows(rows)
+        if rows:
+            self.omnibox_completer.complete()
+        else:
+            self.omnibox_completer.popup().hide()
+        # Дописываем хост только при наборе вперед, иначе Backspace не смог бы стереть выделение
+        if typed_forward and rows and rows[0][0] == "host" and self.url_bar.cursorPosition() == len(text):
+            host = rows[0][1]
+            prefix = OmniboxSuggester.host_prefix(text)
+            completion = text + host[len(prefix):]
+            if len(completion) > len(text):
+                self.url_bar.setText(completion)
+                self.url_bar.setSelection(len(text), len(completion) - len(text))
+
+    def open_tab_entries(self):
+        """Заголовки и адреса открытых вкладок, кроме текущей"""
+        entries = []
+        for index in range(self.tab_widget.count()):
+            tab = self.tab_widget.widget(index)
+            if index == self.current_tab_index or tab is None or tab.is_homepage or tab.is_incognito:
+                continue
+            if tab.is_lazy():
+                entries.append((tab.title, tab.url))
+            elif hasattr(tab, 'browser'):
+                entries.append((tab.browser.title(), tab.browser.url().toString()))
+        return entries
+
+    def omnibox_activated(self, index):
+        """Выбор подсказки: переход по адресу или переключение на открытую вкладку"""
+        row = self.omnibox_model.row_at(index.row())
+        if row is None:
+            return
+        kind, title, url = row
+        # Enter в списке доходит и до адресной строки - второй переход не нужен
+        self.omnibox_committed = True
+        QTimer.singleShot(0, lambda: setattr(self, 'omnibox_committed', False))
+        self.omnibox_typed = url
+        if kind == "tab":
+            for tab_index in range(self.tab_widget.count()):
+                tab = self.tab_widget.widget(tab_index)
+                if tab and not tab.is_homepage and tab_index != self.current_tab_index and (
+                        (tab.url if tab.is_lazy() else tab.browser.url().toString()) == url):
+                    self.tab_widget.setCurrentIndex(tab_index)
+                    return
+        self.url_bar.setText(url)
+        self.navigate_to_url(url)
+
+    def predict_typed_url(self, text):
+        """Лучший по посещениям адрес истории, который начинается с набранного текста"""
+        prefix = SpeculationEngine.normalize(text)
+        if len(prefix) < 3 or " " in prefix:
+            return None
+        for item in self.history.search(text, limit=20):
+            if SpeculationEngine.normalize(item.url).startswith(prefix):
+                return item.url
+        return None
+
+    def show_speculation_stats(self):
+        """Показывает счетчики предзагрузки"""
+        stats = self.speculation.stats()
+        target = f" | сейчас: {stats['target']} ({stats['source']})" if stats["target"] else ""
+        self.show_notification(
+            f"Предзагрузка: начато {stats['started']}, пригодилось {stats['hits']}, напрасно {stats['wasted']}, "
+            f"пропущено {stats['skipped']}{target}")
+
+    def show_dns_stats(self):
+        """Показывает состояние кэша разрешения имен"""
+        stats = self.host_resolver.stats()
+        self.show_notification(
+            f"DNS: в кэше {stats['cached']}, попаданий {stats['hits']}, промахов {stats['misses']}, "
+            f"ошибок {stats['failed']} | разрешение: среднее {stats['avg_ms']:.0f} мс, макс {stats['max_ms']:.0f} мс")
+
+    def show_tab_memory_stats(self):
+        """Показывает состояние фоновых вкладок и освобожденную память"""
+        stats = self.tab_lifecycle.stats()
+        self.show_notification(
+            f"Фоновые вкладки: активных {stats['active']}, замороженных {stats['frozen']}, "
+            f"выгруженных {stats['discarded']} | освобождено ~{stats['reclaimed_mb']} МБ")
 
     def close_tab(self, index):
         """Закрывает вкладку"""
         if self.tab_widget.count() > 1:
+            tab = self.tab_widget.widget(index)
             self.tab_widget.removeTab(index)
+            # removeTab не удаляет виджет - без этого страница закрытой вкладки продолжает жить
+            self.tab_lifecycle.forget(tab)
+            tab.deleteLater()
         else:
             self.close()
 
@@ -1264,11 +5851,19 @@ class ModernBrowser(QMainWindow):
         self.current_tab_index = index
         if index >= 0:
             tab = self.tab_widget.widget(index)
+            if tab and tab.is_lazy():
+                # Восстановленная вкладка получает WebView только при первом показе
+                tab.create_browser()
+                self.connect_tab(tab)
+            self.tab_lifecycle.activate(tab)
             if tab and not tab.is_homepage and hasattr(tab, 'browser'):
+                self.hide_homepage()
                 current_url = tab.browser.url().toString()
                 self.url_bar.setText(current_url)
                 self.update_navigation_buttons()
             else:
+                if tab and tab.is_homepage:
+                    self.show_homepage(tab)
                 self.url_bar.setText("")
                 self.url_bar.setPlaceholderText("Der Browser - Главная")
                 self.back_btn.setEnabled(False)
@@ -1300,17 +5895,26 @@ class ModernBrowser(QMainWindow):
                     query = urllib.parse.quote(url)
                     url = f'https://www.google.com/search?q={query}'
 
+            # Подмена страницы стерла бы историю назад/вперед вкладки - предзагрузку не берем
+            self.speculation.discard()
             browser.setUrl(QUrl(url))
             self.url_bar.setText(url)
         else:
             # Если на главной странице, создаем новую вкладку для перехода
             tab = self.get_current_tab()
             is_incognito = tab.is_incognito if tab else False
-            self.add_new_tab(url, "Загрузка...", False, is_incognito)
+            speculated = self.speculation.take(url, is_incognito or self.is_incognito)
+            tab = self.add_new_tab("" if speculated else url, "Загрузка...", False, is_incognito)
+            if speculated:
+                self.adopt_page(tab, *speculated)
 
     def on_url_entered(self):
         """Обработчик ввода URL"""
+        if self.omnibox_committed:
+            return
+        self.omnibox_completer.popup().hide()
         url = self.url_bar.text()
+        self.omnibox_typed = ""
         if url:
             self.navigate_to_url(url)
 
@@ -1360,7 +5964,11 @@ class ModernBrowser(QMainWindow):
             self.status_label.setText(f"Загрузка... {progress}%")
         else:
             self.progress_bar.setVisible(False)
-            self.status_label.setText("Готово")
+            tab = self.get_current_tab()
+            if tab and tab.blocked_requests:
+                self.status_label.setText(f"Готово | 🛡️ заблокировано запросов: {tab.blocked_requests}")
+            else:
+                self.status_label.setText("Готово")
             self.add_current_to_history()
 
     def page_loaded(self):
@@ -1393,50 +6001,20 @@ class ModernBrowser(QMainWindow):
 
     def add_current_to_history(self):
         """Добавляет текущую страницу в историю"""
-        if self.is_incognito:
-            # В режиме инкогнито сохраняем историю только во временном списке
-            browser = self.get_current_browser()
-            if browser:
-                url = browser.url().toString()
-                title = browser.page().title()
-
-                if url and url != "about:blank":
-                    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                    # Проверяем, есть ли уже такая запись
-                    for item in self.incognito_history:
-                        if item.url == url:
-                            item.visit_count += 1
-                            item.visit_time = now
-                            item.title = title
-                            return
-
-                    # Новая запись
-                    item = HistoryItem(url, title, now, 1)
-                    self.incognito_history.append(item)
-        else:
-            # В обычном режиме сохраняем в постоянную историю пользователя
-            browser = self.get_current_browser()
-            if browser:
-                url = browser.url().toString()
-                title = browser.page().title()
-
-                if url and url != "about:blank":
-                    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                    # Проверяем, есть ли уже такая запись
-                    for item in self.history:
-                        if item.url == url:
-                            item.visit_count += 1
-                            item.visit_time = now
-                            item.title = title
-                            self.save_user_data()
-                            return
-
-                    # Новая запись
-                    item = HistoryItem(url, title, now, 1)
-                    self.history.append(item)
-                    self.save_user_data()
+        browser = self.get_current_browser()
+        if browser:
+            url = browser.url().toString()
+            title = browser.page().title()
+
+            if url and url != "about:blank":
+                if self.is_incognito:
+                    # В режиме инкогнито сохраняем историю только во временном хранилище
+                    self.incognito_history.record_visit(url, title)
+                else:
+                    # В обычном режиме сохраняем в постоянную историю пользователя
+                    item = self.history.record_visit(url, title)
+                    self.save_history_item(item)
+                    self.refresh_homepage_tiles()
 
     def add_current_to_bookmarks(self):
         """Добавляет текущую страницу в закладки"""
@@ -1451,8 +6029,8 @@ class ModernBrowser(QMainWindow):
 
             if url and url != "about:blank":
                 bookmark = Bookmark(title, url, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                self.bookmarks.append(bookmark)
-                self.save_user_data()
+                bookmark.id = self.profile_store.next_id("bookmarks")
+                self.save_bookmark_nodes(self.bookmarks.insert(bookmark))
                 self.show_notification(f"Закладка '{title[:30]}...' добавлена!" if len(title) > 30 else f"Закладка '{title}' добавлена!")
 
     def show_notification(self, message):
@@ -1466,6 +6044,16 @@ class ModernBrowser(QMainWindow):
             self.show_notification("В режиме инкогнито недоступны закладки")
             return
 
+        dialog = self.dialog_pool.get("bookmarks", self.create_bookmarks_dialog,
+                                      (id(self.bookmarks), self.bookmarks.revision),
+                                      self.refresh_bookmarks_dialog)
+        # Каждое открытие начинается с дерева и пустой строки поиска
+        dialog.search_edit.clear()
+        dialog.exec_()
+        self.dialog_pool.mark_clean("bookmarks", (id(self.bookmarks), self.bookmarks.revision))
+
+    def create_bookmarks_dialog(self):
+        """Создает диалог закладок (один раз за сеанс)"""
         dialog = QDialog(self)
         dialog.setWindowTitle("Закладки")
         dialog.setGeometry(400, 200, 700, 500)
@@ -1509,10 +6097,13 @@ class ModernBrowser(QMainWindow):
         search_layout.addWidget(search_btn)
         layout.addWidget(search_widget)
 
-        # Список закладок
-        bookmarks_list = QListWidget()
-        bookmarks_list.setStyleSheet("""
-            QListWidget {
+        # Список закладок: фильтр меняет только набор строк, виджеты не пересоздаются
+        bookmarks_model = BookmarkListModel(list(self.bookmarks), dialog)
+        filter_model = BookmarkFilterModel(self.bookmark_index, dialog)
+        filter_model.setSourceModel(bookmarks_model)
+
+        view_style = """
+            QListView, QTreeView {
                 background-color: #2a2a3a;
                 border: 2px solid #3a3a4a;
                 border-radius: 10px;
@@ -1520,38 +6111,59 @@ class ModernBrowser(QMainWindow):
                 font-size: 13px;
                 padding: 10px;
             }
-            QListWidget::item {
+            QListView::item, QTreeView::item {
                 padding: 10px;
                 border-radius: 5px;
                 margin: 5px;
             }
-            QListWidget::item:selected {
+            QListView::item:selected, QTreeView::item:selected {
                 background-color: #3498db;
                 color: white;
             }
-        """)
-
-        for bookmark in self.bookmarks:
-            item_text = f"{bookmark.icon} {bookmark.title}\n{bookmark.url}"
-            if bookmark.category and bookmark.category != "General":
-                item_text += f"\n📁 {bookmark.category}"
-            item = QListWidgetItem(item_text)
-            item.setData(Qt.UserRole, (bookmark.url, bookmark.title))
-            bookmarks_list.addItem(item)
+        """
 
-        layout.addWidget(bookmarks_list)
+        bookmarks_list = QListView()
+        bookmarks_list.setUniformItemSizes(True)
+        bookmarks_list.setModel(filter_model)
+        bookmarks_list.setStyleSheet(view_style)
+        bookmarks_list.doubleClicked.connect(lambda: self.open_bookmark(bookmarks_list, dialog))
+
+        # Дерево папок: перенос и переименование сохраняют только измененный узел
+        tree_model = BookmarkTreeModel(self.bookmarks, self.save_bookmark_nodes, dialog)
+        bookmarks_tree = QTreeView()
+        bookmarks_tree.setModel(tree_model)
+        bookmarks_tree.setHeaderHidden(True)
+        bookmarks_tree.setUniformRowHeights(True)
+        bookmarks_tree.setDragDropMode(QAbstractItemView.InternalMove)
+        bookmarks_tree.setDefaultDropAction(Qt.MoveAction)
+        bookmarks_tree.setEditTriggers(QAbstractItemView.EditKeyPressed | QAbstractItemView.SelectedClicked)
+        bookmarks_tree.setStyleSheet(view_style)
+        bookmarks_tree.doubleClicked.connect(lambda: self.open_bookmark(bookmarks_tree, dialog))
+
+        # Пока строка поиска пуста, показываем дерево, при вводе - плоский отфильтрованный список
+        views = QStackedWidget()
+        views.addWidget(bookmarks_tree)
+        views.addWidget(bookmarks_list)
+
+        search_edit.textChanged.connect(filter_model.set_query)
+        search_edit.textChanged.connect(lambda text: views.setCurrentIndex(1 if text.strip() else 0))
+        search_edit.returnPressed.connect(lambda: self.open_bookmark(views.currentWidget(), dialog))
+        search_btn.clicked.connect(lambda: filter_model.set_query(search_edit.text()))
+
+        layout.addWidget(views)
 
         # Кнопки
         button_layout = QHBoxLayout()
 
         open_btn = QPushButton("📂 Открыть")
-        open_btn.clicked.connect(lambda: self.open_bookmark(bookmarks_list, dialog))
+        open_btn.clicked.connect(lambda: self.open_bookmark(views.currentWidget(), dialog))
 
         new_folder_btn = QPushButton("📁 Новая папка")
-        new_folder_btn.clicked.connect(lambda: self.create_bookmark_folder())
+        new_folder_btn.clicked.connect(lambda: self.create_bookmark_folder(tree_model, bookmarks_tree))
 
         delete_btn = QPushButton("🗑️ Удалить")
-        delete_btn.clicked.connect(lambda: self.delete_bookmark(bookmarks_list))
+        delete_btn.clicked.connect(lambda: self.delete_selected_bookmark(views.currentWidget(), tree_model,
+                                                                         bookmarks_model))
 
         close_btn = QPushButton("✖ Закрыть")
         close_btn.clicked.connect(dialog.close)
@@ -1586,37 +6198,110 @@ class ModernBrowser(QMainWindow):
             }
         """)
 
-        dialog.exec_()
+        dialog.search_edit = search_edit
+        dialog.bookmarks_model = bookmarks_model
+        dialog.tree_model = tree_model
+        return dialog
+
+    def refresh_bookmarks_dialog(self, dialog):
+        """Перечитывает закладки в уже созданный диалог"""
+        dialog.bookmarks_model.set_bookmarks(list(self.bookmarks))
+        dialog.tree_model.set_tree(self.bookmarks)
 
-    def open_bookmark(self, list_widget, dialog):
+    def open_bookmark(self, view, dialog):
         """Открывает выбранную закладку"""
-        current_item = list_widget.currentItem()
-        if current_item:
-            url, title = current_item.data(Qt.UserRole)
-            self.add_new_tab(url, title[:20], False)
+        index = view.currentIndex()
+        if not index.isValid() and view.model().rowCount() == 1:
+            index = view.model().index(0, 0)
+        bookmark = index.data(Qt.UserRole) if index.isValid() else None
+        if isinstance(bookmark, Bookmark):
+            self.add_new_tab(bookmark.url, bookmark.title[:20], False)
             dialog.close()
 
-    def delete_bookmark(self, list_widget):
-        """Удаляет выбранную закладку"""
-        current_row = list_widget.currentRow()
-        if current_row >= 0:
-            del self.bookmarks[current_row]
-            list_widget.takeItem(current_row)
-            self.save_user_data()
+    def delete_selected_bookmark(self, view, tree_model, list_model):
+        """Удаляет выбранную в диалоге закладку или папку"""
+        index = view.currentIndex()
+        node = index.data(Qt.UserRole) if index.isValid() else None
+        if isinstance(node, BookmarkFolder):
+            reply = QMessageBox.question(self, "Удаление папки",
+                                       f"Удалить папку '{node.title}' вместе с содержимым?",
+                                       QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                for removed in self.delete_bookmark_folder(node.id, tree_model):
+                    if isinstance(removed, Bookmark):
+                        list_model.remove_bookmark(removed)
+                self.show_notification(f"Папка '{node.title}' удалена")
+        elif isinstance(node, Bookmark):
+            self.delete_bookmark(node.id, tree_model)
+            list_model.remove_bookmark(node)
             self.show_notification("Закладка удалена")
 
-    def create_bookmark_folder(self):
+    def delete_bookmark(self, bookmark_id, tree_model=None):
+        """Удаляет закладку по id"""
+        bookmark = self.bookmarks.get(bookmark_id)
+        if bookmark is None:
+            return None
+        if tree_model is not None:
+            tree_model.remove_node(bookmark)
+        else:
+            self.bookmarks.remove(bookmark)
+        self.bookmark_index.remove(bookmark)
+        self.remove_bookmark_record(bookmark)
+        return bookmark
+
+    def delete_bookmark_folder(self, folder_id, tree_model=None):
+        """Удаляет папку закладок по id вместе с содержимым"""
+        folder = self.bookmarks.get_folder(folder_id)
+        if folder is None:
+            return []
+        removed = tree_model.remove_node(folder) if tree_model is not None else self.bookmarks.remove(folder)
+        for node in removed:
+            if isinstance(node, Bookmark):
+                self.bookmark_index.remove(node)
+            self.remove_bookmark_record(node)
+        return removed
+
+    def create_bookmark_folder(self, tree_model=None, tree_view=None):
         """Создает новую папку для закладок"""
         folder_name, ok = QInputDialog.getText(self, "Новая папка", "Введите название папки:")
-        if ok and folder_name:
-            self.show_notification(f"Создана папка: {folder_name}")
+        if ok and folder_name.strip():
+            # Папка создается внутри выбранной папки (или рядом с выбранной закладкой)
+            parent_id = None
+            selected = tree_view.currentIndex().data(Qt.UserRole) if tree_view else None
+            if isinstance(selected, BookmarkFolder):
+                parent_id = selected.id
+            elif selected is not None:
+                parent_id = selected.parent_id
+
+            folder = BookmarkFolder(folder_name.strip())
+            folder.id = self.profile_store.next_id("bookmark_folders")
+            if tree_model is not None:
+                tree_view.setCurrentIndex(tree_model.insert_node(folder, parent_id))
+            else:
+                self.save_bookmark_nodes(self.bookmarks.insert(folder, parent_id))
+            self.show_notification(f"Создана папка: {folder.title}")
 
     def organize_bookmarks(self):
         """Управление закладками"""
-        self.show_notification("Функция управления закладками в разработке")
+        # Дерево закладок с переносом и переименованием - в диалоге закладок
+        self.show_bookmarks_dialog()
 
     def show_history_dialog(self):
         """Показывает диалог истории"""
+        # У инкогнито свой диалог: другой заголовок и своя очистка
+        name = "incognito_history" if self.is_incognito else "history"
+        history = self.incognito_history if self.is_incognito else self.history
+        dialog = self.dialog_pool.get(name, self.create_history_dialog,
+                                      (id(history), history.revision), self.refresh_history_dialog)
+        # Каждое открытие начинается со всей истории
+        if dialog.history_model.since_days is not None:
+            dialog.all_button.setChecked(True)
+            dialog.history_model.set_range(None)
+        dialog.exec_()
+        self.dialog_pool.mark_clean(name, (id(history), history.revision))
+
+    def create_history_dialog(self):
+        """Создает диалог истории (один раз за сеанс для обычного режима и для инкогнито)"""
         if self.is_incognito:
             # Показываем историю инкогнито
             history_to_show = self.incognito_history
@@ -1644,26 +6329,34 @@ class ModernBrowser(QMainWindow):
         filter_widget = QWidget()
         filter_layout = QHBoxLayout(filter_widget)
 
-        today_btn = QPushButton("Сегодня")
-        week_btn = QPushButton("Неделя")
-        month_btn = QPushButton("Месяц")
-        all_btn = QPushButton("Все")
+        history_model = HistoryListModel(history_to_show, dialog)
+        count_label = QLabel()
+        count_label.setStyleSheet("color: #a0a0a0; font-size: 12px;")
 
-        for btn in [today_btn, week_btn, month_btn, all_btn]:
+        # Кнопки фильтров - выборки по корзинам дней, а не по всему списку
+        range_group = QButtonGroup(dialog)
+        for text, since_days in [("Сегодня", 0), ("Неделя", 6), ("Месяц", 29), ("Все", None)]:
+            btn = QPushButton(text)
             btn.setFixedHeight(35)
+            btn.setCheckable(True)
+            btn.setChecked(since_days is None)
+            btn.clicked.connect(lambda checked, days=since_days: history_model.set_range(days))
+            range_group.addButton(btn)
+            filter_layout.addWidget(btn)
+            if since_days is None:
+                dialog.all_button = btn
 
-        filter_layout.addWidget(today_btn)
-        filter_layout.addWidget(week_btn)
-        filter_layout.addWidget(month_btn)
-        filter_layout.addWidget(all_btn)
         filter_layout.addStretch()
+        filter_layout.addWidget(count_label)
 
         layout.addWidget(filter_widget)
 
-        # Список истории
-        history_list = QListWidget()
+        # Список истории: QListView запрашивает строки у модели только при прокрутке
+        history_list = QListView()
+        history_list.setUniformItemSizes(True)
+        history_list.setModel(history_model)
         history_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: #2a2a3a;
                 border: 2px solid #3a3a4a;
                 border-radius: 10px;
@@ -1671,23 +6364,20 @@ class ModernBrowser(QMainWindow):
                 font-size: 13px;
                 padding: 10px;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 10px;
                 border-radius: 5px;
                 margin: 5px;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #3498db;
                 color: white;
             }
         """)
-
-        for item in reversed(history_to_show[-100:]):  # Последние 100 записей
-            visits = f" ({item.visit_count} посещ.)" if item.visit_count > 1 else ""
-            display_text = f"{item.visit_time} - {item.title[:50]}{visits}"
-            if len(item.title) > 50:
-                display_text += "..."
-            history_list.addItem(display_text)
+        history_list.doubleClicked.connect(lambda: self.open_from_history(history_list, dialog))
+        history_model.modelReset.connect(
+            lambda: count_label.setText(f"Записей: {history_model.total_count()}"))
+        count_label.setText(f"Записей: {history_model.total_count()}")
 
         layout.addWidget(history_list)
 
@@ -1695,14 +6385,14 @@ class ModernBrowser(QMainWindow):
         button_layout = QHBoxLayout()
 
         open_btn = QPushButton("📂 Перейти")
-        open_btn.clicked.connect(lambda: self.open_from_history(history_list, dialog, history_to_show))
+        open_btn.clicked.connect(lambda: self.open_from_history(history_list, dialog))
 
         if not self.is_incognito:
             clear_btn = QPushButton("🗑️ Очистить историю")
-            clear_btn.clicked.connect(lambda: self.clear_history_dialog(history_list))
+            clear_btn.clicked.connect(lambda: self.clear_history_dialog(history_model))
         else:
             clear_btn = QPushButton("🗑️ Очистить (инкогнито)")
-            clear_btn.clicked.connect(lambda: self.clear_incognito_history(history_list))
+            clear_btn.clicked.connect(lambda: self.clear_incognito_history(history_model))
 
         search_btn = QPushButton("🔍 Поиск в истории")
         search_btn.clicked.connect(self.search_in_history)
@@ -1738,24 +6428,30 @@ class ModernBrowser(QMainWindow):
                 background-color: #4a4a5a;
                 border-color: #3498db;
             }
+            QPushButton:checked {
+                background-color: #3498db;
+                border-color: #3498db;
+                color: white;
+            }
         """)
 
-        dialog.exec_()
+        dialog.history_model = history_model
+        return dialog
+
+    def refresh_history_dialog(self, dialog):
+        """Переключает созданный диалог истории на текущие данные"""
+        dialog.history_model.set_history(self.incognito_history if self.is_incognito else self.history)
 
-    def open_from_history(self, list_widget, dialog, history_to_show):
+    def open_from_history(self, list_view, dialog):
         """Открывает выбранную страницу из истории"""
-        current_row = list_widget.currentRow()
-        if current_row >= 0 and history_to_show:
-            # Преобразуем индекс (список отображается в обратном порядке)
-            actual_index = len(history_to_show) - 1 - current_row
-            if 0 <= actual_index < len(history_to_show):
-                url = history_to_show[actual_index].url
-                tab = self.get_current_tab()
-                is_incognito = self.is_incognito or (tab.is_incognito if tab else False)
-                self.add_new_tab(url, "Загрузка...", False, is_incognito)
-                dialog.close()
+        item = list_view.model().item_at(list_view.currentIndex().row())
+        if item is not None:
+            tab = self.get_current_tab()
+            is_incognito = self.is_incognito or (tab.is_incognito if tab else False)
+            self.add_new_tab(item.url, "Загрузка...", False, is_incognito)
+            dialog.close()
 
-    def clear_history_dialog(self, list_widget):
+    def clear_history_dialog(self, history_model):
         """Очищает историю в диалоге"""
         reply = QMessageBox.question(self, "Очистка истории",
                                    "Вы уверены, что хотите очистить всю историю?",
@@ -1763,9 +6459,9 @@ class ModernBrowser(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.history.clear()
-            if list_widget:
-                list_widget.clear()
-            self.save_user_data()
+            if history_model:
+                history_model.refresh()
+            self.clear_history_records()
             self.show_notification("История очищена")
 
     def clear_all_history(self):
@@ -1776,27 +6472,121 @@ class ModernBrowser(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.history.clear()
-            self.save_user_data()
+            self.clear_history_records()
             self.show_notification("Вся история очищена")
 
     def search_in_history(self):
         """Поиск в истории"""
-        self.show_notification("Функция поиска в истории в разработке")
+        query, ok = QInputDialog.getText(self, "Поиск в истории",
+                                         "Введите слова из адреса или заголовка страницы:")
+        if not ok or not query.strip():
+            return
 
-    def clear_incognito_history(self, list_widget):
-        """Очищает историю инкогнито"""
-        self.incognito_history.clear()
-        if list_widget:
-            list_widget.clear()
-        self.show_notification("История инкогнито очищена")
+        history = self.incognito_history if self.is_incognito else self.history
+        started = time.perf_counter()
+        results = history.search(query, 50)
+        elapsed_ms = (time.perf_counter() - started) * 1000
 
-    def show_context_menu(self):
-        """Показывает контекстное меню"""
-        menu = QMenu(self)
-        menu.setStyleSheet("""
-            QMenu {
-                background-color: #1a1a2a;
-                border: 2px solid #3498db;
+        if not results:
+            self.show_notification(f"По запросу '{query[:30]}' ничего не найдено")
+            return
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Результаты поиска в истории")
+        dialog.setGeometry(420, 220, 800, 500)
+        dialog.setObjectName("settingsDialog")
+
+        layout = QVBoxLayout(dialog)
+        layout.setSpacing(15)
+
+        title_label = QLabel(f"🔍 {query[:50]} — найдено {len(results)} ({elapsed_ms:.1f} мс)")
+        title_label.setAlignment(Qt.AlignCenter)
+        title_label.setStyleSheet("color: #3498db; font-size: 18px; font-weight: bold;")
+        layout.addWidget(title_label)
+
+        results_list = QListWidget()
+        results_list.setStyleSheet("""
+            QListWidget {
+                background-color: #2a2a3a;
+                border: 2px solid #3a3a4a;
+                border-radius: 10px;
+                color: #e0e0e0;
+                font-size: 13px;
+                padding: 10px;
+            }
+            QListWidget::item {
+                padding: 10px;
+                border-radius: 5px;
+                margin: 5px;
+            }
+            QListWidget::item:selected {
+                background-color: #3498db;
+                color: white;
+            }
+        """)
+        for item in results:
+            visits = f" ({item.visit_count} посещ.)" if item.visit_count > 1 else ""
+            list_item = QListWidgetItem(f"{item.title[:60] or item.url[:60]}{visits}\n{item.url}")
+            list_item.setData(Qt.UserRole, item.url)
+            results_list.addItem(list_item)
+        layout.addWidget(results_list)
+
+        def open_result():
+            current_item = results_list.currentItem()
+            if current_item:
+                self.add_new_tab(current_item.data(Qt.UserRole), "Загрузка...", False, self.is_incognito)
+                dialog.close()
+
+        results_list.itemDoubleClicked.connect(lambda _: open_result())
+
+        button_layout = QHBoxLayout()
+        open_btn = QPushButton("📂 Перейти")
+        open_btn.clicked.connect(open_result)
+        close_btn = QPushButton("✖ Закрыть")
+        close_btn.clicked.connect(dialog.close)
+        button_layout.addWidget(open_btn)
+        button_layout.addStretch()
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+        dialog.setStyleSheet("""
+            QDialog {
+                background-color: #1a1a2a;
+                border: 2px solid #3498db;
+                border-radius: 15px;
+            }
+            QPushButton {
+                background-color: #3a3a4a;
+                border: 2px solid #4a4a5a;
+                border-radius: 8px;
+                padding: 10px 20px;
+                color: #e0e0e0;
+                font-weight: bold;
+                font-size: 12px;
+                min-height: 35px;
+            }
+            QPushButton:hover {
+                background-color: #4a4a5a;
+                border-color: #3498db;
+            }
+        """)
+
+        dialog.exec_()
+
+    def clear_incognito_history(self, history_model):
+        """Очищает историю инкогнито"""
+        self.incognito_history.clear()
+        if history_model:
+            history_model.refresh()
+        self.show_notification("История инкогнито очищена")
+
+    def show_context_menu(self):
+        """Показывает контекстное меню"""
+        menu = QMenu(self)
+        menu.setStyleSheet("""
+            QMenu {
+                background-color: #1a1a2a;
+                border: 2px solid #3498db;
                 color: #e0e0e0;
                 font-size: 13px;
             }
@@ -1934,44 +6724,69 @@ class ModernBrowser(QMainWindow):
         # В реальной реализации здесь был бы код для инспектора элементов
 
     def check_page_speed(self):
-        """Проверяет скорость загрузки страницы"""
+        """Проверяет скорость загрузки страницы по замерам браузера"""
         browser = self.get_current_browser()
         if browser:
             url = browser.url().toString()
             self.show_notification(f"Анализ скорости для: {url[:50]}...")
+            self.page_timing.measure(self.get_current_tab())
 
-            # Имитация анализа скорости
-            start_time = time.time()
+    def show_speed_results(self, tab, result):
+        """Показывает результаты анализа скорости и водопад загрузки"""
+        if result is None:
+            self.show_notification("❌ Не удалось получить замеры загрузки страницы")
+            return
+        url = result["url"]
 
-            # В реальной реализации здесь был бы анализ скорости загрузки ресурсов
-            QTimer.singleShot(1000, lambda: self.show_speed_results(start_time, url))
+        def ms(value):
+            return f"{value:.0f} мс" if value else "—"
 
-    def show_speed_results(self, start_time, url):
-        """Показывает результаты анализа скорости"""
-        load_time = time.time() - start_time
-        score = max(0, min(100, 100 - (load_time * 10)))  # Простая оценка
+        if result["prerendered"]:
+            qt_load = "страница была загружена заранее (предзагрузка)"
+        elif result["loading"]:
+            qt_load = "страница еще загружается"
+        elif result["qt_load_ms"] is not None:
+            qt_load = ms(result["qt_load_ms"])
+        else:
+            qt_load = "—"
+        phases = "".join(f"<tr><td>{name}</td><td align='right'>{ms(value)}</td></tr>"
+                         for name, value in result["phases"] if value)
+        largest = "".join(
+            f"<tr><td>{html.escape(name[-70:])}</td><td>{kind}</td><td align='right'>{size / 1024:.1f} КБ</td>"
+            f"<td align='right'>{end - start:.0f} мс</td></tr>" for name, kind, start, end, size in result["largest"])
+        types = ", ".join(f"{kind} {count} ({size / 1024:.0f} КБ)" for kind, (count, size) in result["by_type"][:6])
+        advice = "".join(f"<li>{html.escape(text)}</li>" for text in result["recommendations"])
+        score = f"{result['score']}/100" if result["score"] is not None else "—"
 
         results_text = f"""
-        <div style="background-color: #2a2a3a; padding: 20px; border-radius: 12px; color: #e0e0e0;">
+        <div style="color: #e0e0e0;">
             <h3 style="color: #3498db;">📊 Результаты анализа скорости</h3>
-            <p><b>URL:</b> {url[:80]}{'...' if len(url) > 80 else ''}</p>
-            <p><b>Время загрузки:</b> {load_time:.2f} секунд</p>
-            <p><b>Оценка скорости:</b> {score:.0f}/100</p>
+            <p><b>URL:</b> {html.escape(url[:80])}{'...' if len(url) > 80 else ''}</p>
+            <p><b>Оценка скорости:</b> {score} &nbsp; <b>Загрузка по сигналам вкладки:</b> {qt_load}</p>
+            <table cellspacing="6">
+                <tr><td><b>Первый байт (TTFB)</b></td><td align='right'>{ms(result['ttfb'])}</td>
+                    <td><b>Первая отрисовка (FCP)</b></td><td align='right'>{ms(result['fcp'])}</td></tr>
+                <tr><td><b>DOMContentLoaded</b></td><td align='right'>{ms(result['dcl'])}</td>
+                    <td><b>Крупнейший элемент (LCP)</b></td><td align='right'>{ms(result['lcp'])}</td></tr>
+                <tr><td><b>Событие load</b></td><td align='right'>{ms(result['load'])}</td>
+                    <td><b>Блокировка (TBT)</b></td><td align='right'>{result['tbt']:.0f} мс
+                    ({result['long_tasks']} задач)</td></tr>
+            </table>
+            <p><b>Запросов:</b> {result['requests']}, {result['bytes'] / 1024:.0f} КБ, из кэша {result['cached']}
+               &nbsp; <b>По типам:</b> {types or '—'}</p>
+            <table cellspacing="4">{phases}</table>
+            <p><b>Самые тяжелые ресурсы:</b></p>
+            <table cellspacing="4">{largest}</table>
             <p><b>Рекомендации:</b></p>
-            <ul>
-                <li>Оптимизируйте изображения</li>
-                <li>Используйте кэширование</li>
-                <li>Минифицируйте CSS/JS</li>
-            </ul>
+            <ul>{advice}</ul>
         </div>
         """
 
-        msg_box = QMessageBox(self)
-        msg_box.setWindowTitle("Результаты анализа скорости")
-        msg_box.setTextFormat(Qt.RichText)
-        msg_box.setText(results_text)
-        msg_box.setStyleSheet("""
-            QMessageBox {
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Результаты анализа скорости")
+        dialog.resize(900, 720)
+        dialog.setStyleSheet("""
+            QDialog {
                 background-color: #1a1a2a;
                 border: 2px solid #3498db;
                 border-radius: 15px;
@@ -1979,6 +6794,9 @@ class ModernBrowser(QMainWindow):
             QLabel {
                 color: #e0e0e0;
             }
+            QScrollArea {
+                border: 1px solid #3a3a4a;
+            }
             QPushButton {
                 background-color: #3a3a4a;
                 border: 2px solid #4a4a5a;
@@ -1993,7 +6811,29 @@ class ModernBrowser(QMainWindow):
                 border-color: #3498db;
             }
         """)
-        msg_box.exec_()
+        layout = QVBoxLayout(dialog)
+
+        summary = QLabel()
+        summary.setTextFormat(Qt.RichText)
+        summary.setWordWrap(True)
+        summary.setText(results_text)
+        summary_scroll = QScrollArea()
+        summary_scroll.setWidgetResizable(True)
+        summary_scroll.setWidget(summary)
+        layout.addWidget(summary_scroll, 3)
+
+        waterfall_label = QLabel(f"🌊 Водопад загрузки (первые {len(result['waterfall'])} запросов; "
+                                 f"линии - FCP, DOMContentLoaded, load)")
+        layout.addWidget(waterfall_label)
+        waterfall_scroll = QScrollArea()
+        waterfall_scroll.setWidgetResizable(True)
+        waterfall_scroll.setWidget(WaterfallWidget(result))
+        layout.addWidget(waterfall_scroll, 2)
+
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(dialog.accept)
+        layout.addWidget(close_btn, 0, Qt.AlignRight)
+        dialog.exec_()
 
     def check_seo(self):
         """Проверяет SEO страницы"""
@@ -2058,9 +6898,8 @@ class ModernBrowser(QMainWindow):
 
         if reply == QMessageBox.Yes:
             try:
-                # Очистка кеша WebEngine
-                from PyQt5.QtWebEngineWidgets import QWebEngineProfile
-                profile = QWebEngineProfile.defaultProfile()
+                # Очистка кеша WebEngine (профиль текущего пользователя)
+                profile = self.web_profile(self.is_incognito)
                 profile.clearHttpCache()
 
                 # Очистка cookies
@@ -2077,7 +6916,10 @@ class ModernBrowser(QMainWindow):
 
         if self.settings["site_blocking_enabled"]:
             self.show_notification("🛡️ Блокировка подозрительных сайтов включена")
+            self.load_site_blocklist()
         else:
+            self.site_blocklist_generation += 1
+            self.site_blocklist = None
             self.show_notification("Блокировка подозрительных сайтов выключена")
 
     def scan_for_viruses(self):
@@ -2146,6 +6988,13 @@ class ModernBrowser(QMainWindow):
 
     def show_settings_dialog(self):
         """Показывает диалог настроек с полным функционалом"""
+        dialog = self.dialog_pool.get("settings", self.create_settings_dialog,
+                                      self.settings_revision(self.settings), self.refresh_settings_dialog)
+        dialog.exec_()
+        self.dialog_pool.mark_clean("settings", self.settings_revision(self.settings))
+
+    def create_settings_dialog(self):
+        """Создает диалог настроек (один раз за сеанс)"""
         dialog = QDialog(self)
         dialog.setWindowTitle("⚙️ Настройки Der Browser")
         dialog.setGeometry(400, 200, 800, 600)
@@ -2364,18 +7213,94 @@ class ModernBrowser(QMainWindow):
         hardware_accel_checkbox.stateChanged.connect(lambda state: self.update_setting("hardware_acceleration", bool(state)))
         performance_layout.addWidget(hardware_accel_checkbox)
 
+        preset_widget = QWidget()
+        preset_layout = QHBoxLayout(preset_widget)
+        preset_layout.addWidget(QLabel("Пресет:"))
+        preset_combo = QComboBox()
+        for preset_name, preset in PERFORMANCE_PRESETS.items():
+            preset_combo.addItem(preset["title"], preset_name)
+        # Пресет общий для машины: берется из performance.json, а не из настроек пользователя
+        saved_preset = load_performance_config()["preset"]
+        preset_combo.setCurrentIndex(max(0, preset_combo.findData(saved_preset)))
+        active_preset = active_performance.get("preset", saved_preset)
+        if active_preset != saved_preset:
+            preset_combo.setToolTip(f"До перезапуска действует: {PERFORMANCE_PRESETS[active_preset]['title']}")
+        preset_combo.currentIndexChanged.connect(
+            lambda index: self.set_performance_preset(preset_combo.itemData(index)))
+        preset_layout.addWidget(preset_combo)
+        preset_layout.addStretch()
+        performance_layout.addWidget(preset_widget)
+
         cache_widget = QWidget()
         cache_layout = QHBoxLayout(cache_widget)
-        cache_layout.addWidget(QLabel("Размер кэша (МБ):"))
+        cache_layout.addWidget(QLabel("Кэш:"))
+
+        cache_type_combo = QComboBox()
+        cache_type_combo.addItem("На диске", "disk")
+        cache_type_combo.addItem("В памяти", "memory")
+        cache_type_combo.addItem("Отключен", "none")
+        cache_type_combo.setCurrentIndex(max(0, cache_type_combo.findData(self.settings.get("cache_type", "disk"))))
+        cache_type_combo.currentIndexChanged.connect(
+            lambda index: self.update_setting("cache_type", cache_type_combo.itemData(index)))
+        cache_layout.addWidget(cache_type_combo)
 
+        cache_layout.addWidget(QLabel("Размер кэша (МБ):"))
         cache_spinbox = QSpinBox()
         cache_spinbox.setRange(10, 1000)
-        cache_spinbox.setValue(100)
+        cache_spinbox.setValue(self.settings.get("cache_size_mb", 100))
         cache_spinbox.setSuffix(" MB")
+        cache_spinbox.valueChanged.connect(lambda value: self.update_setting("cache_size_mb", value))
         cache_layout.addWidget(cache_spinbox)
         cache_layout.addStretch()
         performance_layout.addWidget(cache_widget)
 
+        # Заморозка и выгрузка фоновых вкладок
+        lifecycle_checkbox = QCheckBox("Замораживать фоновые вкладки")
+        lifecycle_checkbox.setChecked(self.settings.get("tab_lifecycle_enabled", True))
+        lifecycle_checkbox.stateChanged.connect(lambda state: self.update_setting("tab_lifecycle_enabled", bool(state)))
+        performance_layout.addWidget(lifecycle_checkbox)
+
+        dns_prefetch_checkbox = QCheckBox("Заранее разрешать имена сайтов (DNS)")
+        dns_prefetch_checkbox.setChecked(self.settings.get("dns_prefetch", True))
+        dns_prefetch_checkbox.stateChanged.connect(lambda state: self.update_setting("dns_prefetch", bool(state)))
+        performance_layout.addWidget(dns_prefetch_checkbox)
+
+        omnibox_checkbox = QCheckBox("Подсказывать адреса из истории, закладок и вкладок")
+        omnibox_checkbox.setChecked(self.settings.get("omnibox_suggestions", True))
+        omnibox_checkbox.stateChanged.connect(lambda state: self.update_setting("omnibox_suggestions", bool(state)))
+        performance_layout.addWidget(omnibox_checkbox)
+
+        prerender_checkbox = QCheckBox("Предзагружать вероятный следующий сайт (кроме инкогнито)")
+        prerender_checkbox.setChecked(self.settings.get("speculative_prerender", False))
+        prerender_checkbox.stateChanged.connect(lambda state: self.update_setting("speculative_prerender", bool(state)))
+        performance_layout.addWidget(prerender_checkbox)
+
+        restore_tabs_checkbox = QCheckBox("Восстанавливать вкладки при запуске")
+        restore_tabs_checkbox.setChecked(self.settings.get("restore_tabs", True))
+        restore_tabs_checkbox.stateChanged.connect(lambda state: self.update_setting("restore_tabs", bool(state)))
+        performance_layout.addWidget(restore_tabs_checkbox)
+
+        lifecycle_spinboxes = []
+        for text, key, minimum, maximum, step, suffix in [
+            ("Заморозить после скрытия через:", "tab_freeze_after_min", 1, 240, 1, " мин"),
+            ("Выгружать, если свободной памяти меньше:", "tab_discard_free_mb", 0, 65536, 256, " MB"),
+            ("Или если фоновых активных вкладок больше:", "tab_max_live", 1, 200, 1, ""),
+            ("Сохранять открытые вкладки каждые:", "tabs_save_sec", 5, 3600, 5, " с"),
+        ]:
+            row_widget = QWidget()
+            row_layout = QHBoxLayout(row_widget)
+            row_layout.addWidget(QLabel(text))
+            spinbox = QSpinBox()
+            spinbox.setRange(minimum, maximum)
+            spinbox.setSingleStep(step)
+            spinbox.setSuffix(suffix)
+            spinbox.setValue(self.settings.get(key, minimum))
+            spinbox.valueChanged.connect(lambda value, k=key: self.update_setting(k, value))
+            row_layout.addWidget(spinbox)
+            row_layout.addStretch()
+            performance_layout.addWidget(row_widget)
+            lifecycle_spinboxes.append((spinbox, key))
+
         scroll_layout.addWidget(performance_group)
 
         # Добавляем отступ вниз
@@ -2415,502 +7340,199 @@ class ModernBrowser(QMainWindow):
                 color: #e0e0e0;
                 font-size: 12px;
             }
-            QCheckBox {
-                color: #e0e0e0;
-                font-size: 13px;
-            }
-            QComboBox {
-                background-color: #2a2a3a;
-                border: 1px solid #3a3a4a;
-                border-radius: 5px;
-                padding: 5px;
-                color: #e0e0e0;
-                min-height: 25px;
-            }
-            QComboBox::drop-down {
-                border: none;
-            }
-            QComboBox::down-arrow {
-                image: none;
-                border-left: 5px solid transparent;
-                border-right: 5px solid transparent;
-                border-top: 5px solid #e0e0e0;
-            }
-            QComboBox QAbstractItemView {
-                background-color: #2a2a3a;
-                color: #e0e0e0;
-                selection-background-color: #3498db;
-            }
-            QSpinBox {
-                background-color: #2a2a3a;
-                border: 1px solid #3a3a4a;
-                border-radius: 5px;
-                padding: 5px;
-                color: #e0e0e0;
-                min-height: 25px;
-            }
-            QPushButton {
-                background-color: #3a3a4a;
-                border: 2px solid #4a4a5a;
-                border-radius: 8px;
-                padding: 10px 20px;
-                color: #e0e0e0;
-                font-weight: bold;
-                font-size: 12px;
-                min-height: 35px;
-            }
-            QPushButton:hover {
-                background-color: #4a4a5a;
-                border-color: #3498db;
-            }
-        """)
-
-        dialog.exec_()
-
-    def change_theme(self, theme):
-        """Изменяет тему"""
-        self.settings["theme"] = theme
-        self.apply_theme(theme)
-        self.show_notification(f"Тема изменена на {'темную' if theme == 'dark' else 'светлую'}")
-
-    def update_vpn_setting(self, state):
-        """Обновляет настройку VPN"""
-        self.settings["vpn_enabled"] = bool(state)
-        if state:
-            self.enable_vpn()
-        else:
-            self.disable_vpn()
-
-    def update_dns_setting(self, key, value):
-        """Обновляет DNS настройки"""
-        self.settings[key] = value
-        if self.settings["vpn_enabled"]:
-            self.apply_dns_settings()
-
-    def update_setting(self, key, value):
-        """Обновляет любую настройку"""
-        self.settings[key] = value
-
-    def apply_settings_and_close(self, dialog):
-        """Применяет настройки и закрывает диалог"""
-        self.save_user_data()
-        dialog.close()
-        self.show_notification("Настройки применены")
-
-    def save_settings_and_close(self, dialog):
-        """Сохраняет настройки и закрывает диалог"""
-        self.save_user_data()
-        dialog.close()
-        self.show_notification("Настройки сохранены")
-
-    def toggle_vpn(self):
-        """Включает/выключает VPN"""
-        if self.settings["vpn_enabled"]:
-            self.disable_vpn()
-        else:
-            self.enable_vpn()
-
-    def enable_vpn(self):
-        """Включает VPN (меняет DNS)"""
-        try:
-            self.settings["vpn_enabled"] = True
-            self.show_notification(f"VPN включен. DNS: {self.settings['dns_primary']}, {self.settings['dns_secondary']}")
-        except Exception as e:
-            self.show_notification(f"Ошибка включения VPN: {str(e)[:50]}...")
-            self.settings["vpn_enabled"] = False
-
-    def disable_vpn(self):
-        """Выключает VPN (возвращает оригинальные DNS)"""
-        try:
-            self.settings["vpn_enabled"] = False
-            self.show_notification("VPN выключен")
-        except Exception as e:
-            self.show_notification(f"Ошибка выключения VPN: {str(e)[:50]}...")
-            self.settings["vpn_enabled"] = False
-
-    def apply_dns_settings(self):
-        """Применяет DNS настройки"""
-        if self.settings["vpn_enabled"]:
-            self.show_notification(f"Применены DNS: {self.settings['dns_primary']}, {self.settings['dns_secondary']}")
-
-    def apply_theme(self, theme):
-        """Применяет тему"""
-        if theme == "dark":
-            dark_stylesheet = """
-            /* Основные стили */
-            QMainWindow {
-                background-color: #0a0a14;
-            }
-
-            /* Панель навигации */
-            QWidget#navBar {
-                background-color: #1a1a2a;
-                border-bottom: 2px solid #3498db;
-            }
-
-            QLabel#navLogoIcon {
-                font-size: 24px;
-                color: #3498db;
-                font-weight: bold;
-            }
-
-            QLabel#navLogoText {
-                color: #e0e0e0;
-                font-size: 18px;
-                font-weight: bold;
-            }
-
-            QPushButton#navButton {
-                background-color: #3a3a4a;
-                border: 2px solid #4a4a5a;
-                border-radius: 20px;
-                color: #e0e0e0;
-                font-size: 16px;
-                font-weight: bold;
-            }
-
-            QPushButton#navButton:hover {
-                background-color: #4a4a5a;
-                border-color: #3498db;
-            }
-
-            QPushButton#navButton:pressed {
-                background-color: #2a2a3a;
-            }
-
-            QPushButton#navButton:disabled {
-                background-color: #2a2a3a;
-                color: #666;
-            }
-
-            /* Поле URL */
-            QLineEdit#urlBar {
-                background-color: #2a2a3a;
-                border: 2px solid #3a3a4a;
-                border-radius: 20px;
-                padding: 10px 15px;
-                font-size: 14px;
-                color: #e0e0e0;
-                font-weight: 500;
-                selection-background-color: #3498db;
-                min-height: 40px;
-            }
-
-            QLineEdit#urlBar:focus {
-                border-color: #3498db;
-                background-color: #3a3a4a;
-            }
-
-            QLineEdit#urlBar:hover {
-                border-color: #4a4a5a;
-            }
-
-            /* Кнопка перехода */
-            QPushButton#goButton {
-                background-color: #3498db;
-                border: none;
-                border-radius: 20px;
-                color: white;
-                font-size: 18px;
-                font-weight: bold;
-            }
-
-            QPushButton#goButton:hover {
-                background-color: #2980b9;
-                border: 2px solid #2ecc71;
-            }
-
-            QPushButton#goButton:pressed {
-                background-color: #1c6ea4;
-            }
-
-            /* Кнопки действий */
-            QPushButton#actionButton {
-                background-color: #2a2a3a;
-                border: 2px solid #3a3a4a;
-                border-radius: 20px;
-                color: #e0e0e0;
-                font-size: 16px;
-                font-weight: bold;
-            }
-
-            QPushButton#actionButton:hover {
-                background-color: #3a3a4a;
-                border-color: #3498db;
-            }
-
-            QPushButton#actionButton:pressed {
-                background-color: #1a1a2a;
-            }
-
-            /* Вкладки */
-            QTabWidget::pane {
-                border: 1px solid #2a2a3a;
-                background-color: #0a0a14;
-            }
-
-            QTabBar::tab {
-                background-color: #2a2a3a;
-                color: #b0b0b0;
-                padding: 10px 20px;
-                margin-right: 2px;
-                border-top-left-radius: 8px;
-                border-top-right-radius: 8px;
-                font-weight: 600;
-                font-size: 12px;
-                min-width: 120px;
-            }
-
-            QTabBar::tab:selected {
-                background-color: #1a1a2a;
-                color: #e0e0e0;
-                border-bottom: 3px solid #3498db;
-            }
-
-            QTabBar::tab:hover:!selected {
-                background-color: #3a3a4a;
-                color: #e0e0e0;
-            }
-
-            /* Статус бар */
-            QWidget#statusBar {
-                background-color: #1a1a2a;
-                border-top: 1px solid #2a2a3a;
-            }
-
-            QLabel#statusLabel {
-                color: #b0b0b0;
-                font-size: 12px;
-                font-weight: 500;
-            }
-
-            QProgressBar#progressBar {
-                border: 1px solid #2a2a3a;
-                border-radius: 3px;
-                background-color: #2a2a3a;
-            }
-
-            QProgressBar#progressBar::chunk {
-                background-color: #3498db;
-                border-radius: 3px;
-            }
-
-            /* Меню */
-            QMenuBar#menuBar {
-                background-color: #1a1a2a;
-                color: #e0e0e0;
-                padding: 5px;
-            }
-
-            QMenuBar::item {
-                background-color: transparent;
-                padding: 8px 15px;
-            }
-
-            QMenuBar::item:selected {
-                background-color: #3498db;
-            }
-
-            QMenu {
-                background-color: #1a1a2a;
-                color: #e0e0e0;
-                border: 1px solid #2a2a3a;
-            }
-
-            QMenu::item:selected {
-                background-color: #3498db;
-            }
-            """
-            self.setStyleSheet(dark_stylesheet)
-        else:
-            light_stylesheet = """
-            /* Основные стили */
-            QMainWindow {
-                background-color: #f5f5f5;
-            }
-
-            /* Панель навигации */
-            QWidget#navBar {
-                background-color: #ffffff;
-                border-bottom: 2px solid #3498db;
-            }
-
-            QLabel#navLogoIcon {
-                font-size: 24px;
-                color: #3498db;
-                font-weight: bold;
-            }
-
-            QLabel#navLogoText {
-                color: #333333;
-                font-size: 18px;
-                font-weight: bold;
-            }
-
-            QPushButton#navButton {
-                background-color: #f0f0f0;
-                border: 2px solid #e0e0e0;
-                border-radius: 20px;
-                color: #333333;
-                font-size: 16px;
-                font-weight: bold;
-            }
-
-            QPushButton#navButton:hover {
-                background-color: #e0e0e0;
-                border-color: #3498db;
-            }
-
-            QPushButton#navButton:pressed {
-                background-color: #d0d0d0;
-            }
-
-            QPushButton#navButton:disabled {
-                background-color: #f5f5f5;
-                color: #aaaaaa;
-            }
-
-            /* Поле URL */
-            QLineEdit#urlBar {
-                background-color: #ffffff;
-                border: 2px solid #e0e0e0;
-                border-radius: 20px;
-                padding: 10px 15px;
-                font-size: 14px;
-                color: #333333;
-                font-weight: 500;
-                selection-background-color: #3498db;
-                min-height: 40px;
-            }
-
-            QLineEdit#urlBar:focus {
-                border-color: #3498db;
-                background-color: #ffffff;
+            QCheckBox {
+                color: #e0e0e0;
+                font-size: 13px;
             }
-
-            QLineEdit#urlBar:hover {
-                border-color: #cccccc;
+            QComboBox {
+                background-color: #2a2a3a;
+                border: 1px solid #3a3a4a;
+                border-radius: 5px;
+                padding: 5px;
+                color: #e0e0e0;
+                min-height: 25px;
             }
-
-            /* Кнопка перехода */
-            QPushButton#goButton {
-                background-color: #3498db;
+            QComboBox::drop-down {
                 border: none;
-                border-radius: 20px;
-                color: white;
-                font-size: 18px;
-                font-weight: bold;
             }
-
-            QPushButton#goButton:hover {
-                background-color: #2980b9;
-                border: 2px solid #2ecc71;
+            QComboBox::down-arrow {
+                image: none;
+                border-left: 5px solid transparent;
+                border-right: 5px solid transparent;
+                border-top: 5px solid #e0e0e0;
             }
-
-            QPushButton#goButton:pressed {
-                background-color: #1c6ea4;
+            QComboBox QAbstractItemView {
+                background-color: #2a2a3a;
+                color: #e0e0e0;
+                selection-background-color: #3498db;
             }
-
-            /* Кнопки действий */
-            QPushButton#actionButton {
-                background-color: #f0f0f0;
-                border: 2px solid #e0e0e0;
-                border-radius: 20px;
-                color: #333333;
-                font-size: 16px;
+            QSpinBox {
+                background-color: #2a2a3a;
+                border: 1px solid #3a3a4a;
+                border-radius: 5px;
+                padding: 5px;
+                color: #e0e0e0;
+                min-height: 25px;
+            }
+            QPushButton {
+                background-color: #3a3a4a;
+                border: 2px solid #4a4a5a;
+                border-radius: 8px;
+                padding: 10px 20px;
+                color: #e0e0e0;
                 font-weight: bold;
+                font-size: 12px;
+                min-height: 35px;
             }
-
-            QPushButton#actionButton:hover {
-                background-color: #e0e0e0;
+            QPushButton:hover {
+                background-color: #4a4a5a;
                 border-color: #3498db;
             }
+        """)
 
-            QPushButton#actionButton:pressed {
-                background-color: #d0d0d0;
-            }
-
-            /* Вкладки */
-            QTabWidget::pane {
-                border: 1px solid #e0e0e0;
-                background-color: #ffffff;
-            }
+        # Элементы, отражающие настройки: (виджет, ключ, значение по умолчанию)
+        dialog.bindings = [
+            (theme_combo, "theme", None),
+            (vpn_checkbox, "vpn_enabled", False),
+            (dns_primary_edit, "dns_primary", ""),
+            (dns_secondary_edit, "dns_secondary", ""),
+            (ad_block_checkbox, "block_ads", False),
+            (save_passwords_checkbox, "save_passwords", False),
+            (javascript_checkbox, "javascript_enabled", False),
+            (notifications_checkbox, "notifications", False),
+            (search_combobox, "default_search_engine", None),
+            (home_page_edit, "home_page", ""),
+            (hardware_accel_checkbox, "hardware_acceleration", False),
+            (cache_type_combo, "cache_type", "disk"),
+            (cache_spinbox, "cache_size_mb", 100),
+            (lifecycle_checkbox, "tab_lifecycle_enabled", True),
+            (restore_tabs_checkbox, "restore_tabs", True),
+            (dns_prefetch_checkbox, "dns_prefetch", True),
+            (prerender_checkbox, "speculative_prerender", False),
+            (omnibox_checkbox, "omnibox_suggestions", True),
+        ] + [(spinbox, key, spinbox.minimum()) for spinbox, key in lifecycle_spinboxes]
+        return dialog
+
+    def refresh_settings_dialog(self, dialog):
+        """Переносит текущие настройки в созданный диалог"""
+        self.sync_dialog_bindings(dialog.bindings, self.settings)
+
+    def settings_revision(self, settings):
+        """Снимок настроек, по которому видно, нужно ли обновлять диалог"""
+        return json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str)
+
+    def sync_dialog_bindings(self, bindings, values):
+        """Заполняет элементы диалога значениями, не вызывая их обработчики"""
+        for widget, key, default in bindings:
+            value = values.get(key, default)
+            widget.blockSignals(True)
+            if isinstance(widget, QCheckBox):
+                widget.setChecked(bool(value))
+            elif isinstance(widget, QComboBox):
+                index = widget.findData(value)
+                if index >= 0:
+                    widget.setCurrentIndex(index)
+            elif isinstance(widget, QSpinBox):
+                widget.setValue(int(value))
+            elif isinstance(widget, QListWidget):
+                widget.clear()
+                widget.addItems(list(value))
+            elif widget.text() != value:
+                widget.setText(value)
+            widget.blockSignals(False)
 
-            QTabBar::tab {
-                background-color: #f0f0f0;
-                color: #666666;
-                padding: 10px 20px;
-                margin-right: 2px;
-                border-top-left-radius: 8px;
-                border-top-right-radius: 8px;
-                font-weight: 600;
-                font-size: 12px;
-                min-width: 120px;
-            }
+    def change_theme(self, theme):
+        """Изменяет тему"""
+        self.settings["theme"] = theme
+        self.apply_theme(theme)
+        self.show_notification(f"Тема изменена на {'темную' if theme == 'dark' else 'светлую'}")
 
-            QTabBar::tab:selected {
-                background-color: #ffffff;
-                color: #333333;
-                border-bottom: 3px solid #3498db;
-            }
+    def update_vpn_setting(self, state):
+        """Обновляет настройку VPN"""
+        self.settings["vpn_enabled"] = bool(state)
+        if state:
+            self.enable_vpn()
+        else:
+            self.disable_vpn()
 
-            QTabBar::tab:hover:!selected {
-                background-color: #e8e8e8;
-                color: #333333;
-            }
+    def update_dns_setting(self, key, value):
+        """Обновляет DNS настройки"""
+        self.settings[key] = value
+        if self.settings["vpn_enabled"]:
+            self.apply_dns_settings()
 
-            /* Статус бар */
-            QWidget#statusBar {
-                background-color: #ffffff;
-                border-top: 1px solid #e0e0e0;
-            }
+    def update_setting(self, key, value):
+        """Обновляет любую настройку"""
+        self.settings[key] = value
+        if key in ("cache_type", "cache_size_mb"):
+            self.apply_cache_settings()
+        elif key == "speculative_prerender" and not value:
+            self.speculation.discard()
+        elif key == "tabs_save_sec":
+            self.tabs_save_timer.start(max(5, value) * 1000)
+        elif key == "block_ads":
+            if value:
+                self.load_ad_filters()
+            else:
+                self.ad_filter_generation += 1
+                self.ad_filter = None
+        elif key == "hardware_acceleration":
+            save_performance_config(load_performance_config()["preset"], value)
+            self.show_notification("Настройки производительности вступят в силу после перезапуска")
 
-            QLabel#statusLabel {
-                color: #666666;
-                font-size: 12px;
-                font-weight: 500;
-            }
+    def set_performance_preset(self, preset):
+        """Сохраняет пресет машины для следующего запуска (в настройки пользователя не попадает)"""
+        save_performance_config(preset, load_performance_config()["hardware_acceleration"])
+        self.show_notification("Настройки производительности вступят в силу после перезапуска")
 
-            QProgressBar#progressBar {
-                border: 1px solid #e0e0e0;
-                border-radius: 3px;
-                background-color: #f0f0f0;
-            }
+    def apply_settings_and_close(self, dialog):
+        """Применяет настройки и закрывает диалог"""
+        self.save_user_data()
+        dialog.close()
+        self.show_notification("Настройки применены")
 
-            QProgressBar#progressBar::chunk {
-                background-color: #3498db;
-                border-radius: 3px;
-            }
+    def save_settings_and_close(self, dialog):
+        """Сохраняет настройки и закрывает диалог"""
+        self.save_user_data()
+        dialog.close()
+        self.show_notification("Настройки сохранены")
 
-            /* Меню */
-            QMenuBar#menuBar {
-                background-color: #ffffff;
-                color: #333333;
-                padding: 5px;
-            }
+    def toggle_vpn(self):
+        """Включает/выключает VPN"""
+        if self.settings["vpn_enabled"]:
+            self.disable_vpn()
+        else:
+            self.enable_vpn()
 
-            QMenuBar::item {
-                background-color: transparent;
-                padding: 8px 15px;
-            }
+    def enable_vpn(self):
+        """Включает VPN (меняет DNS)"""
+        try:
+            self.settings["vpn_enabled"] = True
+            self.show_notification(f"VPN включен. DNS: {self.settings['dns_primary']}, {self.settings['dns_secondary']}")
+        except Exception as e:
+            self.show_notification(f"Ошибка включения VPN: {str(e)[:50]}...")
+            self.settings["vpn_enabled"] = False
 
-            QMenuBar::item:selected {
-                background-color: #3498db;
-                color: white;
-            }
+    def disable_vpn(self):
+        """Выключает VPN (возвращает оригинальные DNS)"""
+        try:
+            self.settings["vpn_enabled"] = False
+            self.show_notification("VPN выключен")
+        except Exception as e:
+            self.show_notification(f"Ошибка выключения VPN: {str(e)[:50]}...")
+            self.settings["vpn_enabled"] = False
 
-            QMenu {
-                background-color: #ffffff;
-                color: #333333;
-                border: 1px solid #e0e0e0;
-            }
+    def apply_dns_settings(self):
+        """Применяет DNS настройки"""
+        if self.settings["vpn_enabled"]:
+            self.show_notification(f"Применены DNS: {self.settings['dns_primary']}, {self.settings['dns_secondary']}")
 
-            QMenu::item:selected {
-                background-color: #3498db;
-                color: white;
-            }
-            """
-            self.setStyleSheet(light_stylesheet)
+    def apply_theme(self, theme):
+        """Применяет тему"""
+        # Любое значение кроме известных тем (например "system") означает светлую тему
+        if theme not in ThemeEngine.THEMES:
+            theme = "light"
+        self.theme_engine.apply(self, theme)
 
     def toggle_theme(self):
         """Переключает тему"""
@@ -2978,13 +7600,22 @@ class ModernBrowser(QMainWindow):
 
     def show_about(self):
         """Показывает информацию о программе"""
-        about_text = """
+        preset = PERFORMANCE_PRESETS[active_performance.get("preset", "balanced")]
+        gpu_text = "вкл" if active_performance.get("hardware_acceleration", True) else "выкл"
+        flags_text = " ".join(active_performance.get("flags", []) + [active_performance.get("env_flags", "")]).strip()
+        stats = self.persistence.stats()
+        about_text = f"""
         <div style="background-color: #2a2a3a; padding: 20px; border-radius: 12px; color: #e0e0e0;">
             <h2 style="color: #3498db;">🌐 Der Browser v3.0</h2>
             <p><b>Современный веб-браузер с премиальным дизайном</b></p>
 
             <p><b>Версия:</b> 3.0.0<br>
             <b>PyQtWebEngine:</b> 5.15.2<br>
+            <b>Производительность:</b> {preset['title']}, GPU {gpu_text}<br>
+            <b>Флаги Chromium:</b> {flags_text or "по умолчанию"}<br>
+            <b>Сохранение профиля:</b> записей {stats['flushes']}, операций {stats['operations']},
+            {stats['bytes_written']} байт, задержка {stats['avg_flush_ms']:.1f} / {stats['max_flush_ms']:.1f} мс<br>
+            <b>Восстановлено из журнала истории:</b> {self.journal_replayed}<br>
             <b>Лицензия:</b> MIT Open Source</p>
 
             <p>✨ <b>Особенности:</b><br>
@@ -3112,7 +7743,7 @@ class ModernBrowser(QMainWindow):
                                    QMessageBox.Yes | QMessageBox.No)
 
         if reply == QMessageBox.Yes:
-            self.save_user_data()
+            self.flush_user_data()
             self.clear_session()
             self.close()
 
@@ -3122,6 +7753,13 @@ class ModernBrowser(QMainWindow):
             self.show_notification("Доступ запрещен: требуются права администратора")
             return
 
+        dialog = self.dialog_pool.get("admin", self.create_admin_panel,
+                                      self.settings_revision(self.admin_settings), self.refresh_admin_panel)
+        dialog.exec_()
+        self.dialog_pool.mark_clean("admin", self.settings_revision(self.admin_settings))
+
+    def create_admin_panel(self):
+        """Создает админ панель (один раз за сеанс)"""
         dialog = QDialog(self)
         dialog.setWindowTitle("👑 Админ панель - Der Browser")
         dialog.setGeometry(300, 150, 900, 700)
@@ -3254,6 +7892,11 @@ class ModernBrowser(QMainWindow):
 
         buttons_layout = QVBoxLayout(buttons_group)
 
+        buttons_hint = QLabel("Закрепленные плитки идут первыми, остальные места занимают самые посещаемые сайты.\n"
+                              "Формат: эмоджи Текст | адрес")
+        buttons_hint.setStyleSheet("color: #a0a0a0; font-size: 12px;")
+        buttons_layout.addWidget(buttons_hint)
+
         buttons_list = QListWidget()
         buttons_list.setStyleSheet("""
             QListWidget {
@@ -3418,7 +8061,18 @@ class ModernBrowser(QMainWindow):
             }
         """)
 
-        dialog.exec_()
+        dialog.bindings = [
+            (theme_combo, "theme", "default"),
+            (logo_edit, "logo_text", "Der Browser"),
+            (title_edit, "main_title", "🌐 Der Browser - Made by AI"),
+            (subtitle_edit, "subtitle", "Modern Web Experience"),
+            (buttons_list, "quick_buttons", []),
+        ]
+        return dialog
+
+    def refresh_admin_panel(self, dialog):
+        """Переносит текущие настройки админа в созданную панель"""
+        self.sync_dialog_bindings(dialog.bindings, self.admin_settings)
 
     def update_admin_setting(self, key, value):
         """Обновляет настройку админа"""
@@ -3427,7 +8081,8 @@ class ModernBrowser(QMainWindow):
     def add_quick_button(self, list_widget):
         """Добавляет новую быструю кнопку"""
         text, ok = QInputDialog.getText(self, "Добавить кнопку",
-                                       "Введите текст кнопки (формат: эмоджи Текст):\nПример: 🐱 GitHub")
+                                       "Введите плитку (формат: эмоджи Текст | адрес):\n"
+                                       "Пример: 🐱 GitHub | https://github.com")
         if ok and text:
             list_widget.addItem(text)
             self.save_quick_buttons(list_widget)
@@ -3477,8 +8132,9 @@ class ModernBrowser(QMainWindow):
             with open(admin_file, 'w', encoding='utf-8') as f:
                 json.dump(self.admin_settings, f, ensure_ascii=False, indent=4)
 
-            # Применяем тему
+            # Применяем тему и закрепленные плитки
             self.apply_admin_theme()
+            self.refresh_homepage_tiles(force=True)
 
             self.show_notification("✅ Настройки админа применены")
 
@@ -3491,296 +8147,9 @@ class ModernBrowser(QMainWindow):
     def apply_admin_theme(self):
         """Применяет выбранную админ тему"""
         theme = self.admin_settings.get("theme", "default")
-
-        if theme == "liquid_glass":
-            self.apply_liquid_glass_theme()
-        elif theme == "dark_matter":
-            self.apply_dark_matter_theme()
-        elif theme == "cyberpunk":
-            self.apply_cyberpunk_theme()
-        elif theme == "nature":
-            self.apply_nature_theme()
-        elif theme == "fire":
-            self.apply_fire_theme()
-        elif theme == "ice":
-            self.apply_ice_theme()
-        elif theme == "neon":
-            self.apply_neon_theme()
-        else:
-            self.apply_theme("dark")  # Стандартная тема
-
-    def apply_liquid_glass_theme(self):
-        """Применяет тему Liquid Glass"""
-        glass_stylesheet = """
-        /* Liquid Glass Theme */
-        QMainWindow {
-            background-color: qlineargradient(x1: 0, y1: 0, x2: 1, y2: 1,
-                                            stop: 0 #0f2027, stop: 0.5 #203a43, stop: 1 #2c5364);
-        }
-
-        QWidget#navBar {
-            background-color: rgba(16, 32, 39, 180);
-            border-bottom: 2px solid #00d4ff;
-            border-radius: 15px;
-            margin: 10px;
-            backdrop-filter: blur(10px);
-        }
-
-        QPushButton {
-            background-color: rgba(0, 212, 255, 100);
-            border: 2px solid rgba(255, 255, 255, 100);
-            border-radius: 20px;
-            color: white;
-            font-weight: bold;
-            backdrop-filter: blur(5px);
-        }
-
-        QPushButton:hover {
-            background-color: rgba(0, 212, 255, 180);
-            border-color: #00ff88;
-        }
-
-        QLineEdit {
-            background-color: rgba(255, 255, 255, 50);
-            border: 2px solid rgba(0, 212, 255, 150);
-            border-radius: 20px;
-            color: white;
-            padding: 10px;
-            backdrop-filter: blur(5px);
-        }
-        """
-        self.setStyleSheet(glass_stylesheet)
-
-    def apply_dark_matter_theme(self):
-        """Применяет тему Dark Matter"""
-        dark_matter_stylesheet = """
-        /* Dark Matter Theme */
-        QMainWindow {
-            background-color: #0a0a0f;
-        }
-
-        QWidget#navBar {
-            background-color: #151520;
-            border-bottom: 2px solid #8a2be2;
-            border-radius: 0px;
-        }
-
-        QPushButton {
-            background-color: #252535;
-            border: 2px solid #8a2be2;
-            border-radius: 15px;
-            color: #e0e0ff;
-            font-weight: bold;
-        }
-
-        QPushButton:hover {
-            background-color: #8a2be2;
-            color: white;
-        }
-
-        QLineEdit {
-            background-color: #1a1a25;
-            border: 2px solid #8a2be2;
-            border-radius: 15px;
-            color: #e0e0ff;
-            padding: 10px;
-        }
-        """
-        self.setStyleSheet(dark_matter_stylesheet)
-
-    def apply_cyberpunk_theme(self):
-        """Применяет тему Cyberpunk"""
-        cyberpunk_stylesheet = """
-        /* Cyberpunk Theme */
-        QMainWindow {
-            background-color: #0a0015;
-        }
-
-        QWidget#navBar {
-            background-color: #1a0025;
-            border-bottom: 2px solid #ff00ff;
-            border-radius: 0px;
-        }
-
-        QPushButton {
-            background-color: #2a0035;
-            border: 2px solid #00ffff;
-            border-radius: 10px;
-            color: #00ffff;
-            font-weight: bold;
-        }
-
-        QPushButton:hover {
-            background-color: #ff00ff;
-            color: #0a0015;
-            border-color: #ff00ff;
-        }
-
-        QLineEdit {
-            background-color: #1a0025;
-            border: 2px solid #00ffff;
-            border-radius: 10px;
-            color: #00ffff;
-            padding: 10px;
-        }
-        """
-        self.setStyleSheet(cyberpunk_stylesheet)
-
-    def apply_nature_theme(self):
-        """Применяет тему Nature"""
-        nature_stylesheet = """
-        /* Nature Theme */
-        QMainWindow {
-            background-color: #1a3c27;
-        }
-
-        QWidget#navBar {
-            background-color: #2a5c37;
-            border-bottom: 2px solid #4caf50;
-            border-radius: 15px;
-            margin: 10px;
-        }
-
-        QPushButton {
-            background-color: #3a7c47;
-            border: 2px solid #4caf50;
-            border-radius: 20px;
-            color: white;
-            font-weight: bold;
-        }
-
-        QPushButton:hover {
-            background-color: #4caf50;
-            border-color: #81c784;
-        }
-
-        QLineEdit {
-            background-color: #2a5c37;
-            border: 2px solid #4caf50;
-            border-radius: 20px;
-            color: white;
-            padding: 10px;
-        }
-        """
-        self.setStyleSheet(nature_stylesheet)
-
-    def apply_fire_theme(self):
-        """Применяет тему Fire"""
-        fire_stylesheet = """
-        /* Fire Theme */
-        QMainWindow {
-            background-color: #2c0a0a;
-        }
-
-        QWidget#navBar {
-            background-color: #4a1a1a;
-            border-bottom: 2px solid #ff5722;
-            border-radius: 10px;
-            margin: 10px;
-        }
-
-        QPushButton {
-            background-color: #6a2a2a;
-            border: 2px solid #ff5722;
-            border-radius: 15px;
-            color: white;
-            font-weight: bold;
-        }
-
-        QPushButton:hover {
-            background-color: #ff5722;
-            border-color: #ff8a65;
-        }
-
-        QLineEdit {
-            background-color: #4a1a1a;
-            border: 2px solid #ff5722;
-            border-radius: 15px;
-            color: white;
-            padding: 10px;
-        }
-        """
-        self.setStyleSheet(fire_stylesheet)
-
-    def apply_ice_theme(self):
-        """Применяет тему Ice"""
-        ice_stylesheet = """
-        /* Ice Theme */
-        QMainWindow {
-            background-color: #0a1a2c;
-        }
-
-        QWidget#navBar {
-            background-color: #1a2a4a;
-            border-bottom: 2px solid #29b6f6;
-            border-radius: 15px;
-            margin: 10px;
-        }
-
-        QPushButton {
-            background-color: #2a3a6a;
-            border: 2px solid #29b6f6;
-            border-radius: 20px;
-            color: white;
-            font-weight: bold;
-        }
-
-        QPushButton:hover {
-            background-color: #29b6f6;
-            border-color: #81d4fa;
-        }
-
-        QLineEdit {
-            background-color: #1a2a4a;
-            border: 2px solid #29b6f6;
-            border-radius: 20px;
-            color: white;
-            padding: 10px;
-        }
-        """
-        self.setStyleSheet(ice_stylesheet)
-
-    def apply_neon_theme(self):
-        """Применяет тему Neon"""
-        neon_stylesheet = """
-        /* Neon Theme */
-        QMainWindow {
-            background-color: #0a0a1a;
-        }
-
-        QWidget#navBar {
-            background-color: #1a1a3a;
-            border-bottom: 2px solid #00ff00;
-            border-radius: 10px;
-            margin: 10px;
-            box-shadow: 0 0 10px #00ff00;
-        }
-
-        QPushButton {
-            background-color: #2a2a5a;
-            border: 2px solid #ff00ff;
-            border-radius: 10px;
-            color: white;
-            font-weight: bold;
-        }
-
-        QPushButton:hover {
-            background-color: #ff00ff;
-            border-color: #00ff00;
-            color: #0a0a1a;
-            box-shadow: 0 0 10px #ff00ff;
-        }
-
-        QLineEdit {
-            background-color: #1a1a3a;
-            border: 2px solid #00ff00;
-            border-radius: 10px;
-            color: #00ff00;
-            padding: 10px;
-            box-shadow: 0 0 5px #00ff00;
-        }
-        """
-        self.setStyleSheet(neon_stylesheet)
+        if theme not in ThemeEngine.THEMES:
+            theme = "dark"  # Стандартная тема
+        self.theme_engine.apply(self, theme)
 
     def export_admin_settings(self):
         """Экспортирует настройки админа в файл"""
@@ -3828,27 +8197,24 @@ class ModernBrowser(QMainWindow):
                 "logo_text": "Der Browser",
                 "main_title": "🌐 Der Browser - Made by AI",
                 "subtitle": "Modern Web Experience",
-                "quick_buttons": [
-                    "🐱 GitHub", "📺 YouTube", "🎵 Spotify", "✈️ Telegram",
-                    "🔍 Google", "📘 Facebook", "🐦 Twitter", "💼 LinkedIn",
-                    "📷 Instagram", "🛒 Amazon", "📚 Wikipedia", "🎮 Twitch",
-                    "💬 Discord", "☁️ Dropbox", "📦 Google Drive"
-                ]
+                "quick_buttons": []
             }
             self.apply_admin_settings()
             self.show_notification("✅ Настройки админа сброшены")
 
     def reload_ui(self):
         """Перезагружает интерфейс с новыми настройками"""
-        # Закрываем все вкладки кроме первой
-        while self.tab_widget.count() > 1:
-            self.tab_widget.removeTab(1)
-
-        # Обновляем главную страницу
-        if self.tab_widget.count() > 0:
+        # Закрываем все вкладки (первая - главная страница, она пересоздается ниже)
+        while self.tab_widget.count() > 0:
+            tab = self.tab_widget.widget(0)
             self.tab_widget.removeTab(0)
+            self.tab_lifecycle.forget(tab)
+            tab.deleteLater()
 
         # Создаем новую главную страницу с обновленными настройками
+        if self.homepage_widget is not None:
+            self.homepage_widget.deleteLater()
+            self.homepage_widget = None
         self.add_new_tab("", "🏠 Главная", True)
         self.show_notification("✅ Интерфейс перезагружен")
 
@@ -3867,12 +8233,7 @@ class ModernBrowser(QMainWindow):
                 "logo_text": "Der Browser",
                 "main_title": "🌐 Der Browser - Made by AI",
                 "subtitle": "Modern Web Experience",
-                "quick_buttons": [
-                    "🐱 GitHub", "📺 YouTube", "🎵 Spotify", "✈️ Telegram",
-                    "🔍 Google", "📘 Facebook", "🐦 Twitter", "💼 LinkedIn",
-                    "📷 Instagram", "🛒 Amazon", "📚 Wikipedia", "🎮 Twitch",
-                    "💬 Discord", "☁️ Dropbox", "📦 Google Drive"
-                ]
+                "quick_buttons": []
             }
 
     def setup_shortcuts(self):
@@ -3938,6 +8299,13 @@ class ModernBrowser(QMainWindow):
     def closeEvent(self, event):
         """Обработчик закрытия окна"""
         self.save_user_data()
+        self.tabs_save_timer.stop()
+        self.save_tabs()
+        self.host_resolver.shutdown()
+        # Гарантированная финальная запись перед выходом
+        self.persistence.stop()
+        if self.history_journal:
+            self.history_journal.close()
         event.accept()
 
     def setup_shortcuts(self):  # <-- ОТДЕЛЬНЫЙ МЕТОД!
@@ -3991,14 +8359,773 @@ class ModernBrowser(QMainWindow):
         shortcut = QShortcut(QKeySequence("Ctrl+0"), self)
         shortcut.activated.connect(self.reset_zoom)
 
+def benchmark_history_store(max_size="1000000"):
+    """Замер стоимости вставки и поиска в HistoryStore от 1 тыс. до 1 млн записей"""
+    max_size = int(max_size)
+    batch = 10000
+    store = HistoryStore()
+    visit_time = int(time.time())
+    filled = 0
+
+    print(f"{'записей':>10} | {'вставка, мкс':>13} | {'поиск, мкс':>11} | {'повтор, мкс':>12}")
+    size = 1000
+    while size <= max_size:
+        # Дозаполняем историю до нужного размера
+        while filled < size:
+            store.record_visit(f"https://site{filled}.example.com/page", "Заголовок страницы", visit_time)
+            filled += 1
+
+        urls = [f"https://site{i}.example.com/page" for i in range(0, size, max(1, size // batch))][:batch]
+
+        started = time.perf_counter()
+        for i in range(batch):
+            store.record_visit(f"https://new{size}-{i}.example.com/", "Новая страница", visit_time)
+        insert_cost = (time.perf_counter() - started) / batch
+
+        started = time.perf_counter()
+        for url in urls:
+            store.get(url)
+        lookup_cost = (time.perf_counter() - started) / len(urls)
+
+        started = time.perf_counter()
+        for url in urls:
+            store.record_visit(url, "Заголовок страницы", visit_time)
+        revisit_cost = (time.perf_counter() - started) / len(urls)
+
+        filled += batch
+        print(f"{size:>10} | {insert_cost * 1e6:>13.2f} | {lookup_cost * 1e6:>11.2f} | {revisit_cost * 1e6:>12.2f}")
+        size *= 10
+    return 0
+
+def benchmark_history_search(size="500000"):
+    """Замер полнотекстового поиска по истории"""
+    size = int(size)
+    words = ["python", "qt", "browser", "новости", "погода", "music", "video", "docs", "forum",
+             "shop", "travel", "recipe", "github", "wiki", "science", "sport", "market", "code"]
+    hosts = [f"{word}{n}.example.com" for word in words for n in range(50)]
+    store = HistoryStore()
+    visit_time = int(time.time())
+
+    started = time.perf_counter()
+    for i in range(size):
+        host = hosts[i % len(hosts)]
+        title = f"{words[i % 7]} {words[(i * 3) % len(words)]} статья {i}"
+        store.record_visit(f"https://{host}/{words[(i * 5) % len(words)]}/{i}", title, visit_time)
+    print(f"Индексировано {size} записей за {time.perf_counter() - started:.1f} с")
+
+    # Первый запрос вливает накопленные слова в словарь, его замеряем отдельно
+    started = time.perf_counter()
+    store.search("прогрев", 1)
+    print(f"Слияние словаря: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    # Последние три - частые слова: редкое сочетание (поиск отдает лучшее из свежих записей),
+    # сочетание с самым частым словом и слово, раскрывающееся в тысячи слов словаря
+    queries = ["pyth", "github wiki", "новост погод", "music vid", "docs 1234", "travel rec",
+               "science sport", "qt", "shop12", "статья 499", "docs code shop", "travel rec статья", "12"]
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        results = store.search(query, 20)
+        elapsed = (time.perf_counter() - started) * 1000
+        timings.append(elapsed)
+        print(f"{query:>15}: {len(results):>3} результатов, {elapsed:7.2f} мс")
+    timings.sort()
+    print(f"Медиана {timings[len(timings) // 2]:.2f} мс, максимум {timings[-1]:.2f} мс")
+    return 0
+
+def benchmark_bookmark_filter(size="50000"):
+    """Замер фильтрации закладок при наборе текста"""
+    size = int(size)
+    words = ["python", "qt", "browser", "новости", "погода", "music", "video", "docs", "forum",
+             "shop", "travel", "recipe", "github", "wiki", "science", "sport", "market", "code"]
+    added_date = int(time.time())
+    bookmarks = [Bookmark(f"{words[i % 7]} {words[(i * 3) % len(words)]} заметка {i}",
+                          f"https://{words[(i * 5) % len(words)]}{i % 300}.example.com/page/{i}",
+                          added_date, words[i % 11] if i % 4 else "General")
+                 for i in range(size)]
+
+    started = time.perf_counter()
+    search_index = BookmarkSearchIndex()
+    search_index.rebuild(bookmarks)
+    print(f"Индексировано {size} закладок за {time.perf_counter() - started:.2f} с")
+
+    filter_model = BookmarkFilterModel(search_index)
+    filter_model.setSourceModel(BookmarkListModel(bookmarks))
+    timings = []
+    for text in ["github", "новости 12", "music sport", "docs5"]:
+        # Каждое нажатие клавиши - отдельный запрос, как при вводе в поле поиска
+        for length in range(1, len(text) + 1):
+            started = time.perf_counter()
+            filter_model.set_query(text[:length])
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{text:>15}: {filter_model.rowCount():>6} закладок, последнее нажатие {timings[-1]:.2f} мс")
+    timings.sort()
+    print(f"Нажатий {len(timings)}: медиана {timings[len(timings) // 2]:.2f} мс, "
+          f"максимум {timings[-1]:.2f} мс (кадр - 16.7 мс)")
+    return 0
+
+def benchmark_memory(size="200000"):
+    """Замер памяти и скорости pickle на запись истории: прежнее представление против текущего"""
+    size = int(size)
+    started_at = int(time.time()) - size
+
+    class LegacyHistoryItem:
+        # Прежний формат записи: __dict__ и время строкой
+        def __init__(self, url, title, visit_time, visit_count=1):
+            self.url = url
+            self.title = title
+            self.visit_time = visit_time
+            self.visit_count = visit_count
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        result = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return result, used
+
+    def pages():
+        for i in range(size):
+            yield (f"https://site{i % 2000}.example.com/articles/{i}", f"Статья номер {i} - Example", started_at + i)
+
+    legacy, legacy_bytes = measure(lambda: [
+        LegacyHistoryItem(url, title, datetime.fromtimestamp(epoch).strftime(HistoryStore.TIME_FORMAT))
+        for url, title, epoch in pages()
+    ])
+    items, item_bytes = measure(lambda: [HistoryItem(url, title, epoch) for url, title, epoch in pages()])
+    store, store_bytes = measure(lambda: HistoryStore(HistoryItem(url, title, epoch) for url, title, epoch in pages()))
+
+    print(f"Записей: {size}")
+    print(f"  прежние записи (__dict__, время строкой): {legacy_bytes / size:8.1f} байт/запись")
+    print(f"  текущие записи (__slots__, epoch, UTF-8):  {item_bytes / size:8.1f} байт/запись")
+    print(f"  HistoryStore целиком (с индексами и поиском): {store_bytes / size:8.1f} байт/запись")
+
+    # Локальный класс не pickle-уется, поэтому прежние записи сохраняем их __dict__ - это те же данные
+    legacy_blob = pickle.dumps([vars(item) for item in legacy], protocol=pickle.HIGHEST_PROTOCOL)
+    items_blob = pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"  pickle: прежние {len(legacy_blob) / size:.1f} байт/запись, текущие {len(items_blob) / size:.1f} байт/запись")
+    del store
+    return 0
+
+def benchmark_startup(user_count="10", entries="20000"):
+    """Замер холодного старта: загрузка всех профилей против индекса учетных записей"""
+    user_count, entries = int(user_count), int(entries)
+    temp_dir = tempfile.mkdtemp(prefix="derbrowser-bench-")
+    try:
+        db_path = os.path.join(temp_dir, 'profiles.db')
+        store = ProfileStore(db_path)
+        started_at = int(time.time()) - entries
+        for n in range(user_count):
+            user = UserAccount(f"user{n}", "hash")
+            with store.lock, store.conn:
+                store._upsert_user(user)
+                for i in range(entries):
+                    store._upsert_history(user.username, HistoryItem(f"https://site{i % 500}.example.com/{i}",
+                                                                     f"Страница {i}", started_at + i))
+                for i in range(entries // 20):
+                    bookmark = Bookmark(f"Закладка {i}", f"https://site{i}.example.com/", started_at)
+                    store._upsert_bookmark(user.username, bookmark)
+        store.close()
+        print(f"Пользователей: {user_count}, записей истории у каждого: {entries}")
+
+        # Прежний порядок: перед входом читаются данные всех пользователей
+        store = ProfileStore(db_path)
+        started = time.perf_counter()
+        users = store.load_users()
+        for user in users.values():
+            store.load_user_data(user)
+        full_ms = (time.perf_counter() - started) * 1000
+        store.close()
+
+        # Сейчас: индекс учетных записей, затем данные одного вошедшего пользователя
+        store = ProfileStore(db_path)
+        started = time.perf_counter()
+        users = store.load_users()
+        index_ms = (time.perf_counter() - started) * 1000
+        store.load_user_data(users["user0"])
+        login_ms = (time.perf_counter() - started) * 1000
+        store.close()
+
+        print(f"  все профили целиком:        {full_ms:9.1f} мс")
+        print(f"  индекс учетных записей:     {index_ms:9.1f} мс")
+        print(f"  индекс + данные одного:     {login_ms:9.1f} мс")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+def benchmark_homepage(repeat="20"):
+    """Замер времени до первого кадра главной страницы и открытия новой домашней вкладки.
+    Прежний create_homepage удален, поэтому для сравнения служит HomePage без отложенной части"""
+    repeat = int(repeat)
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setStyle("Fusion")
+
+    def median(samples):
+        return sorted(samples)[len(samples) // 2]
+
+    eager, build, first_frame, rest, reuse = [], [], [], [], []
+    for _ in range(repeat):
+        # Вся страница сразу, без отложенной части; так же стоила бы каждая вкладка без общей страницы
+        started = time.perf_counter()
+        page = HomePage(defer=False)
+        page.resize(1400, 760)
+        page.ensurePolished()
+        build.append((time.perf_counter() - started) * 1000)
+        page.grab()
+        eager.append((time.perf_counter() - started) * 1000)
+        page.deleteLater()
+        app.processEvents()
+
+        # Видимая часть сразу, остальное после первого кадра
+        started = time.perf_counter()
+        page = HomePage()
+        page.resize(1400, 760)
+        page.grab()
+        first_frame.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        app.processEvents()
+        rest.append((time.perf_counter() - started) * 1000)
+
+        # Новая домашняя вкладка: готовая страница показывается поверх пустой вкладки
+        tab_widget = QTabWidget()
+        tab_widget.resize(1400, 800)
+        tab_widget.addTab(QWidget(), "🏠 Главная")
+        stack = tab_widget.widget(0).parentWidget()
+        page.setParent(stack)
+        tab_widget.setCurrentIndex(tab_widget.addTab(QWidget(), "Новая вкладка"))
+        started = time.perf_counter()
+        page.setGeometry(stack.contentsRect())
+        page.raise_()
+        page.show()
+        reuse.append((time.perf_counter() - started) * 1000)
+        tab_widget.deleteLater()
+        app.processEvents()
+
+    print(f"Повторов: {repeat} (медиана)")
+    print(f"  вся страница + первый кадр:       {median(eager):7.1f} мс")
+    print(f"  первый кадр с отложенной частью:  {median(first_frame):7.1f} мс")
+    print(f"  достройка после первого кадра:    {median(rest):7.1f} мс")
+    print(f"  новая вкладка, страница заново:   {median(build):7.1f} мс")
+    print(f"  новая вкладка, общая страница:    {median(reuse):7.2f} мс")
+    return 0
+
+def benchmark_theme_switch(tab_count="30", repeat="5"):
+    """Замер смены темы в окне с открытыми вкладками"""
+    tab_count, repeat = int(tab_count), int(repeat)
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setStyle("Fusion")
+
+    # Окно с теми же именами объектов, что и у браузера
+    window = QMainWindow()
+    central = QWidget()
+    layout = QVBoxLayout(central)
+    nav_bar = QWidget()
+    nav_bar.setObjectName("navBar")
+    nav_layout = QHBoxLayout(nav_bar)
+    for name, count in (("navButton", 4), ("actionButton", 4)):
+        for _ in range(count):
+            button = QPushButton("•")
+            button.setObjectName(name)
+            nav_layout.addWidget(button)
+    url_bar = QLineEdit()
+    url_bar.setObjectName("urlBar")
+    nav_layout.addWidget(url_bar)
+    layout.addWidget(nav_bar)
+    tab_widget = QTabWidget()
+    for i in range(tab_count):
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.addWidget(QLabel(f"Вкладка {i}"))
+        page_layout.addWidget(QLineEdit())
+        page_layout.addWidget(QPushButton("Кнопка"))
+        tab_widget.addTab(page, f"Вкладка {i}")
+    layout.addWidget(tab_widget)
+    window.setCentralWidget(central)
+    window.resize(1400, 800)
+    window.show()
+    app.processEvents()
+
+    engine = ThemeEngine()
+    started = time.perf_counter()
+    for name in ThemeEngine.THEMES:
+        engine.stylesheet(name)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    names = list(ThemeEngine.THEMES)
+    switch, double, same = [], [], []
+    for _ in range(repeat):
+        for i, name in enumerate(names):
+            # Одна смена темы: один проход стилей по дереву виджетов
+            started = time.perf_counter()
+            engine.apply(window, name)
+            app.processEvents()
+            switch.append((time.perf_counter() - started) * 1000)
+
+            # Повторное применение той же темы
+            started = time.perf_counter()
+            engine.apply(window, name)
+            app.processEvents()
+            same.append((time.perf_counter() - started) * 1000)
+
+            # Прежний старт администратора: сначала обычная тема, затем админ тема
+            other = names[(i + 1) % len(names)]
+            started = time.perf_counter()
+            window.setStyleSheet(engine.stylesheet(other))
+            window.setStyleSheet(engine.stylesheet(name))
+            app.processEvents()
+            double.append((time.perf_counter() - started) * 1000)
+            engine.current = name
+
+    def median(samples):
+        return sorted(samples)[len(samples) // 2]
+
+    print(f"Вкладок: {tab_count}, тем: {len(names)}, повторов: {repeat} (медиана)")
+    print(f"  сборка всех тем из токенов:  {compile_ms:7.2f} мс (один раз)")
+    print(f"  смена темы, один проход:     {median(switch):7.2f} мс")
+    print(f"  два прохода подряд:          {median(double):7.2f} мс")
+    print(f"  повторное применение:        {median(same):7.2f} мс")
+    window.close()
+    return 0
+
+def benchmark_session_restore(tab_count="100", eager_count="10"):
+    """Замер восстановления сеанса: вкладки-заглушки против WebView на каждую вкладку"""
+    tab_count, eager_count = int(tab_count), int(eager_count)
+    app = QApplication.instance() or QApplication(sys.argv)
+    temp_dir = tempfile.mkdtemp(prefix="derbrowser-bench-")
+    try:
+        store = ProfileStore(os.path.join(temp_dir, 'profiles.db'))
+        records = [{"url": f"https://site{i}.example.com/page", "title": f"Страница {i}", "is_homepage": False,
+                    "is_incognito": False, "is_current": i == 0, "history": None}
+                   for i in range(tab_count)]
+        store.save_tabs("bench", records)
+        print(f"Вкладок в сеансе: {tab_count}")
+
+        # Вкладки-заглушки: WebView создается только у текущей вкладки
+        tab_widget = QTabWidget()
+        started = time.perf_counter()
+        for record in store.load_tabs("bench"):
+            tab = BrowserTab(parent_browser=tab_widget, url=record["url"], lazy=True, title=record["title"],
+                             history_data=record["history"])
+            tab_widget.addTab(tab, record["title"])
+        lazy_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        tab_widget.widget(0).create_browser()
+        first_ms = (time.perf_counter() - started) * 1000
+        print(f"  заглушки:                {lazy_ms:8.1f} мс ({lazy_ms / tab_count:.3f} мс на вкладку)")
+        print(f"  WebView текущей вкладки: {first_ms:8.1f} мс")
+        tab_widget.deleteLater()
+        app.processEvents()
+
+        # Прежний способ: WebView и загрузка страницы сразу для каждой вкладки
+        if eager_count:
+            tab_widget = QTabWidget()
+            started = time.perf_counter()
+            for record in records[:eager_count]:
+                tab_widget.addTab(BrowserTab(parent_browser=tab_widget, url=record["url"]), record["title"])
+            eager_ms = (time.perf_counter() - started) * 1000
+            print(f"  WebView на вкладку ({eager_count}): {eager_ms:8.1f} мс "
+                  f"(~{eager_ms / eager_count * tab_count:.0f} мс на {tab_count}, без учета процессов рендеринга)")
+            tab_widget.deleteLater()
+            app.processEvents()
+        store.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+def benchmark_ad_filter(requests_file="", filters_file="", count="100000"):
+    """Замер проверки запросов фильтрами рекламы (записанные адреса или синтетические)"""
+    count = int(count)
+    if filters_file:
+        engine = AdFilterEngine.from_files([filters_file])
+    else:
+        engine = AdFilterEngine()
+        started = time.perf_counter()
+        for i in range(40000):
+            engine.add_rule(f"||ads{i}.tracker{i % 97}.com^")
+        for i in range(8000):
+            engine.add_rule(f"/banner{i}/*/img^")
+            engine.add_rule(f"&adslot{i}=$third-party")
+        for i in range(300):
+            engine.add_rule(f"||cdn{i}.com/ads/*.js$script,domain=news{i}.com|~sport.news{i}.com")
+            engine.add_rule(f"@@||cdn{i}.com/ads/ok.js$script")
+        engine.compile_ms = (time.perf_counter() - started) * 1000
+
+    if requests_file:
+        # Строка: адрес [таб источник [таб тип]]
+        with open(requests_file, 'r', encoding='utf-8') as f:
+            requests = [(line.rstrip("\n").split("\t") + ["", "other"])[:3] for line in f if line.strip()]
+        requests = (requests * (count // max(1, len(requests)) + 1))[:count]
+    else:
+        requests = []
+        for i in range(count):
+            kind = i % 5
+            if kind == 0:
+                url = f"https://ads{i % 50000}.tracker{i % 50000 % 97}.com/pixel.gif?id={i}"
+            elif kind == 1:
+                url = f"https://static.site{i % 1000}.com/banner{i % 9000}/{i}/img?x=1"
+            elif kind == 2:
+                url = f"https://api.site{i % 1000}.com/v1/items?page={i}&adslot{i % 9000}=1"
+            else:
+                url = f"https://cdn.site{i % 1000}.com/assets/app{i % 300}.js?v={i}"
+            requests.append((url, f"site{i % 1000}.com", "image" if kind < 2 else "script"))
+
+    stats = engine.stats()
+    print(f"Правил: {stats['rules']} (доменов {stats['hosts']}, шаблонов {stats['patterns']}, "
+          f"без токена {stats['generic']}), компиляция {stats['compile_ms']:.0f} мс")
+    timings = []
+    blocked = 0
+    started = time.perf_counter()
+    for url, source_host, resource_type in requests:
+        request_started = time.perf_counter()
+        blocked += engine.should_block(url, source_host, resource_type)
+        timings.append(time.perf_counter() - request_started)
+    total = time.perf_counter() - started
+    timings.sort()
+    print(f"Запросов: {len(requests)}, заблокировано {blocked}, всего {total * 1000:.0f} мс")
+    print(f"  на запрос: среднее {total / len(requests) * 1e6:.1f} мкс, медиана {timings[len(timings) // 2] * 1e6:.1f} мкс, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} мкс")
+    return 0
+
+def benchmark_blocklist(domain_count="500000", lookups="100000"):
+    """Замер списка доменов: сборка, объем в памяти и задержка проверки"""
+    domain_count, lookups = int(domain_count), int(lookups)
+    domains = [f"{'ads' if i % 3 else 'track'}{i}.host{i % 5000}.{('com', 'net', 'org', 'ru')[i % 4]}"
+               for i in range(domain_count)]
+    blocklist = DomainBlocklist(domains)
+    stats = blocklist.stats()
+    # Для сравнения - обычное множество строк (сами строки тоже занимают память)
+    set_bytes = sys.getsizeof(set(domains)) + sum(sys.getsizeof(domain) for domain in domains)
+    print(f"Доменов: {stats['domains']}, сборка {stats['build_ms']:.0f} мс")
+    print(f"  память: массив + фильтр Блума {stats['memory_bytes'] / 1024 / 1024:.1f} МБ, "
+          f"set строк {set_bytes / 1024 / 1024:.1f} МБ")
+
+    for title, hosts in [
+        ("заблокированные", [f"www.{domains[i * 7 % domain_count]}" for i in range(lookups)]),
+        ("чистые", [f"cdn{i}.site{i % 997}.example.com" for i in range(lookups)]),
+    ]:
+        blocklist.lookups = blocklist.lookup_ns = blocklist.bloom_rejects = 0
+        started = time.perf_counter()
+        blocked = sum(blocklist.is_blocked(host) for host in hosts)
+        elapsed = time.perf_counter() - started
+        print(f"  {title}: {blocked}/{lookups} заблокировано, {elapsed / lookups * 1e6:.2f} мкс на проверку, "
+              f"отсеяно фильтром Блума {blocklist.bloom_rejects}")
+    return 0
+
+def benchmark_dns_prefetch(host_count="200", latency_ms="20", workers="4"):
+    """Замер разрешения имен на локальной заглушке с заданной задержкой"""
+    host_count, latency, workers = int(host_count), float(latency_ms) / 1000, int(workers)
+
+    def stub_resolve(host):
+        # Локальный резолвер: постоянная задержка, адрес из хеша имени
+        time.sleep(latency)
+        if host.startswith("missing"):
+            raise socket.gaierror("stub: имя не найдено")
+        return [f"10.0.{len(host) % 256}.{sum(map(ord, host)) % 256}"]
+
+    hosts = [f"site{i}.example.com" for i in range(host_count)] + [f"missing{i}.example.com" for i in range(10)]
+    resolver = HostResolver(resolve=stub_resolve, workers=workers, capacity=host_count * 2)
+    started = time.perf_counter()
+    for future in resolver.prefetch_many(hosts):
+        future.result()
+    prefetch_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    found = sum(resolver.lookup(host) is not None for host in hosts)
+    lookup_us = (time.perf_counter() - started) * 1e6 / len(hosts)
+    stats = resolver.stats()
+    resolver.shutdown()
+    print(f"Имен: {len(hosts)}, задержка заглушки {latency * 1000:.0f} мс, потоков {workers}")
+    print(f"  по очереди в потоке GUI:  {len(hosts) * latency * 1000:8.0f} мс")
+    print(f"  пул потоков:              {prefetch_ms:8.0f} мс")
+    print(f"  из кэша: {found}/{len(hosts)}, {lookup_us:.2f} мкс на имя")
+    print(f"  попаданий {stats['hits']}, промахов {stats['misses']}, ошибок {stats['failed']}, "
+          f"среднее разрешение {stats['avg_ms']:.1f} мс")
+    return 0
+
+def benchmark_omnibox(size="200000", host_count="5000", bookmark_count="2000"):
+    """Замер подсказок адресной строки: время на каждое нажатие клавиши"""
+    size, host_count, bookmark_count = int(size), int(host_count), int(bookmark_count)
+    words = ["python", "qt", "browser", "новости", "погода", "music", "video", "docs", "forum",
+             "shop", "travel", "recipe", "github", "wiki", "science", "sport", "market", "code"]
+    hosts = ["github.com", "youtube.com", "wikipedia.org", "google.com"] + [
+        f"{words[n % len(words)]}{n}.{('com', 'org', 'ru')[n % 3]}" for n in range(host_count)]
+    store = HistoryStore()
+    visit_time = int(time.time()) - size
+    for i in range(size):
+        # Популярные хосты встречаются чаще остальных
+        host = hosts[i % 4] if i % 5 == 0 else hosts[(i * 7919) % len(hosts)]
+        title = f"{words[i % 7]} {words[(i * 3) % len(words)]} статья {i}"
+        store.record_visit(f"https://{host}/{words[(i * 5) % len(words)]}/{i}", title, visit_time + i)
+    bookmarks = [Bookmark(f"{words[i % len(words)]} закладка {i}", f"https://{hosts[(i * 31) % len(hosts)]}/b/{i}",
+                          "") for i in range(bookmark_count)]
+    bookmark_index = BookmarkSearchIndex()
+    bookmark_index.rebuild(bookmarks)
+    tabs = [(f"{words[i % len(words)]} вкладка", f"https://{hosts[i]}/tab") for i in range(20)]
+    suggester = OmniboxSuggester(store, bookmark_index)
+
+    started = time.perf_counter()
+    store.hosts
+    print(f"История {size} записей, хостов {len(store.hosts)}; индекс хостов за "
+          f"{(time.perf_counter() - started) * 1000:.0f} мс")
+    store.search("прогрев", 1)
+
+    typed = ["github.com", "youtu", "wikipedia", "python12", "новости погода", "music vid", "gihtub", "docs 1234"]
+    timings = []
+    for text in typed:
+        for length in range(1, len(text) + 1):
+            started = time.perf_counter()
+            rows = suggester.suggest(text[:length], tabs)
+            timings.append((time.perf_counter() - started) * 1000)
+        top = rows[0] if rows else ("-", "-", "")
+        print(f"{text:>15}: {len(rows)} подсказок, первая: {top[0]} {top[1][:40]}")
+    timings.sort()
+    print(f"Нажатий {len(timings)}: медиана {timings[len(timings) // 2]:.2f} мс, "
+          f"95% {timings[int(len(timings) * 0.95)]:.2f} мс, максимум {timings[-1]:.2f} мс")
+
+    # Посещения обновляют индекс хостов на месте, без перестроения
+    started = time.perf_counter()
+    for i in range(1000):
+        store.record_visit(f"https://newsite{i % 50}.example/page{i}", "новая страница", visit_time + size + i)
+    print(f"1000 посещений с обновлением индексов: {(time.perf_counter() - started) * 1000:.1f} мс; "
+          f"newsi -> {store.hosts.complete('newsi')}")
+    return 0
+
+def benchmark_top_sites(size="200000", host_count="5000"):
+    """Замер плиток главной: готовый топ индекса хостов против подсчета по всей истории"""
+    size, host_count = int(size), int(host_count)
+    hosts = [f"site{n}.example.com" for n in range(host_count)]
+    store = HistoryStore()
+    visit_time = int(time.time()) - size
+    for i in range(size):
+        # Несколько сайтов посещаются намного чаще остальных
+        host = hosts[(i // 3) % 12] if i % 3 == 0 else hosts[(i * 7919) % host_count]
+        store.record_visit(f"https://{host}/page/{i}", "страница", visit_time + i)
+
+    started = time.perf_counter()
+    visits = {}
+    for item in store:
+        host = HostFrecencyIndex.host_of(item.url)
+        visits[host] = visits.get(host, 0) + item.visit_count
+    heapq.nlargest(HomePage.TILE_COUNT, visits, key=visits.get)
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    # Поток интерфейса делает только снимок ключей, индекс строится в фоне
+    started = time.perf_counter()
+    ranks = store.start_hosts_build()
+    snapshot_ms = (time.perf_counter() - started) * 1000
+    index = HostFrecencyIndex.from_ranks(ranks.items())
+    started = time.perf_counter()
+    store.finish_hosts_build(index)
+    install_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    for _ in range(1000):
+        index.top(HomePage.TILE_COUNT)
+    top_us = (time.perf_counter() - started) * 1000
+
+    revision = index.top_revision
+    started = time.perf_counter()
+    for i in range(10000):
+        store.record_visit(f"https://{hosts[(i * 31) % host_count]}/new/{i}", "страница", visit_time + size + i)
+    visit_us = (time.perf_counter() - started) * 100
+
+    # Удаление записей из топа: без перестройки, топ пересчитывается по хостам при чтении
+    removed = [item.url for item in store.recent(1000)]
+    started = time.perf_counter()
+    for url in removed:
+        store.remove(url)
+        index.top(HomePage.TILE_COUNT)
+    remove_us = (time.perf_counter() - started) * 1000
+    print(f"История {size} записей, хостов {len(index)}")
+    print(f"  подсчет по истории на каждую постройку: {scan_ms:8.1f} мс")
+    print(f"  снимок ключей (поток интерфейса):       {snapshot_ms:8.1f} мс")
+    print(f"  индекс хостов (фоновый поток, при входе): {index.build_ms:6.1f} мс")
+    print(f"  подключение индекса:                    {install_ms:8.2f} мс")
+    print(f"  готовый топ {HomePage.TILE_COUNT}:                        {top_us:8.2f} мкс")
+    print(f"  посещение с обновлением индексов:       {visit_us:8.1f} мкс "
+          f"(топ менялся {index.top_revision - revision} раз из 10000)")
+    print(f"  удаление записи и чтение топа:          {remove_us:8.1f} мкс")
+    print(f"  топ: {', '.join(index.top(5))}")
+    return 0
+
+def benchmark_page_timing(resources="300", rounds="200"):
+    """Замер разбора данных Performance API для диалога скорости"""
+    resources, rounds = int(resources), int(rounds)
+    kinds = ("script", "link", "img", "fetch", "css", "font")
+    entries = []
+    for i in range(resources):
+        kind = kinds[i % len(kinds)]
+        start = 50.0 + i * 3.7
+        size = (i * 7919) % 400000
+        entries.append({"name": f"https://cdn{i % 7}.example.com/assets/{kind}/{i}.{kind}",
+                        "initiatorType": kind, "startTime": start, "responseEnd": start + 20 + i % 90,
+                        "transferSize": size if i % 5 else 0, "encodedBodySize": size,
+                        "decodedBodySize": size * 3 if i % 4 else size})
+    payload = json.dumps({
+        "url": "https://example.com/",
+        "navigation": {"domainLookupStart": 1.0, "domainLookupEnd": 12.0, "connectStart": 12.0,
+                       "secureConnectionStart": 20.0, "connectEnd": 45.0, "requestStart": 46.0,
+                       "responseStart": 210.0, "responseEnd": 260.0, "domInteractive": 700.0,
+                       "domContentLoadedEventEnd": 760.0, "loadEventEnd": 1500.0, "transferSize": 40000},
+        "resources": entries,
+        "paint": [["first-paint", 400.0], ["first-contentful-paint", 420.0]],
+        "longTasks": [[300.0 + i * 40, 30.0 + i * 7 % 120] for i in range(40)],
+        "lcp": 1100.0,
+    })
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = PageTimingEngine.analyze(json.loads(payload), PageTimingEngine.new_marks("https://example.com/"))
+    analyze_ms = (time.perf_counter() - started) * 1000 / rounds
+    print(f"Ресурсов {resources}, данных {len(payload) / 1024:.0f} КБ")
+    print(f"  разбор в фоновом потоке: {analyze_ms:8.2f} мс")
+    print(f"  TTFB {result['ttfb']:.0f} мс, DCL {result['dcl']:.0f} мс, load {result['load']:.0f} мс, "
+          f"TBT {result['tbt']:.0f} мс, оценка {result['score']}")
+    print(f"  строк водопада {len(result['waterfall'])}, блокирующих {len(result['blocking'])}, "
+          f"советов {len(result['recommendations'])}")
+    return 0
+
+# Доступные замеры: python DerBrowserCode.py --benchmark <имя> [параметры]
+BENCHMARKS = {
+    "history": benchmark_history_store,
+    "search": benchmark_history_search,
+    "bookmarks": benchmark_bookmark_filter,
+    "memory": benchmark_memory,
+    "startup": benchmark_startup,
+    "homepage": benchmark_homepage,
+    "theme": benchmark_theme_switch,
+    "session": benchmark_session_restore,
+    "adblock": benchmark_ad_filter,
+    "blocklist": benchmark_blocklist,
+    "dns": benchmark_dns_prefetch,
+    "omnibox": benchmark_omnibox,
+    "topsites": benchmark_top_sites,
+    "pagespeed": benchmark_page_timing,
+}
+
+def run_benchmark(argv):
+    """Запускает замер производительности по имени"""
+    index = argv.index("--benchmark")
+    name = argv[index + 1] if index + 1 < len(argv) else ""
+    if name not in BENCHMARKS:
+        print(f"Неизвестный замер: {name or '-'}. Доступные: {', '.join(BENCHMARKS)}")
+        return 1
+    return BENCHMARKS[name](*argv[index + 2:])
+
+# Пресеты Chromium: флаги читаются один раз при старте, поэтому применяются до создания QApplication
+PERFORMANCE_PRESETS = {
+    "balanced": {"title": "Сбалансированный", "renderer_limit": 0, "process_model": "site-instance",
+                 "gpu_rasterization": None, "disk_cache_mb": 0},
+    "low_memory": {"title": "Экономия памяти", "renderer_limit": 4, "process_model": "site",
+                   "gpu_rasterization": False, "disk_cache_mb": 50},
+    "max_throughput": {"title": "Максимальная скорость", "renderer_limit": 0, "process_model": "tab",
+                       "gpu_rasterization": True, "disk_cache_mb": 500},
+}
+PROCESS_MODEL_FLAGS = {"site-instance": None, "site": "--process-per-site", "tab": "--process-per-tab"}
+
+# Настройки, с которыми запущен текущий процесс
+active_performance = {}
+
+def performance_config_path():
+    """Файл пресета машины: настройки пользователя загружаются позже, уже после QApplication"""
+    return os.path.join(os.path.expanduser("~"), ".derbrowser", "performance.json")
+
+def load_performance_config():
+    """Читает пресет производительности и аппаратное ускорение"""
+    config = {"preset": "balanced", "hardware_acceleration": True}
+    try:
+        with open(performance_config_path(), 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ошибка чтения пресета производительности: {e}")
+    if config["preset"] not in PERFORMANCE_PRESETS:
+        config["preset"] = "balanced"
+    return config
+
+def save_performance_config(preset, hardware_acceleration):
+    """Сохраняет пресет для следующего запуска"""
+    try:
+        path = performance_config_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"preset": preset, "hardware_acceleration": bool(hardware_acceleration)}, f)
+    except Exception as e:
+        print(f"Ошибка сохранения пресета производительности: {e}")
+
+def performance_flags(config):
+    """Флаги Chromium для пресета"""
+    preset = PERFORMANCE_PRESETS[config["preset"]]
+    flags = []
+    if preset["renderer_limit"]:
+        flags.append(f"--renderer-process-limit={preset['renderer_limit']}")
+    if PROCESS_MODEL_FLAGS[preset["process_model"]]:
+        flags.append(PROCESS_MODEL_FLAGS[preset["process_model"]])
+    if not config["hardware_acceleration"]:
+        flags.append("--disable-gpu")
+    elif preset["gpu_rasterization"] is True:
+        flags.append("--enable-gpu-rasterization")
+    elif preset["gpu_rasterization"] is False:
+        flags.append("--disable-gpu-rasterization")
+    if preset["disk_cache_mb"]:
+        flags.append(f"--disk-cache-size={preset['disk_cache_mb'] * 1024 * 1024}")
+    return flags
+
+def apply_performance_preset(config):
+    """Передает флаги Chromium и атрибуты Qt (только до создания QApplication)"""
+    flags = performance_flags(config)
+    # Флаги, заданные в окружении вручную, идут последними и перекрывают пресет
+    env_flags = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "").strip()
+    os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = " ".join(flags + ([env_flags] if env_flags else []))
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+    if not config["hardware_acceleration"]:
+        QCoreApplication.setAttribute(Qt.AA_UseSoftwareOpenGL)
+    active_performance.clear()
+    active_performance.update(config, flags=flags, env_flags=env_flags)
+    return flags
+
+def startup_profile_target(argv):
+    """Куда писать отчет о запуске: None - не писать, "" - водопад, "json" - JSON, иначе файл"""
+    for arg in argv[1:]:
+        if arg == "--profile-startup":
+            return ""
+        if arg.startswith("--profile-startup="):
+            return arg.split("=", 1)[1]
+    return None
+
+def finish_startup_profile(target, app):
+    """Отмечает первый кадр и выводит отчет о запуске"""
+    startup_profiler.mark("первый кадр")
+    startup_profiler.write(target)
+    if "--quit-after-startup" in sys.argv:
+        app.quit()
+
 def main():
+    # Выполнение тела модуля (определения классов) после последнего импорта
+    startup_profiler.record("модуль DerBrowserCode", "module", STARTUP_IMPORT_MARKS[-1][1])
+
+    if "--benchmark" in sys.argv:
+        sys.exit(run_benchmark(sys.argv))
+
+    # Пресет производительности - до QApplication, иначе Chromium не увидит флаги
+    with startup_profiler.phase("performance_preset"):
+        apply_performance_preset(load_performance_config())
+
     # Создаем приложение
-    app = QApplication(sys.argv)
-    app.setStyle("Fusion")
+    with startup_profiler.phase("QApplication"):
+        app = QApplication(sys.argv)
+        app.setStyle("Fusion")
 
     # Создаем и показываем главное окно
-    browser = ModernBrowser()
-    browser.show()
+    with startup_profiler.phase("ModernBrowser"):
+        browser = ModernBrowser()
+    with startup_profiler.phase("show"):
+        browser.show()
+
+    # Отчет печатается, когда цикл событий отрисовал окно
+    profile_target = startup_profile_target(sys.argv)
+    if profile_target is not None:
+        QTimer.singleShot(0, lambda: finish_startup_profile(profile_target, app))
 
     # Запускаем главный цикл приложения
     sys.exit(app.exec_())